@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark · 訂購訊息.build_order_messages vs. the original iterrows() loop.
+
+Builds a synthetic sheet with synth.order_sheet (the layout `pd.read_excel`
+returns for an order workbook: two leading columns, a price row, then one row
+per buyer), runs the legacy row-by-row generator and the column-wise pipeline
+on it, checks that messages / order details / totals are identical and prints
+the speed-up.
+
+    python benchmarks/bench_messages.py                  # 10k buyers × 300 products
+    python benchmarks/bench_messages.py -b 2000 -p 50
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import 訂購訊息  # noqa: E402
+from synth import order_sheet  # noqa: E402
+
+TODAY = "06/12"
+
+
+# ── Legacy implementation (verbatim logic of the original method) ──
+def legacy_generate(data: pd.DataFrame, today_date: str):
+    messages, order_details, order_totals = {}, {}, {}
+    orders_data = data.iloc[1:].fillna("")
+    for _, row in orders_data.iterrows():
+        name = row.iloc[1]
+        if not str(name).strip():
+            continue
+        message_lines = [
+            f"*熊熊媽團團轉{today_date}訂購清單*",
+            "",
+            "#取貨時間三點到七點",
+            "#本日到貨狀況請留意公告",
+            "================",
+            f"訂購人：{name}",
+        ]
+        has_order = False
+        order_items = []
+        product_quantities = {}
+        total_amount = 0.0
+        for col_index in range(2, len(row)):
+            item_name = data.columns[col_index]
+            raw_price = data.iloc[0, col_index]
+            numeric_price = None
+            if pd.isna(raw_price) or str(raw_price).strip() == "":
+                item_price_str = "無價格"
+            else:
+                try:
+                    numeric_price = float(str(raw_price))
+                    if numeric_price.is_integer():
+                        numeric_price = int(numeric_price)
+                        item_price_str = str(numeric_price)
+                    else:
+                        item_price_str = f"{numeric_price:.2f}"
+                except Exception:
+                    item_price_str = str(raw_price)
+            quantity, item_quantity = 訂購訊息.parse_order_quantity(row.iloc[col_index])
+            product_quantities[item_name] = quantity
+            if (isinstance(quantity, (int, float)) and quantity > 0) or (
+                not isinstance(quantity, (int, float))
+                and str(quantity).strip() not in ["", "0"]
+            ):
+                has_order = True
+                order_items.append((item_name, item_price_str, item_quantity))
+                if isinstance(quantity, (int, float)) and numeric_price is not None:
+                    total_amount += numeric_price * quantity
+        order_details[name] = product_quantities
+        order_totals[name] = total_amount
+        if has_order:
+            order_items.sort(key=lambda x: x[0])
+            for item_name, item_price_str, item_quantity in order_items:
+                message_lines.extend([
+                    f"訂購商品：{item_name}",
+                    f"品項單價：{item_price_str}",
+                    f"數量品項：{item_quantity}",
+                    "----------------",
+                ])
+            message_lines.append("已讀請回覆訊息喔~")
+            messages[name] = "\n".join(message_lines)
+    return messages, order_details, order_totals
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("-b", "--buyers", type=int, default=10_000)
+    ap.add_argument("-p", "--products", type=int, default=300)
+    ap.add_argument("-d", "--density", type=float, default=0.03)
+    ap.add_argument("--skip-legacy", action="store_true",
+                    help="only time the column-wise pipeline")
+    args = ap.parse_args(argv)
+
+    data = order_sheet(args.buyers, args.products, args.density)
+    print(f"sheet: {args.buyers} buyers × {args.products} products")
+
+    t_book, _ = _timed(訂購訊息.OrderBook, data, TODAY)
+    print(f"compile only: {t_book:8.3f} s  (what an upload pays; messages render lazily)")
+    t_new, new = _timed(訂購訊息.build_order_messages, data, TODAY)
+    print(f"column-wise : {t_new:8.3f} s  ({len(new[0])} messages)")
+    if args.skip_legacy:
+        return 0
+
+    t_old, old = _timed(legacy_generate, data, TODAY)
+    print(f"iterrows    : {t_old:8.3f} s")
+    if new != old or list(new[0]) != list(old[0]):
+        print("MISMATCH between legacy and column-wise output", file=sys.stderr)
+        return 1
+    print(f"identical output · speed-up ×{t_old / t_new:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark · 工作表 streaming .xlsx reader / writer vs. pd.read_excel / to_excel.
+
+Writes a synthetic order sheet (synth.order_sheet) both ways, reads it
+back both ways, checks the DataFrames are identical and prints the timings.
+With --memory each step also reports the peak it allocated (tracemalloc, which
+slows every contender down alike).
+
+    python benchmarks/bench_sheet_io.py                  # 50k buyers × 40 products
+    python benchmarks/bench_sheet_io.py -b 5000 -p 300 --memory
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import 工作表  # noqa: E402
+from synth import order_sheet  # noqa: E402
+
+
+TRACE = False
+
+
+def _measured(fn, *args):
+    if TRACE:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if TRACE:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return elapsed, peak, out
+
+
+def _row(label, elapsed, peak):
+    memory = f" {peak:9.1f} MiB" if peak is not None else ""
+    print(f"{label:<22}{elapsed:8.2f} s{memory}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("-b", "--buyers", type=int, default=50_000)
+    ap.add_argument("-p", "--products", type=int, default=40)
+    ap.add_argument("-d", "--density", type=float, default=0.1)
+    ap.add_argument("--memory", action="store_true",
+                    help="also report peak allocations (tracemalloc)")
+    args = ap.parse_args(argv)
+    global TRACE
+    TRACE = args.memory
+
+    data = order_sheet(args.buyers, args.products, args.density)
+    print(f"sheet: {args.buyers} buyers × {args.products} products")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, streamed = Path(tmp, "legacy.xlsx"), Path(tmp, "streamed.xlsx")
+
+        t_old, m_old, _ = _measured(lambda: data.to_excel(legacy, index=False))
+        _row("to_excel", t_old, m_old)
+        t_new, m_new, _ = _measured(工作表.write_xlsx, data, streamed)
+        _row("write_xlsx", t_new, m_new)
+        print(f"write speed-up ×{t_old / t_new:.1f}")
+
+        t_old, m_old, old = _measured(pd.read_excel, legacy)
+        _row("read_excel", t_old, m_old)
+        t_new, m_new, new = _measured(工作表.read_xlsx, streamed)
+        _row("read_xlsx", t_new, m_new)
+        print(f"read speed-up  ×{t_old / t_new:.1f}")
+
+    try:
+        assert_frame_equal(new, old)
+    except AssertionError as exc:
+        print(f"MISMATCH between legacy and streamed round trip:\n{exc}", file=sys.stderr)
+        return 1
+    print("identical DataFrames")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
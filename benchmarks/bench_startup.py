@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark · cold start of the three tools and of their importable cores.
+
+Imports every module in a fresh interpreter (best of -r runs) and reports the
+wall time, including interpreter start-up, plus the heavy libraries the import
+pulled in. A tool's import is what runs before its window is built, so it is
+checked against a start-up target. A core module must not load pandas, numpy,
+openpyxl or any GUI toolkit. Exits with status 1 when a target is missed or a
+core loads something heavy.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py -r 10 --slack 2     # slow laptop: 2× the targets
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Seconds from starting python to having imported the tool (before Tk draws)
+TARGETS = {"統計": 0.10, "表單": 0.15, "訊息": 0.25, "團購": 0.15}
+CORES = ["數量統計", "訂單解析", "訂購訊息", "工作表", "計時", "留言追蹤", "姓名比對", "工作紀錄", "訂單歷史"]
+HEAVY = ["pandas", "numpy", "openpyxl", "customtkinter", "pyperclip", "tkinter"]
+
+PROBE = """\
+import sys, json
+import {module}
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def _pad(text: str, width: int = 14) -> str:
+    """Left-justify by display width (CJK characters take two columns)."""
+    used = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    return text + " " * max(width - used, 1)
+
+
+def cold_start(module: str | None, repeat: int):
+    """(best wall time, heavy modules loaded) of importing `module` in a new interpreter."""
+    code = PROBE.format(module=module, heavy=HEAVY) if module else "pass"
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        best = min(best, time.perf_counter() - t0)
+        loaded = json.loads(out) if module else []
+    return best, loaded
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("-r", "--repeat", type=int, default=5)
+    ap.add_argument("--slack", type=float, default=1.0,
+                    help="multiply every target (for slower machines)")
+    args = ap.parse_args(argv)
+
+    base, _ = cold_start(None, args.repeat)
+    print(f"{_pad('python -c pass')}{base:8.3f} s")
+    failed = []
+    for module, target in TARGETS.items():
+        took, loaded = cold_start(module, args.repeat)
+        ok = took <= target * args.slack
+        print(f"{_pad(module)}{took:8.3f} s  target {target * args.slack:.2f} s"
+              f"{'' if ok else '  ← too slow'}  loads: {', '.join(loaded) or '-'}")
+        if not ok:
+            failed.append(module)
+    for module in CORES:
+        took, loaded = cold_start(module, args.repeat)
+        print(f"{_pad(module)}{took:8.3f} s  loads: {', '.join(loaded) or '-'}"
+              f"{'  ← should stay light' if loaded else ''}")
+        if loaded:
+            failed.append(module)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark suite · headless timings for the hot paths of all three tools.
+
+Every case runs on deterministic synthetic data (synth.py), is repeated a few
+times and reports the best / median wall time. Results are written as JSON so
+two runs can be compared; --compare exits with status 1 when any case got
+slower than the allowed ratio. --check runs randomized equivalence checks of
+the incremental paths against their one-shot counterparts instead, and exits
+with status 1 on the first mismatch.
+
+    python benchmarks/bench_suite.py                         # writes bench-<time>.json
+    python benchmarks/bench_suite.py --scale 0.1 -o quick.json
+    python benchmarks/bench_suite.py --compare before.json --threshold 1.15
+    python benchmarks/bench_suite.py --check -k follow --trials 500
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import 訂單解析  # noqa: E402
+import 數量統計  # noqa: E402
+import 訂購訊息  # noqa: E402
+import 姓名比對  # noqa: E402
+import 訂單歷史  # noqa: E402
+import synth  # noqa: E402
+
+TODAY = "06/12"
+
+
+# ── Cases ───────────────────────────────────────────────────────────
+# Each case gets the scale factor and returns (prepared fn, work units, unit name);
+# only fn() is timed.
+def case_parse_orders(scale):
+    text = synth.comment_dump(int(20_000 * scale), seed=1)
+    return (lambda: 訂單解析.parse_orders(text)), len(text.splitlines()), "lines"
+
+def case_merge_val(scale):
+    # The (buyer, value) pairs of a big dump, buyers commenting several times
+    text = synth.comment_dump(int(40_000 * scale), n_buyers=int(5_000 * scale) or 1, seed=2)
+    pairs = list(訂單解析.iter_orders(text.splitlines()))
+
+    def run():
+        buyers = defaultdict(lambda: None)
+        for name, val in pairs:
+            訂單解析._merge_val(buyers, name, val)
+        return buyers
+    return run, len(pairs), "merges"
+
+def _sheet_posts(scale):
+    names = synth.buyer_names(int(3_000 * scale) or 1, seed=3)
+    return [(f"商品{k:02d}", 訂單解析.parse_orders(synth.comment_dump(
+        int(1_500 * scale) or 1, seed=100 + k, names=names)))
+        for k in range(max(2, int(60 * scale)))]
+
+def case_sheet_frame(scale):
+    # What the order table pays: merge N posts into the model, then build the frame
+    posts = _sheet_posts(scale)
+
+    def run():
+        model = 訂單解析.SheetModel()
+        for item, buyers in posts:
+            model.merge(item, buyers)
+        model.take_changes()
+        return model.frame()
+    return run, len(posts), "posts"
+
+def case_sheet_sync(scale):
+    # 團購.py with the messages open: every post is merged and handed over in memory
+    posts = _sheet_posts(scale)
+
+    def run():
+        model = 訂單解析.SheetModel()
+        orders = 訂購訊息.SheetOrders(model)
+        orders.build(TODAY)
+        for item, buyers in posts:
+            model.merge(item, buyers)
+            orders.sync(model.take_changes())
+        return orders.book
+    return run, len(posts), "posts"
+
+def case_repaste(scale):
+    # 新增商品 with a post pasted again after 1% more comments (and back again):
+    # only the added comments are parsed and merged
+    text = synth.comment_dump(int(10_000 * scale) or 1, seed=7)
+    added = max(1, int(100 * scale))
+    grown = text + synth.comment_dump(added, seed=8)
+    model = 訂單解析.SheetModel()
+    model.paste("商品", text)
+
+    def run():
+        model.paste("商品", grown)
+        model.paste("商品", text)
+        return model.take_changes()
+    return run, 2 * added, "comments"
+
+def case_similar_names(scale):
+    # 相似姓名 over a big sheet: indexed, not every pair compared
+    names = synth.buyer_names(int(50_000 * scale) or 1, seed=9)
+    return (lambda: 姓名比對.similar_names(names)), len(names), "names"
+
+def case_count_products(scale):
+    text = unicodedata.normalize("NFKC", synth.counter_text(int(100_000 * scale), seed=4))
+    return (lambda: 數量統計.count_products(text)), len(text.splitlines()), "lines"
+
+def case_count_total(scale):
+    text = unicodedata.normalize("NFKC", synth.counter_text(int(100_000 * scale), seed=4))
+    return (lambda: 數量統計.count_total(text)), len(text.splitlines()), "lines"
+
+def case_count_comments(scale):
+    # 計算統計: both statistics and the line diagnostics in one pass over the raw paste
+    text = synth.counter_text(int(100_000 * scale), seed=4)
+    return (lambda: 數量統計.count_comments(text)), text.count("\n") + 1, "lines"
+
+def case_count_codes(scale):
+    # Listed multi-character codes (A1、AB、草莓) on top of single letters
+    text = synth.counter_text(int(100_000 * scale), seed=4)
+    codes = 數量統計.parse_codes("A1, AB, 草莓, 原味")
+    return (lambda: 數量統計.count_comments(text, codes)), text.count("\n") + 1, "lines"
+
+def case_live_reset(scale):
+    lines = synth.counter_text(int(50_000 * scale), seed=5).split("\n")
+
+    def run():
+        counts = 數量統計.LineCounts(defaultdict(int))
+        counts.reset(lines)
+        return counts
+    return run, len(lines), "lines"
+
+def case_order_book(scale):
+    data = synth.order_sheet(int(10_000 * scale) or 1, 300, seed=6)
+    return (lambda: 訂購訊息.OrderBook(data, TODAY)), len(data) - 1, "buyers"
+
+def case_render_all(scale):
+    book = 訂購訊息.OrderBook(synth.order_sheet(int(10_000 * scale) or 1, 300, seed=6), TODAY)
+    return (lambda: [book.render(name) for name in book.names]), len(book.names), "messages"
+
+def case_partition_by(scale):
+    # 依產品排序 for every product of the sheet
+    book = 訂購訊息.OrderBook(synth.order_sheet(int(10_000 * scale) or 1, 300, seed=6), TODAY)
+
+    def run():
+        return [book.partition_by([item]) for item in book.item_names]
+    return run, len(book.item_names), "sorts"
+
+def case_history_rollups(scale):
+    # A year of daily sheets: spend per buyer, volume per product, top buyers of a quarter
+    history = synth.order_history(int(365 * scale) or 1, seed=10)
+    start, end = 訂單歷史.day_date(history.columns["day"][0]), 訂單歷史.day_date(history.columns["day"][-1])
+    quarter = start + (end - start) / 4
+
+    def run():
+        return (history.buyer_spend(), history.product_volume(),
+                history.top_buyers(20, start, quarter))
+    return run, len(history), "rows"
+
+CASES = {
+    "表單.parse_orders": case_parse_orders,
+    "表單._merge_val": case_merge_val,
+    "表單.SheetModel.frame": case_sheet_frame,
+    "表單.SheetModel.paste": case_repaste,
+    "表單.similar_names": case_similar_names,
+    "團購.SheetOrders.sync": case_sheet_sync,
+    "統計.count_products": case_count_products,
+    "統計.count_total": case_count_total,
+    "統計.count_comments": case_count_comments,
+    "統計.count_comments[codes]": case_count_codes,
+    "統計.LineCounts.reset": case_live_reset,
+    "訊息.OrderBook": case_order_book,
+    "訊息.render_all": case_render_all,
+    "訊息.partition_by": case_partition_by,
+    "訂單歷史.rollups": case_history_rollups,
+}
+
+
+# ── Checks ──────────────────────────────────────────────────────────
+# Each check gets the number of trials and raises AssertionError on a mismatch.
+def _cells(buyers):
+    return {buyer: 訂單解析.cell_value(val) for buyer, val in buyers.items()}
+
+def check_follow(trials):
+    # Files written in random pieces, often without a final newline, followed by
+    # 表單 (follow_step / apply_follow) and 統計 (StreamCounts): once the files
+    # stop growing, both equal the one-shot parse of the whole text
+    import 表單
+    import 統計
+    from 留言追蹤 import Follower
+
+    codes = 數量統計.parse_codes("A1, AB")
+    for trial in range(trials):
+        rng = random.Random(trial)
+        post = synth.comment_dump(rng.randint(1, 30), seed=trial)
+        comments = synth.counter_text(rng.randint(1, 40), seed=trial)
+        if rng.random() < 0.5:
+            post, comments = post.rstrip("\n"), comments.rstrip("\n")
+        with tempfile.TemporaryDirectory() as folder:
+            post_path, comments_path = Path(folder, "商品.txt"), Path(folder, "留言.log")
+            post_path.touch()
+            comments_path.touch()
+            sheet_follower, model = Follower(folders=[folder]), 訂單解析.SheetModel()
+            posts = 訂單解析.PostStreams()
+            count_follower, streams = Follower([comments_path]), {}
+
+            def poll():
+                表單.apply_follow(model, posts, 表單.follow_step(sheet_follower, posts))
+                for path, text, rewritten in count_follower.poll():
+                    stream = streams.setdefault(path, 數量統計.StreamCounts(codes))
+                    stream.feed(text)
+
+            pieces = {}
+            for path, text in ((post_path, post), (comments_path, comments)):
+                cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+                pieces[path] = [text[a:b] for a, b in zip([0, *cuts], [*cuts, len(text)])]
+            for k in range(7):
+                for path in pieces:
+                    if k < len(pieces[path]):
+                        with open(path, "a", encoding="utf-8", newline="") as f:
+                            f.write(pieces[path][k])
+                for _ in range(rng.randint(0, 2)):
+                    poll()
+            poll()
+            poll()                          # unchanged since the last poll: tails count
+            got = _cells({buyer: cells["商品"] for buyer, cells in model.data.items()
+                          if "商品" in cells})
+            want = _cells(訂單解析.parse_orders(post))
+            assert got == want, (trial, post, got, want)
+            settled = 統計.settled_counts(streams, count_follower.pending(), codes)
+            total = sum(s.total for s in settled.values())
+            counts = {p: c for s in settled.values() for p, c in s.counts.items() if c}
+            one_shot = 數量統計.count_comments(comments, codes)
+            assert (counts, total) == ({p: c for p, c in one_shot.counts.items() if c},
+                                       one_shot.total), (trial, comments, counts, total)
+
+def _edited(rng, lines, names):
+    """The comment lines after one grow / edit / delete, as a re-paste would bring them."""
+    lines = lines[:]
+    at = rng.randint(0, len(lines))
+    action = rng.random()
+    if action < 0.5 or not lines:
+        lines[at:at] = synth.comment_dump(rng.randint(1, 5), seed=rng.random(),
+                                          names=names).splitlines()
+    elif action < 0.65:
+        lines[min(at, len(lines) - 1)] = rng.choice(
+            [rng.choice(names), f"+{rng.randint(1, 5)}", f"{rng.choice(names)} +1", "已編輯"])
+    elif action < 0.8:                      # typed on: “Amy” → “Amy1” is no name line any more
+        at = min(at, len(lines) - 1)
+        lines[at] = rng.choice([lines[at] + rng.choice(["1", "+2", " 謝謝"]), lines[at][:-1]])
+    else:
+        del lines[at:at + rng.randint(1, 3)]
+    return lines
+
+def _merged(*posts):
+    cells: dict = {}
+    for buyers in posts:
+        for buyer, val in buyers.items():
+            訂單解析._merge_val(cells, buyer, val)
+    return cells
+
+def check_paste(trials):
+    # A post pasted again and again while it grows, gets edited and loses comments,
+    # next to a sheet value merged before and another post of the same item: the
+    # column always equals merging parse_orders of the texts as they are now
+    from 姓名比對 import canonical_name
+
+    def by_key(cells):
+        return {canonical_name(b): 訂單解析.cell_value(v) for b, v in cells.items()}
+
+    for trial in range(trials):
+        rng = random.Random(trial)
+        names = synth.buyer_names(rng.randint(2, 12), seed=trial)
+        model = 訂單解析.SheetModel()
+        base = 訂單解析.parse_orders(synth.comment_dump(rng.randint(0, 5), seed=-trial - 1, names=names))
+        if rng.random() < 0.5:
+            model.merge("商品", base)
+        else:
+            base = {}
+        # Enough blocks that one step's edit leaves most of them: the re-paste is
+        # still recognised as this post (a wholly different text is a new post)
+        lines = synth.comment_dump(rng.randint(8, 30), seed=trial, names=names).splitlines()
+        other = {}
+        for step in range(rng.randint(1, 8)):
+            text = "\n".join(lines) + "\n"
+            if rng.random() < 0.5:
+                model.paste("商品", text)
+            else:                           # planned on a worker, then applied
+                model.paste("商品", text, model.plan_paste("商品", text))
+            if step == 0 and rng.random() < 0.3:
+                other_text = "\n".join(f"另{line}" if line else line for line in
+                                       synth.comment_dump(rng.randint(1, 5), seed=trial + 1,
+                                                          names=names).splitlines())
+                model.paste("商品", other_text)
+                other = 訂單解析.parse_orders(other_text)
+            want = by_key(_merged(base, 訂單解析.parse_orders(text), other))
+            got = by_key({b: row["商品"] for b, row in model.data.items() if "商品" in row})
+            assert got == want, (trial, step, text, got, want)
+            lines = _edited(rng, lines, names)
+
+def _sheet(model):
+    return ({b: {it: 訂單解析.cell_value(v) for it, v in row.items()} for b, row in model.data.items()},
+            list(model.buyers), list(model.items))
+
+def check_restore(trials):
+    # Random merge / replace / paste / merge_buyers on a journaled model, then a
+    # crash (no close, so no final snapshot) and a restore: the restored sheet
+    # equals the live one, and so does the next re-paste of every post
+    import 工作紀錄
+
+    snapshot_ops = 工作紀錄.SNAPSHOT_OPS
+    try:
+        for trial in range(trials):
+            rng = random.Random(trial)
+            工作紀錄.SNAPSHOT_OPS = rng.choice([3, 7, snapshot_ops])
+            names = synth.buyer_names(rng.randint(2, 10), seed=trial)
+            items = [f"商品{k}" for k in range(rng.randint(1, 4))]
+            texts: dict[str, list[str]] = {}
+            with tempfile.TemporaryDirectory() as folder:
+                journal = 工作紀錄.SessionJournal(Path(folder, 工作紀錄.SESSION_FILE))
+                model = 訂單解析.SheetModel()
+                journal.attach(model)
+                for _ in range(rng.randint(1, 25)):
+                    item, action = rng.choice(items), rng.random()
+                    post = synth.comment_dump(rng.randint(1, 6), seed=rng.random(), names=names)
+                    if action < 0.25:
+                        model.merge(item, 訂單解析.parse_orders(post))
+                    elif action < 0.35:
+                        model.replace(item, 訂單解析.parse_orders(post))
+                    elif action < 0.9:
+                        lines = texts.get(item) or synth.comment_dump(
+                            rng.randint(8, 20), seed=rng.random(), names=names).splitlines()
+                        texts[item] = _edited(rng, lines, names)
+                        model.paste(item, "\n".join(texts[item]) + "\n")
+                    elif len(model.buyers) > 1:
+                        name, into = rng.sample(model.buyers, 2)
+                        model.merge_buyers(name, into)
+                if rng.random() < 0.2:
+                    journal.snapshot()
+                journal.db.close()          # the crash: nothing written on the way out
+                journal.db = None
+                restored = 訂單解析.SheetModel()
+                again = 工作紀錄.SessionJournal(Path(folder, 工作紀錄.SESSION_FILE))
+                again.restore(restored)
+                again.close()
+                assert _sheet(restored) == _sheet(model), (trial, _sheet(restored), _sheet(model))
+                for item, lines in texts.items():
+                    text = "\n".join(_edited(rng, lines, names)) + "\n"
+                    model.paste(item, text)
+                    restored.paste(item, text)
+                assert _sheet(restored) == _sheet(model), (trial, "re-paste")
+    finally:
+        工作紀錄.SNAPSHOT_OPS = snapshot_ops
+
+CHECKS = {
+    "留言追蹤.follow": check_follow,
+    "訂單解析.paste": check_paste,
+    "工作紀錄.restore": check_restore,
+}
+
+
+# ── Runner ──────────────────────────────────────────────────────────
+def run_case(make, scale, repeat):
+    fn, units, unit = make(scale)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+    return {
+        "best": best,
+        "median": statistics.median(times),
+        "runs": times,
+        "units": units,
+        "unit": unit,
+        "per_second": units / best if best else None,
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Print old → new per case; return the names that got slower than threshold."""
+    slower = []
+    for name, new in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"{name:<24} (new case)")
+            continue
+        ratio = new["best"] / old["best"] if old["best"] else float("inf")
+        flag = "  ← slower" if ratio > threshold else ""
+        print(f"{name:<24}{old['best']:9.4f} s → {new['best']:9.4f} s  ×{ratio:5.2f}{flag}")
+        if flag:
+            slower.append(name)
+    return slower
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--scale", type=float, default=1.0,
+                    help="multiply every data size (0.1 for a quick run)")
+    ap.add_argument("-r", "--repeat", type=int, default=5)
+    ap.add_argument("-k", "--only", action="append", default=[], metavar="SUBSTRING",
+                    help="run only cases whose name contains this text")
+    ap.add_argument("-o", "--output", default=None,
+                    help="JSON result file (default: bench-<timestamp>.json)")
+    ap.add_argument("--compare", metavar="JSON", help="earlier result file to compare with")
+    ap.add_argument("--threshold", type=float, default=1.2,
+                    help="slow-down ratio counted as a regression (default 1.2)")
+    ap.add_argument("--check", action="store_true",
+                    help="run the equivalence checks (CHECKS) instead of timing")
+    ap.add_argument("--trials", type=int, default=200, help="random runs per check")
+    args = ap.parse_args(argv)
+
+    if args.check:
+        for name, check in CHECKS.items():
+            if args.only and not any(k in name for k in args.only):
+                continue
+            t0 = time.perf_counter()
+            try:
+                check(args.trials)
+            except AssertionError as exc:
+                print(f"{name:<24} MISMATCH {str(exc)[:2000]}")
+                return 1
+            print(f"{name:<24} ok ({args.trials} runs, {time.perf_counter() - t0:.1f} s)")
+        return 0
+
+    results = {}
+    for name, make in CASES.items():
+        if args.only and not any(k in name for k in args.only):
+            continue
+        r = results[name] = run_case(make, args.scale, args.repeat)
+        print(f"{name:<24}{r['best']:9.4f} s  (median {r['median']:.4f} s, "
+              f"{r['per_second']:,.0f} {r['unit']}/s)")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    Path(output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"→ {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark · 訂單解析.classify_line (one RE_LINE pass) vs. the original regex chain.
+
+Checks that the single-pass classifier labels every line of a corpus exactly as
+the old chain did, then times both on a multi-megabyte synthetic dump and
+compares throughput with a lines/s target. The corpus is the synthetic dump,
+hand-picked edge cases, and random lines drawn from the characters the
+patterns care about. Exits with status 1 on any mismatch.
+
+    python benchmarks/bench_tokenizer.py                     # ~5 MB dump
+    python benchmarks/bench_tokenizer.py -n 50000 --fuzz 500000 --target 2e6
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import 訂單解析  # noqa: E402
+from 訂單解析 import NOISE_WORDS, RE_NAME_LINE, RE_NAME_PLUS, RE_TIME  # noqa: E402
+import synth  # noqa: E402
+
+# The quantity tests of the original chain; classify_line folds them into RE_LINE
+RE_PURE_NUM = re.compile(r'^\s*\+?\s*([0-9]+)\s*$')
+RE_ANY_LETTER_PLUS = re.compile(r'[A-Za-z]\s*[\+\*]\s*\d+')
+
+EDGE_CASES = [
+    "", "   ", "已編輯", "讚 · 回覆 · 已編輯", "回覆", " 回覆 ", "翻譯年糕", "回覆了",
+    "3天", "3 天", "12小時", "５分鐘", "3天前", "天3", "1週", "2 周",
+    "Amy +2", "Amy+2", "Amy *2", "Amy * 2", "Amy+", "Amy+2+3", "陳小美 ＋２", "Chloé·Lin+10",
+    "a.b_c-d +1", " +1", "+1", "+ 1", "1", "007", "+1 謝謝", "1+1", "M+1", "m * 3",
+    "紅色 +2", "Amy", "Amy Chen", "陳小美", "· . _ -", "Zoë", "Ｍ＋１", "２", "+ 3",
+    "名字　+2", "Amy\t+2", "12 3", "+12x", "x", "😀", "陳小美😀 +1",
+]
+
+FUZZ_ALPHABET = "陳小美AmyZ é· ._-+*0123456789０＋天小時分鐘週\t已編輯回覆x😀"
+
+
+def legacy_classify(raw: str) -> tuple:
+    """The original iter_orders chain (on NFKC text), returning classify_line's labels."""
+    line = unicodedata.normalize("NFKC", raw.strip()).strip()
+    if (not line or "已編輯" in line or line in NOISE_WORDS or RE_TIME.match(line)):
+        return ("noise",)
+    m = RE_NAME_PLUS.match(line)
+    if m:
+        return ("name+qty", m.group(1).strip(), int(m.group(2)))
+    if RE_NAME_LINE.match(line):
+        return ("name", line)
+    if RE_PURE_NUM.match(line) and not RE_ANY_LETTER_PLUS.search(line):
+        return ("qty", int(RE_PURE_NUM.match(line).group(1)))
+    return ("combo", line)
+
+
+def fuzz_lines(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rng.choices(FUZZ_ALPHABET, k=rng.randint(0, 12)))
+
+
+def check(lines) -> int:
+    mismatches = 0
+    for line in lines:
+        new, old = 訂單解析.classify_line(line), legacy_classify(line)
+        if new != old:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"MISMATCH {line!r}: {new} != {old}", file=sys.stderr)
+    return mismatches
+
+
+def _throughput(fn, lines, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        訂單解析._classified.clear()        # every run starts cold: repeats within the dump only
+        t0 = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - t0)
+    return len(lines) / best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("-n", "--comments", type=int, default=200_000,
+                    help="buyer blocks in the synthetic dump")
+    ap.add_argument("--fuzz", type=int, default=200_000, help="random corpus lines")
+    ap.add_argument("--target", type=float, default=1_000_000,
+                    help="lines/s the classifier should reach (default 1e6)")
+    args = ap.parse_args(argv)
+
+    text = synth.comment_dump(args.comments, seed=7)
+    lines = text.splitlines()
+    print(f"dump: {len(text.encode('utf-8')) / 2**20:.1f} MB, {len(lines):,} lines")
+
+    bad = check(EDGE_CASES) + check(lines) + check(fuzz_lines(args.fuzz))
+    corpus = len(EDGE_CASES) + len(lines) + args.fuzz
+    if bad:
+        print(f"{bad} of {corpus:,} lines classified differently", file=sys.stderr)
+        return 1
+    print(f"identical labels on {corpus:,} corpus lines")
+
+    old = _throughput(legacy_classify, lines)
+    new = _throughput(訂單解析.classify_line, lines)
+    print(f"regex chain : {old:12,.0f} lines/s")
+    print(f"single pass : {new:12,.0f} lines/s  (×{new / old:.2f})")
+    訂單解析._classified.clear()
+    t0 = time.perf_counter()
+    訂單解析.parse_orders(text)
+    print(f"parse_orders: {len(lines) / (time.perf_counter() - t0):12,.0f} lines/s end to end")
+    if new < args.target:
+        print(f"below target of {args.target:,.0f} lines/s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Synthetic data · deterministic Facebook-style comment dumps and order sheets.
+
+Everything is driven by a seeded random.Random, so the same arguments always
+give byte-identical output and benchmark runs stay comparable.
+
+  • comment_dump(): what gets pasted into 表單.py — name lines, “Name +2”,
+    multi-line buyer blocks (“M+1”, “紅色 +2”, pure numbers), full-width
+    characters and the noise lines 表單.py filters (已編輯, 回覆, 3天 …).
+  • counter_text(): comments for 統計.py (A+1、b 2、C*3, '+n', full-width).
+  • order_sheet(): the DataFrame pd.read_excel returns for an order workbook.
+  • order_history(): a year (or any number of days) of sheets in 訂單歷史.py's store.
+
+    python benchmarks/synth.py comments -n 5000 -o 留言.txt
+    python benchmarks/synth.py counter -n 20000 -o 統計.txt
+    python benchmarks/synth.py sheet -b 10000 -p 300 -o 訂單.xlsx
+"""
+
+import argparse
+import random
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SURNAMES  = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周"
+GIVEN     = "家怡婷雅淑惠美玲君宜佳芳文志明俊傑建宏冠廷"
+LATIN     = ["Amy", "Betty", "Cindy", "Doris", "Emma", "Grace", "Jenny", "Kelly",
+             "Linda", "Nancy", "Peggy", "Tina", "Vivian", "Zoe"]
+ACCENTED  = ["Chloé", "Zoë", "André", "Renée", "José"]
+VARIANTS  = ["M", "L", "XL", "紅色", "藍色", "原味", "辣味", "小包", "大盒"]
+NOISE     = ["已編輯", "回覆", "翻譯年糕", "讚 · 回覆 · 已編輯"]
+TIME_UNITS = ["天", "日", "週", "周", "小時", "分鐘"]
+
+# ASCII → full-width (＋, ＊, ０-９, Ａ-Ｚ, ａ-ｚ)
+FULL_WIDTH = str.maketrans({chr(c): chr(c + 0xFEE0) for c in range(0x21, 0x7F)})
+
+
+# ── Comment dumps (表單.py) ─────────────────────────────────────────
+def buyer_names(n: int, seed: int = 0) -> list[str]:
+    """n distinct names: mostly Chinese, some Latin / accented, a few with spaces or ·."""
+    rng = random.Random(seed)
+    names: dict[str, None] = {}
+    while len(names) < n:
+        r = rng.random()
+        if r < 0.7:
+            name = rng.choice(SURNAMES) + "".join(rng.choices(GIVEN, k=rng.choice((1, 2, 2, 3))))
+        elif r < 0.9:
+            name = f"{rng.choice(LATIN)} {rng.choice(SURNAMES)}"
+        elif r < 0.95:
+            name = rng.choice(ACCENTED) + rng.choice(("", " Wu", "·Lin"))
+        else:
+            name = rng.choice(LATIN) + rng.choice(("", ".", "_")) + rng.choice(LATIN).lower()
+        names.setdefault(name, None)
+    return list(names)
+
+
+def _noise(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return rng.choice(NOISE)
+    return f"{rng.randint(1, 59)}{rng.choice(('', ' '))}{rng.choice(TIME_UNITS)}"
+
+
+def _qty_line(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.45:
+        return f"+{rng.randint(1, 5)}"
+    if r < 0.6:
+        return str(rng.randint(1, 5))
+    if r < 0.85:
+        return f"{rng.choice(VARIANTS)}{rng.choice(('', ' '))}+{rng.randint(1, 3)}"
+    return rng.choice(["我要兩份", "可以留一組嗎", "+1 謝謝"])
+
+
+def comment_dump(n_comments: int, n_buyers: int | None = None, seed: int = 0,
+                 full_width: float = 0.05, noise: float = 0.3,
+                 names: list[str] | None = None) -> str:
+    """
+    A post's comment dump with n_comments buyer blocks (buyers may comment twice).
+    Pass `names` to draw buyers from a shared list, e.g. the same group across posts.
+    """
+    rng = random.Random(seed)
+    if names is None:
+        names = buyer_names(n_buyers or max(1, n_comments * 3 // 4), seed)
+    lines: list[str] = []
+    for _ in range(n_comments):
+        name = rng.choice(names)
+        if rng.random() < 0.35:
+            lines.append(f"{name} {rng.choice('+*')}{rng.randint(1, 5)}")
+        else:
+            lines.append(name)
+            for _ in range(rng.choice((1, 1, 1, 2, 3))):     # multi-line blocks
+                lines.append(_qty_line(rng))
+        while rng.random() < noise:
+            lines.append(_noise(rng))
+        if rng.random() < 0.2:
+            lines.append("")
+    if full_width:
+        lines = [ln.translate(FULL_WIDTH) if rng.random() < full_width else ln
+                 for ln in lines]
+    return "\n".join(lines) + "\n"
+
+
+# ── Counter comments (統計.py) ──────────────────────────────────────
+def counter_text(n_lines: int, seed: int = 0, full_width: float = 0.1) -> str:
+    """Comments mixing A+1 / b 2 / C*3 orders, bare '+n' and chatter."""
+    rng = random.Random(seed)
+    names = buyer_names(200, seed)
+    lines = []
+    for _ in range(n_lines):
+        r = rng.random()
+        if r < 0.5:
+            letter = rng.choice("ABCDEFGHabcdefgh")
+            line = f"{letter}{rng.choice(('+', '*', ' ', ''))}{rng.randint(1, 9)}"
+            if rng.random() < 0.3:
+                line += f" {rng.choice('ABCDEFGH')}+{rng.randint(1, 9)}"
+        elif r < 0.7:
+            line = f"+{rng.randint(1, 9)}"
+        elif r < 0.85:
+            line = rng.choice(names) + " 我要"
+        else:
+            line = _noise(rng)
+        if rng.random() < full_width:
+            line = line.translate(FULL_WIDTH)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+# ── Order workbooks (訊息.py) ───────────────────────────────────────
+def order_sheet(n_buyers: int, n_products: int, density: float = 0.03,
+                seed: int = 0) -> pd.DataFrame:
+    """Price row + buyer rows, mostly blank cells, some ints and “M+1” strings."""
+    rng = random.Random(seed)
+    items = [f"商品{j:03d}" for j in range(n_products)]
+
+    prices = []
+    for _ in items:
+        r = rng.random()
+        prices.append(np.nan if r < 0.05 else
+                      "時價" if r < 0.08 else
+                      rng.choice([35, 50, 120, 199]) if r < 0.8 else
+                      rng.choice([12.5, 99.9]))
+    rows = [["", np.nan] + prices]
+    for i in range(n_buyers):
+        cells = []
+        for _ in items:
+            r = rng.random()
+            if r >= density:
+                cells.append(np.nan)
+            elif r < density * 0.7:
+                cells.append(rng.randint(1, 4))
+            elif r < density * 0.8:
+                cells.append(0)
+            else:
+                cells.append(rng.choice(["M+1", "L+2", "紅色 +1", "2.5"]))
+        rows.append(["", f"買家{i:05d}"] + cells)
+    return pd.DataFrame(rows, columns=["Unnamed: 0", "Unnamed: 1"] + items)
+
+
+# ── Order history (訂單歷史.py) ─────────────────────────────────────
+def order_history(n_days: int, n_buyers: int = 5000, buyers_per_day: int = 300,
+                  products_per_day: int = 40, density: float = 0.35, seed: int = 0):
+    """
+    An OrderHistory as if one order sheet per day had been added: each day a
+    sample of regular buyers orders 1-4 of that day's products at 35-199 each.
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    import 訂單歷史
+
+    rng = np.random.default_rng(seed)
+    history = 訂單歷史.OrderHistory(f"synth-{訂單歷史.HISTORY_FILE}")   # never saved
+    history.buyers = buyer_names(n_buyers, seed)
+    history.products = [f"{d:03d}-商品{j:02d}" for d in range(n_days) for j in range(products_per_day)]
+    first = 訂單歷史.day_number(date(2024, 1, 1))
+    columns = {name: [] for name in 訂單歷史.COLUMNS}
+    for d in range(n_days):
+        buyers = rng.choice(n_buyers, size=min(buyers_per_day, n_buyers), replace=False)
+        ordered = rng.random((len(buyers), products_per_day)) < density
+        who, item = np.nonzero(ordered)
+        quantity = rng.integers(1, 5, len(who)).astype(float)
+        price = rng.choice([35.0, 50.0, 120.0, 199.0], products_per_day)
+        columns["day"].append(np.full(len(who), first + d, dtype=np.int32))
+        columns["buyer"].append(buyers[who].astype(np.int32))
+        columns["product"].append((d * products_per_day + item).astype(np.int32))
+        columns["sheet"].append(np.full(len(who), d, dtype=np.int32))
+        columns["quantity"].append(quantity)
+        columns["amount"].append(quantity * price[item])
+    history.columns = {name: np.concatenate(parts) for name, parts in columns.items()}
+    history.sheets = [{"path": f"{d}.xlsx", "digest": str(d), "day": 訂單歷史.day_date(first + d).isoformat()}
+                      for d in range(n_days)]
+    return history
+
+
+# ── CLI ─────────────────────────────────────────────────────────────
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = ap.add_subparsers(dest="kind", required=True)
+    c = sub.add_parser("comments", help="comment dump for 表單.py")
+    c.add_argument("-n", "--comments", type=int, default=5000)
+    c.add_argument("--buyers", type=int, default=None)
+    t = sub.add_parser("counter", help="comments for 統計.py")
+    t.add_argument("-n", "--lines", type=int, default=20000)
+    s = sub.add_parser("sheet", help="order workbook for 訊息.py (.xlsx/.csv/.parquet)")
+    s.add_argument("-b", "--buyers", type=int, default=10_000)
+    s.add_argument("-p", "--products", type=int, default=300)
+    s.add_argument("-d", "--density", type=float, default=0.03)
+    for p in (c, t, s):
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("-o", "--output", required=p is s, help="default: stdout")
+    args = ap.parse_args(argv)
+
+    if args.kind == "sheet":
+        sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+        import 工作表
+        工作表.write_sheet(order_sheet(args.buyers, args.products, args.density,
+                                       args.seed), args.output)
+        return 0
+    if args.kind == "comments":
+        text = comment_dump(args.comments, args.buyers, args.seed)
+    else:
+        text = counter_text(args.lines, args.seed)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
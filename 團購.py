@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Combined tool · 表單.py's order sheet with 訊息.py's message generator attached.
+
+  • 訂購訊息 opens the message generator on the sheet that is on screen, plus the
+    price row typed in 商品價格 — no export to Excel and no re-upload.
+  • Every 新增商品 / folder import afterwards patches the open messages: only the
+    changed product columns are recompiled and only their buyers' messages are
+    rendered again (see 訂購訊息.SheetOrders).
+  • customtkinter and 訊息.py are loaded the first time the messages are opened.
+"""
+
+import sys
+import tkinter as tk
+from tkinter import ttk, messagebox
+from 表單 import App, APP_FONT
+from 訂購訊息 import SheetOrders
+
+# ── Combined application ───────────────────────────────────────────
+class CombinedApp(App):
+    def __init__(self):
+        super().__init__()
+        self.title("團購訂單表與訂購訊息")
+        self.orders = SheetOrders(self.model)   # sheet + price row → OrderBook
+        self.generator = None                   # 訊息.OrderMessageGenerator while open
+        ttk.Button(self.btns, text="訂購訊息", command=self.open_messages).pack(side="left", padx=4)
+        ttk.Button(self.btns, text="商品價格", command=self.edit_prices).pack(side="left", padx=4)
+        self.change_listeners.append(self._sync_messages)
+
+    # ── Callbacks ───────────────────────────────────────────────────
+    def open_messages(self):
+        if self.generator is not None:
+            self.generator.winfo_toplevel().lift()
+            return
+        if not self.model.data:
+            messagebox.showwarning("無資料", "請先新增商品")
+            return
+        import customtkinter as ctk
+        import 訊息
+
+        ctk.set_appearance_mode("System")
+        window = tk.Toplevel(self)
+        window.title("訂購訊息")
+        window.geometry("900x700")
+        status = ttk.Label(window, text="準備就緒", anchor="w")
+        status.pack(side="bottom", fill="x")
+
+        def set_status(message):
+            status.config(text=message)
+
+        self.generator = 訊息.OrderMessageGenerator(window, status_callback=set_status)
+        self.generator.pack(fill="both", expand=True, padx=10, pady=10)
+        window.protocol("WM_DELETE_WINDOW", lambda: self._close_messages(window))
+        self.generator.load_sheet(self.orders)
+
+    def edit_prices(self):
+        """One “商品<Tab>價格” line per product; pasting two spreadsheet columns works too."""
+        if not self.model.items:
+            messagebox.showwarning("無資料", "請先新增商品")
+            return
+        window = tk.Toplevel(self)
+        window.title("商品價格")
+        window.geometry("420x480")
+        ttk.Label(window, text="每行一項：商品名稱<Tab>價格（空白代表無價格）").pack(
+            anchor="w", padx=8, pady=(8, 0))
+        text = tk.Text(window, wrap="none", font=APP_FONT)
+        text.pack(fill="both", expand=True, padx=8, pady=4)
+        text.insert("1.0", "\n".join(f"{item}\t{self.orders.prices.get(item, '')}"
+                                     for item in self.model.items))
+
+        def save():
+            items, prices, unknown = set(self.model.items), {}, []
+            for line in text.get("1.0", "end").splitlines():
+                if not line.strip():
+                    continue
+                item, tab, price = line.rpartition("\t")
+                if not tab:
+                    item, price = line, ""
+                item = item.strip()
+                if item in items:
+                    prices[item] = price.strip()
+                else:
+                    unknown.append(item)
+            if unknown:
+                messagebox.showwarning("找不到商品", "\n".join(unknown), parent=window)
+                return
+            self._apply_prices(prices)
+            window.destroy()
+
+        ttk.Button(window, text="儲存", command=save).pack(pady=(0, 8))
+
+    def _close_messages(self, window):
+        self.generator.jobs.shutdown()
+        self.generator = None
+        self.orders.book = None             # stop patching a book nobody shows
+        window.destroy()
+
+    def _on_close(self):
+        if self.generator is not None:
+            self.generator.jobs.shutdown()
+        super()._on_close()
+
+    # ── Helpers ────────────────────────────────────────────────────
+    def _sync_messages(self, changes):
+        affected = self.orders.sync(changes)
+        if self.generator is not None:
+            self.generator.sheet_changed(affected)
+
+    def _apply_prices(self, prices):
+        affected = self.orders.set_prices(prices)
+        if self.generator is not None:
+            self.generator.sheet_changed(affected)
+
+# ── Entry point ────────────────────────────────────────────────────
+def main() -> int:
+    CombinedApp().mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Buyer-name matching shared by 表單.py and 訊息.py.
+
+  • canonical_name() is the key every spelling of one buyer shares: NFKC (full-width
+    letters and digits → half-width), case folded, spaces and middle dots (· ・)
+    dropped, so “ＡＭＹ”, “amy” and “A·my ” are one buyer. Names read from Excel
+    may be numbers; they are keyed by their text.
+  • BuyerNames maps each spelling to the first one seen (the name the sheet shows)
+    and remembers which spellings a shown name stands for.
+  • similar_names() suggests pairs that are alike without sharing a key (trigram
+    Jaccard ≥ SIMILARITY). Candidates come from an inverted trigram index with
+    prefix filtering, so 50k names are nowhere near 50k² comparisons.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+SIMILARITY = 0.6                # trigram Jaccard from which two names are suggested
+RE_SEPARATORS = re.compile(r"[\s·・]+")
+
+# ── Canonical names ─────────────────────────────────────────────────
+def canonical_name(name) -> str:
+    name = str(name)
+    key = RE_SEPARATORS.sub("", unicodedata.normalize("NFKC", name)).casefold()
+    return key or name.strip() or name
+
+def trigrams(key: str) -> set[str]:
+    """Trigrams of a canonical key, padded so short (two-character) names have some."""
+    padded = f"^{key}$"
+    return {padded[k:k + 3] for k in range(len(padded) - 2)}
+
+class BuyerNames:
+    """Spelling → shown name, first spelling wins; merges made later are aliases."""
+
+    def __init__(self):
+        self.shown: dict[str, str] = {}                     # canonical key → shown name
+        self.spellings: dict[str, dict[str, None]] = {}     # shown name → its spellings
+        self._resolved: dict[str, str] = {}                 # spelling → shown name
+
+    def resolve(self, name: str) -> str:
+        shown = self._resolved.get(name)
+        if shown is None:
+            shown = self.shown.setdefault(canonical_name(name), name)
+            self._resolved[name] = shown
+            self.spellings.setdefault(shown, {})[name] = None
+        return shown
+
+    def alias(self, name: str, into: str) -> None:
+        """Make the shown name `name`, and every spelling of it, resolve to `into`."""
+        moved = self.spellings.pop(name, {name: None})
+        self.spellings.setdefault(into, {}).update(moved)
+        for spelling in moved:
+            self._resolved[spelling] = into
+        for key in [key for key, shown in self.shown.items() if shown == name]:
+            self.shown[key] = into
+
+# ── Near duplicates ─────────────────────────────────────────────────
+def similar_names(names, threshold: float = SIMILARITY) -> list[tuple[str, str, float]]:
+    """
+    (name, name, score) for names that are probably one buyer, most alike first:
+    different spellings of one canonical key score 1.0, other pairs their trigram
+    Jaccard. Each name is compared only with the names sharing one of the rarest
+    grams of its prefix, which finds every pair above `threshold` (prefix filtering).
+    """
+    first: dict[str, str] = {}
+    pairs = []
+    for name in names:
+        key = canonical_name(name)
+        if key in first:
+            if name != first[key]:
+                pairs.append((first[key], name, 1.0))
+        else:
+            first[key] = name
+    grams = {key: trigrams(key) for key in first}
+    frequency = Counter(g for gs in grams.values() for g in gs)
+    index: dict[str, list[str]] = defaultdict(list)
+    # Smallest sets first: a candidate is never larger than the probe, so one
+    # size test drops the sets too small to reach the threshold
+    for key in sorted(grams, key=lambda k: len(grams[k])):
+        mine = grams[key]
+        size = len(mine)
+        ordered = sorted(mine, key=lambda g: (frequency[g], g))
+        prefix = ordered[:size - math.ceil(threshold * size - 1e-9) + 1]
+        candidates = {other for g in prefix for other in index[g]}
+        for other in candidates:
+            theirs = grams[other]
+            if len(theirs) < threshold * size - 1e-9:
+                continue
+            shared = len(mine & theirs)
+            score = shared / (size + len(theirs) - shared)
+            if score >= threshold:
+                pairs.append((first[other], first[key], score))
+        for g in prefix:
+            index[g].append(key)
+    pairs.sort(key=lambda pair: (-pair[2], str(pair[0]), str(pair[1])))
+    return pairs
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Session journal of 表單.py · the order sheet survives a crash or a closed window.
+
+  • Every SheetModel operation (merge, replace, paste, merge_buyers) is appended
+    to a SQLite database in WAL mode as it happens: one small row holding what the
+    operation changed — a parsed post, or just the part of a re-pasted post after
+    the text both pastes share — never the whole sheet.
+  • Now and then (SNAPSHOT_OPS operations, or once the rows since the last
+    snapshot outweigh it) the whole model is written as a snapshot and the rows
+    it covers are deleted, so a restart loads one snapshot and replays a short tail.
+  • The database is opened in exclusive locking mode: a second window gets
+    SessionBusy and runs without a journal instead of mixing two sessions.
+"""
+
+import os
+import pickle
+import sqlite3
+from pathlib import Path
+
+SESSION_FILE = "表單工作紀錄.sqlite"
+STATE_VERSION = 1               # bump when SheetModel's saved state changes
+SNAPSHOT_OPS = 500              # operations replayed at most on start-up
+SNAPSHOT_BYTES = 4 << 20        # …or this many bytes of them, or the snapshot's own size
+
+class SessionBusy(Exception):
+    """Another window has the journal open."""
+
+def default_path() -> Path:
+    """The journal next to the upload cache (GROUP_BUYING_CACHE, ~/.cache/group_buying)."""
+    directory = os.environ.get("GROUP_BUYING_CACHE") or Path.home() / ".cache" / "group_buying"
+    return Path(directory) / SESSION_FILE
+
+class SessionJournal:
+    """
+    Append-only log of one SheetModel. attach() makes the model record into it;
+    restore() rebuilds a model from the newest snapshot plus the log after it.
+    Write errors are handed to `on_error` once and turn the journal off, so a
+    full disk never stops the sheet itself.
+    """
+
+    def __init__(self, path=None, on_error=None):
+        self.path = Path(path) if path is not None else default_path()
+        self.on_error = on_error
+        self.model = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        try:
+            self.db.execute("PRAGMA locking_mode=EXCLUSIVE")
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            # The first write takes the exclusive lock, held until close()
+            self.db.executescript(f"""
+                BEGIN EXCLUSIVE;
+                CREATE TABLE IF NOT EXISTS ops (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, args BLOB NOT NULL);
+                CREATE TABLE IF NOT EXISTS snapshots (seq INTEGER PRIMARY KEY, state BLOB NOT NULL);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+                INSERT OR IGNORE INTO meta VALUES ('version', {STATE_VERSION});
+                COMMIT;
+            """)
+            if self._meta("version", STATE_VERSION) != STATE_VERSION:
+                self.clear()                            # written by an older layout
+        except sqlite3.OperationalError as exc:
+            self.db.close()
+            if "locked" in str(exc):
+                raise SessionBusy(str(self.path)) from exc
+            raise
+        self._ops, self._bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(args)), 0) FROM ops").fetchone()
+        self._snapshot_bytes = self.db.execute(
+            "SELECT COALESCE(MAX(LENGTH(state)), 0) FROM snapshots").fetchone()[0]
+
+    # ── Session ────────────────────────────────────────────────────
+    def pending(self) -> bool:
+        """Something was recorded after the last export."""
+        return self.position() > self._meta("exported", 0)
+
+    def position(self) -> int:
+        """Sequence number of the newest operation recorded."""
+        if self.db is None:
+            return 0
+        return self.db.execute("SELECT MAX(COALESCE((SELECT MAX(seq) FROM ops), 0),"
+                               " COALESCE((SELECT MAX(seq) FROM snapshots), 0))").fetchone()[0]
+
+    def restore(self, model) -> int:
+        """Load the newest snapshot into an empty `model`, replay what followed; returns ops replayed."""
+        row = self.db.execute("SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+        start = 0
+        if row is not None:
+            start, state = row
+            model.__setstate__(pickle.loads(state))
+        replayed = 0
+        for op, args in self.db.execute("SELECT op, args FROM ops WHERE seq > ? ORDER BY seq", (start,)):
+            model.replay(op, pickle.loads(args))
+            replayed += 1
+        return replayed
+
+    def attach(self, model) -> None:
+        self.model = model
+        model.journal = self
+
+    def clear(self) -> None:
+        """Forget the session (a new sheet starts)."""
+        self._write("DELETE FROM ops", "DELETE FROM snapshots",
+                    ("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (STATE_VERSION,)),
+                    "DELETE FROM meta WHERE key = 'exported'")
+        self._ops = self._bytes = self._snapshot_bytes = 0
+
+    def mark_exported(self, position: int) -> None:
+        """The sheet as of `position` (see position()) was saved by the user."""
+        self._write(("INSERT OR REPLACE INTO meta VALUES ('exported', ?)", (position,)))
+
+    def close(self) -> None:
+        """Snapshot what the log holds (a quick next start) and release the lock."""
+        if self.db is None:
+            return
+        if self._ops and self.model is not None:
+            self.snapshot()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    # ── Recording ──────────────────────────────────────────────────
+    def record(self, op: str, args: tuple) -> None:
+        if self.db is None:
+            return
+        blob = pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write(("INSERT INTO ops (op, args) VALUES (?, ?)", (op, blob)))
+        self._ops += 1
+        self._bytes += len(blob)
+        if self._ops >= SNAPSHOT_OPS or self._bytes >= max(SNAPSHOT_BYTES, self._snapshot_bytes):
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """Write the whole model once and drop the log rows it covers."""
+        if self.db is None:
+            return
+        state = pickle.dumps(self.model.__getstate__(), protocol=pickle.HIGHEST_PROTOCOL)
+        seq = self.position()
+        self._write(("INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (seq, state)),
+                    ("DELETE FROM snapshots WHERE seq < ?", (seq,)),
+                    ("DELETE FROM ops WHERE seq <= ?", (seq,)))
+        self._ops = self._bytes = 0
+        self._snapshot_bytes = len(state)
+
+    # ── Internals ──────────────────────────────────────────────────
+    def _write(self, *statements) -> None:
+        """Run the statements in one transaction; a failure switches the journal off."""
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                self.db.execute("BEGIN")
+                for statement in statements:
+                    if isinstance(statement, str):
+                        self.db.execute(statement)
+                    else:
+                        self.db.execute(*statement)
+        except sqlite3.Error as exc:
+            self.db.close()
+            self.db = None
+            if self.on_error is not None:
+                self.on_error(exc)
+
+    def _meta(self, key: str, default):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Order-sheet I/O shared by 表單.py (writer) and 訊息.py (reader).
+
+  • .xlsx is read through openpyxl's read-only row iterator and written through a
+    write-only workbook, so neither side builds openpyxl's full cell-object model.
+  • .csv (UTF-8 with BOM so Excel opens it) and .parquet (needs pyarrow) use the
+    same column layout: one header row, then the sheet rows as they are.
+  • read_sheet() returns the same DataFrame as pd.read_excel(path) for .xlsx files.
+  • pandas and openpyxl are imported by the functions that need them, so importing
+    this module (e.g. for the file dialogs' filetypes) costs nothing.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import 計時
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ── File formats ────────────────────────────────────────────────────
+EXCEL_SUFFIXES   = {".xlsx", ".xlsm"}
+SHEET_SUFFIXES   = EXCEL_SUFFIXES | {".xls", ".csv", ".parquet"}
+OPEN_FILETYPES   = [("訂單表", "*.xlsx *.xls *.csv *.parquet"),
+                    ("Excel 活頁簿", "*.xlsx *.xls"),
+                    ("CSV", "*.csv"),
+                    ("Parquet", "*.parquet")]
+SAVE_FILETYPES   = [("Excel 活頁簿", "*.xlsx"),
+                    ("CSV", "*.csv"),
+                    ("Parquet", "*.parquet")]
+WRITE_CHUNK_ROWS = 10_000              # rows converted to Python objects at a time
+
+# Excel error values, which openpyxl hands back as plain strings in values_only mode
+_ERROR_CODES = frozenset({"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"})
+_NAN = float("nan")
+
+# Same look as the header DataFrame.to_excel writes
+HEADER_STYLE = {"bold": True, "border": "thin", "horizontal": "center", "vertical": "top"}
+
+def sheet_suffix(path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix not in SHEET_SUFFIXES:
+        raise ValueError(f"不支援的檔案格式：{suffix or '（無副檔名）'}")
+    return suffix
+
+# ── Reading ─────────────────────────────────────────────────────────
+def _cell_value(value):
+    """openpyxl value → what pandas' openpyxl reader yields (None → "", 2.0 → 2, errors → NaN)."""
+    if value is None:
+        return ""
+    if type(value) is float:
+        as_int = int(value)
+        return as_int if as_int == value else value
+    if type(value) is str and value in _ERROR_CODES:
+        return _NAN
+    return value
+
+def iter_xlsx_rows(path):
+    """Rows of the first worksheet as lists, streamed; trailing empty cells trimmed."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()           # saved dimensions are often wrong
+        for values in ws.iter_rows(values_only=True):
+            row = [_cell_value(v) for v in values]
+            while row and row[-1] == "":
+                row.pop()
+            yield row
+    finally:
+        wb.close()
+
+def read_xlsx(path) -> "pd.DataFrame":
+    """
+    pd.read_excel(path) without the per-cell objects: row iterator → TextParser.
+    Every row is held as a list of values until TextParser has built the columns,
+    so peak memory still grows with the sheet, about as much as pd.read_excel.
+    """
+    import pandas as pd
+    from pandas.io.parsers import TextParser
+
+    rows, last = [], -1
+    for row in iter_xlsx_rows(path):
+        if row:
+            last = len(rows)
+        rows.append(row)
+    del rows[last + 1:]
+    if not rows:
+        return pd.DataFrame()
+    width = max(map(len, rows))
+    for row in rows:
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+    return TextParser(rows, header=0, skip_blank_lines=False).read()
+
+def read_sheet(path) -> "pd.DataFrame":
+    with 計時.span("工作表.read", "讀取工作表") as sp:
+        df = _read_any(path)
+        sp.count(rows=len(df), columns=len(df.columns))
+    return df
+
+def _read_any(path) -> "pd.DataFrame":
+    suffix = sheet_suffix(path)
+    if suffix in EXCEL_SUFFIXES:
+        return read_xlsx(path)
+    import pandas as pd
+    if suffix == ".csv":
+        return pd.read_csv(path, encoding="utf-8-sig")
+    if suffix == ".parquet":
+        _require_pyarrow()
+        return pd.read_parquet(path)
+    return pd.read_excel(path)          # legacy .xls goes through xlrd
+
+# ── Writing ─────────────────────────────────────────────────────────
+def _iter_value_rows(df: "pd.DataFrame"):
+    """DataFrame rows as plain Python lists, a chunk at a time; blanks / NaN → None."""
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        block = df.iloc[start:start + WRITE_CHUNK_ROWS].astype(object).to_numpy().tolist()
+        for row in block:
+            yield [None if v is None or v != v or v == "" else v for v in row]
+
+def write_xlsx(df: "pd.DataFrame", path) -> None:
+    """Same sheet as df.to_excel(path, index=False), streamed through a write-only workbook."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    side = Side(style=HEADER_STYLE["border"])
+    font = Font(bold=HEADER_STYLE["bold"])
+    border = Border(left=side, right=side, top=side, bottom=side)
+    alignment = Alignment(horizontal=HEADER_STYLE["horizontal"],
+                          vertical=HEADER_STYLE["vertical"])
+    header = []
+    for name in df.columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font, cell.border, cell.alignment = font, border, alignment
+        header.append(cell)
+    ws.append(header)
+    for row in _iter_value_rows(df):
+        ws.append(row)
+    wb.save(path)
+
+def write_parquet(df: "pd.DataFrame", path) -> None:
+    # Quantity columns mix ints and “M+1” strings, which Arrow cannot store in one
+    # column; keep them as text (訊息.py parses "2" and 2 the same way).
+    _require_pyarrow()
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = [None if v is None or v != v else str(v) for v in df[col]]
+    df.columns = [str(c) for c in df.columns]
+    df.to_parquet(path, index=False)
+
+def write_sheet(df: "pd.DataFrame", path) -> None:
+    with 計時.span("工作表.write", "寫入工作表") as sp:
+        sp.count(rows=len(df), columns=len(df.columns))
+        _write_any(df, path)
+
+def _write_any(df: "pd.DataFrame", path) -> None:
+    suffix = sheet_suffix(path)
+    if suffix == ".csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    elif suffix == ".parquet":
+        write_parquet(df, path)
+    elif suffix in EXCEL_SUFFIXES:
+        write_xlsx(df, path)
+    else:
+        raise ValueError("無法寫入 .xls，請改存成 .xlsx")
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("讀寫 Parquet 需要安裝 pyarrow：pip install pyarrow") from None
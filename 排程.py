@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Background jobs for the Tk tools (表單.py, 訊息.py, 統計.py).
+
+  • JobRunner.submit() runs fn(job, *args) on a worker thread; its result or
+    exception is handed back on the Tk thread (a queue polled with after), so
+    callbacks may touch widgets and workers never do.
+  • Jobs with the same key replace each other: submitting a new one cancels the
+    old job and whatever the old one returns is dropped.
+  • Workers report progress with job.progress(done, total) and stop early at
+    job.check(); both raise JobCancelled once the job was cancelled.
+  • quiet=True jobs (background polling) stay off the progress line.
+  • JobStatusBar is a ready-made status line (text, progress bar, 取消 button).
+"""
+
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """Raised inside a worker once its job was cancelled or replaced."""
+
+class Job:
+    """Handle shared by the worker (progress / check) and the Tk thread (cancel)."""
+
+    def __init__(self, key, label: str, cancellable: bool, quiet: bool = False):
+        self.key = key
+        self.label = label
+        self.cancellable = cancellable
+        self.quiet = quiet                  # never shown by on_progress (periodic polls)
+        self.done = 0                       # progress, written by the worker and
+        self.total: int | None = None       # read by the Tk thread on its next poll
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        if self.cancellable:
+            self._cancel.set()
+
+    def check(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled
+
+    def progress(self, done: int, total: int | None = None) -> None:
+        self.done, self.total = done, total
+        self.check()
+
+class JobRunner:
+    POLL_MS = 50
+
+    def __init__(self, widget: tk.Misc, max_workers: int = 1, on_progress=None):
+        """
+        widget      – any widget of the app; used for after() and error reporting
+        max_workers – 1 keeps jobs in submission order
+        on_progress – called on the Tk thread with the newest running job, or None when idle
+        """
+        self.widget = widget
+        self.on_progress = on_progress
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._results: queue.Queue = queue.Queue()
+        self._current: dict = {}            # key → newest job with that key
+        self._running: list[Job] = []       # submitted, result not yet delivered
+        self._polling = False
+
+    def submit(self, key, fn, *args, label: str = "", on_done=None, on_error=None,
+               on_cancel=None, cancellable: bool = True, quiet: bool = False) -> Job:
+        """Run fn(job, *args) in the pool; key=None means the job is never replaced."""
+        job = Job(key, label, cancellable, quiet)
+        if key is not None:
+            old = self._current.get(key)
+            if old is not None:
+                old.cancellable = True
+                old.cancel()
+            self._current[key] = job
+        callbacks = (on_done, on_error, on_cancel)
+
+        def run():
+            try:
+                outcome = ("done", fn(job, *args))
+            except JobCancelled:
+                outcome = ("cancelled", None)
+            except BaseException as exc:    # handed to on_error on the Tk thread
+                outcome = ("error", exc)
+            self._results.put((job, callbacks) + outcome)
+
+        self._running.append(job)
+        self._pool.submit(run)
+        self._report()
+        self._schedule()
+        return job
+
+    def cancel_all(self) -> None:
+        for job in self._running:
+            job.cancel()
+
+    def shutdown(self) -> None:
+        """Cancel everything and stop accepting work (call when the window closes)."""
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._running)
+
+    # ── Tk-thread side ─────────────────────────────────────────────
+    def _schedule(self) -> None:
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def _poll(self) -> None:
+        self._polling = False
+        while True:
+            try:
+                job, (on_done, on_error, on_cancel), status, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._running.remove(job)
+            replaced = job.key is not None and self._current.get(job.key) is not job
+            if job.key is not None and not replaced:
+                del self._current[job.key]
+            if replaced:
+                continue                    # a newer job with this key owns the UI
+            if status == "cancelled" or job.cancelled:
+                if on_cancel:
+                    on_cancel()
+            elif status == "error":
+                if on_error:
+                    on_error(value)
+                else:
+                    self.widget.report_callback_exception(type(value), value,
+                                                          value.__traceback__)
+            elif on_done:
+                on_done(value)
+        self._report()
+        if self._running:
+            self._schedule()
+
+    def _report(self) -> None:
+        if self.on_progress:
+            shown = [job for job in self._running if not job.quiet]
+            self.on_progress(shown[-1] if shown else None)
+
+class JobStatusBar(tk.Frame):
+    """Status text + progress bar + 取消 button; pass .show as JobRunner's on_progress."""
+
+    def __init__(self, parent, idle_text: str = "準備就緒", **kw):
+        super().__init__(parent, **kw)
+        self.idle_text = idle_text
+        self._job: Job | None = None
+        self.label = tk.Label(self, text=idle_text, anchor="w")
+        self.bar = ttk.Progressbar(self, length=160, mode="determinate")
+        self.cancel_btn = tk.Button(self, text="取消", command=self._cancel)
+        self.label.pack(side="left", fill="x", expand=True, padx=6)
+
+    def set_text(self, text: str) -> None:
+        """Text shown while idle (e.g. how long the last operation took)."""
+        self.idle_text = text
+        if self._job is None:
+            self.label.config(text=text)
+
+    def show(self, job: Job | None) -> None:
+        if job is None:
+            if self._job is not None:
+                self.bar.stop()
+                self.bar.pack_forget()
+                self.cancel_btn.pack_forget()
+                self.label.config(text=self.idle_text)
+            self._job = None
+            return
+        if self._job is None:
+            self.cancel_btn.pack(side="right", padx=6, pady=2)
+            self.bar.pack(side="right", padx=6, pady=2)
+        if job is not self._job:
+            self.bar.stop()
+            self.bar.config(mode="determinate", value=0)
+        self._job = job
+        text = job.label or "處理中"
+        if job.cancelled:
+            text += "（取消中…）"
+        elif job.total:
+            text += f"… {job.done}/{job.total}"
+            self.bar.config(mode="determinate", maximum=job.total, value=job.done)
+        else:
+            text += "…"
+            if str(self.bar.cget("mode")) != "indeterminate":
+                self.bar.config(mode="indeterminate")
+                self.bar.start(15)
+        self.label.config(text=text)
+        self.cancel_btn.config(state="normal" if job.cancellable and not job.cancelled
+                               else "disabled")
+
+    def _cancel(self) -> None:
+        if self._job is not None:
+            self._job.cancel()
+            self.show(self._job)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Counting core of 統計.py · importable without a window.
+
+  • ProductCodes: which product codes count — single letters (A+1) by default,
+    or listed codes such as A1、AB、草莓 — compiled once into the one regex every
+    counter below scans with.
+  • count_comments: product counts, the '+n' total and line diagnostics of a
+    whole paste in one pass, fed in chunks of whole lines; switching between
+    the two statistics needs no second pass.
+  • count_products / count_total: one-shot counts of NFKC-normalised text.
+  • LineCounts: the same counts kept per line, so live mode only re-parses
+    the lines an edit touched.
+  • StreamCounts: the same counts over text that only grows (follow mode).
+"""
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from copy import deepcopy
+from itertools import compress, count, islice
+from operator import gt, methodcaller
+
+# ── product codes ─────────────────────────────────────────────
+DEFAULT_CODE = r"[A-Za-z]"                          # one letter, as in A+1、b 2、C*3
+RE_CODE_LIST = re.compile(r"[,，、;；\s]+")           # separators of a typed code list
+RE_PASSTHROUGH = re.compile(r"[\s\+\*]*")             # lines a match can run across
+TOTAL = None                                        # key of the '+n' total in change sets
+CHUNK_CHARS = 1 << 20                               # count_comments feeds ~this much at a time
+UNMATCHED_SHOWN = 20                                # unmatched lines kept as examples
+_GROUP = methodcaller("group")
+
+
+class ProductCodes:
+    """The order regex for one product-code pattern (a regex matching one code)."""
+
+    def __init__(self, pattern: str = DEFAULT_CODE):
+        try:
+            code = re.compile(pattern)
+        except re.error as exc:
+            raise ValueError(f"商品代碼格式錯誤：{exc}") from exc
+        if code.fullmatch(""):
+            raise ValueError("商品代碼不能比對到空字串")
+        self.pattern = pattern
+        # One scan yields both statistics: the first branch is the product regex
+        # CODE\s*[\+\*]?\s*(\d+) with its operator captured, and every operator it
+        # consumes is exactly a '+n' the total regex [\+\*]\s*(\d+) would find there;
+        # the second branch picks up the remaining '+n'.
+        self.order = re.compile(rf"(?P<code>{pattern})\s*(?P<op>[\+\*])?\s*(?P<num>\d+)"
+                                rf"|[\+\*]\s*(?P<plus>\d+)")
+        # The same matches without groups, and the newlines no match runs across:
+        # findall hands out the texts alone, so a paste is scanned in C
+        self.tokens = re.compile(rf"(?:{pattern})\s*[\+\*]?\s*\d+|[\+\*]\s*\d+|\n")
+        self.products = re.compile(rf"(?P<code>{pattern})\s*[\+\*]?\s*(?P<num>\d+)")
+        # A match may still continue on later lines
+        self.open_tail = re.compile(rf"(?:{pattern}|[\+\*])[\s\+\*]*\Z")
+
+    @classmethod
+    def from_codes(cls, codes, letters: bool = True) -> "ProductCodes":
+        """Exactly these codes (NFKC, case-insensitive, longest first), plus single letters."""
+        listed = {unicodedata.normalize("NFKC", c).strip() for c in codes} - {""}
+        parts = []
+        if listed:
+            ordered = sorted(listed, key=lambda c: (-len(c), c))
+            parts.append(f"(?i:{'|'.join(map(re.escape, ordered))})")
+        if letters:
+            parts.append(DEFAULT_CODE)
+        if not parts:
+            raise ValueError("沒有任何商品代碼")
+        return cls("|".join(parts))
+
+    def tokenize(self, text: str, end: int) -> list[str]:
+        """Match texts and the remaining newlines of text[:end], in order."""
+        if self.tokens.groups:                  # the code pattern has groups of its own
+            return list(map(_GROUP, self.tokens.finditer(text, 0, end)))
+        return self.tokens.findall(text, 0, end)
+
+    def __eq__(self, other):
+        return isinstance(other, ProductCodes) and other.pattern == self.pattern
+
+    def __hash__(self):
+        return hash(self.pattern)
+
+    def __reduce__(self):
+        return ProductCodes, (self.pattern,)    # pickled as its pattern (follow-mode state)
+
+
+DEFAULT_CODES = ProductCodes()
+
+
+def parse_codes(text: str) -> ProductCodes:
+    """Codes as typed (“A1, AB, 草莓”); single letters always count, blank means only them."""
+    return ProductCodes.from_codes(RE_CODE_LIST.split(text))
+
+
+def _order_match(m, shift=0):
+    """(start, end, product, qty, plus_qty) for one ProductCodes.order match."""
+    code, op, num, plus = m.group("code", "op", "num", "plus")
+    if code is not None:
+        qty = int(num)
+        return (m.start() + shift, m.end() + shift, code.upper(), qty,
+                qty if op else None)
+    return (m.start() + shift, m.end() + shift, None, 0, int(plus))
+
+
+# ── incremental counting ──────────────────────────────────────
+class _Line:
+    """Cached parse of one line of the comment area."""
+    __slots__ = ("text", "matches", "tail", "passthrough", "blank",
+                 "consumed", "applied", "unmatched")
+
+    def __init__(self, raw: str, codes: ProductCodes):
+        self.text = unicodedata.normalize("NFKC", raw)
+        self.matches = [_order_match(m) for m in codes.order.finditer(self.text)]
+        self.tail = codes.open_tail.search(self.text)   # where later lines may change the matches
+        self.passthrough = RE_PASSTHROUGH.fullmatch(self.text) is not None
+        self.blank = not self.text.strip()
+        self.consumed = -1      # prefix eaten by a match started on an earlier line
+        self.applied = []       # matches currently counted for this line
+        self.unmatched = False  # text that no match starts on or runs into
+
+
+class LineCounts:
+    """
+    Counts of the whole text kept as per-line results.
+
+    Because \s also matches newlines, a match may start on one line, run across
+    lines holding only whitespace / operators and end on the next line with
+    digits (“Amy⏎2” counts Y 2).  Such a match is owned by the line it starts
+    on and recorded in the `consumed` prefix of the line it ends on, so a splice
+    only revisits the edited lines, the pass-through lines just before them and
+    the lines whose carried state actually changed.
+    """
+
+    def __init__(self, counts: dict[str, int], codes: ProductCodes = DEFAULT_CODES):
+        self.counts = counts                    # product → qty (shared with the UI)
+        self.codes = codes                      # takes effect at the next reset()
+        self.hits: dict[str, int] = defaultdict(int)
+        self.total = 0
+        self.unmatched = 0                      # non-blank lines no match touches
+        self.lines: list[_Line] = []
+
+    def reset(self, texts) -> set:
+        self.counts.clear()
+        self.hits.clear()
+        self.total = 0
+        self.unmatched = 0
+        self.lines = [_Line(t, self.codes) for t in texts]
+        changed: set = set()
+        self._settle(0, len(self.lines) - 1, changed)
+        return changed
+
+    def splice(self, start: int, old_count: int, texts) -> set:
+        """Replace lines[start:start+old_count] by `texts`; return changed keys."""
+        changed: set = set()
+        for line in self.lines[start:start + old_count]:
+            self._apply(line.applied, -1, changed)
+            self.unmatched -= line.unmatched
+        self.lines[start:start + old_count] = [_Line(t, self.codes) for t in texts]
+        first = start - 1
+        while first > 0 and self.lines[first].passthrough:
+            first -= 1
+        self._settle(max(first, 0), start + len(texts) - 1, changed)
+        return changed
+
+    def unmatched_lines(self, limit: int = UNMATCHED_SHOWN) -> list[tuple[int, str]]:
+        """The first `limit` (line number from 1, text) of lines no match touches."""
+        found = []
+        for i, line in enumerate(self.lines):
+            if line.unmatched:
+                found.append((i + 1, line.text))
+                if len(found) >= limit:
+                    break
+        return found
+
+    def _settle(self, first: int, last: int, changed: set) -> None:
+        lines = self.lines
+        carry_to, carry = -1, 0
+        for i in range(first, len(lines)):
+            line = lines[i]
+            if i == first:
+                consumed = line.consumed if i > 0 else 0
+            elif i < carry_to:
+                consumed = len(line.text) + 1   # wholly inside a match, even when empty
+            elif i == carry_to:
+                consumed = carry
+            else:
+                consumed = 0
+            if i > last and i >= carry_to and consumed == line.consumed:
+                break
+
+            self._apply(line.applied, -1, changed)
+            line.consumed = consumed
+            if consumed > 0:                    # the scan resumes where the carried match ended
+                applied = [_order_match(m) for m in self.codes.order.finditer(line.text, consumed)]
+                tail = self.codes.open_tail.search(line.text, consumed)
+            else:
+                applied, tail = line.matches, line.tail
+            if tail:
+                # Matches reaching into the open tail (a code ending in a digit, “A1 +”)
+                # are scanned again together with the lines after it
+                applied = [m for m in applied if m[1] <= tail.start()]
+                more, to, end = self._crossing(i, applied[-1][1] if applied else max(consumed, 0))
+                applied += more
+                if to >= 0:
+                    carry_to, carry = to, end
+            line.applied = applied
+            self._apply(applied, +1, changed)
+            unmatched = not (line.blank or applied or consumed > 0)
+            self.unmatched += unmatched - line.unmatched
+            line.unmatched = unmatched
+
+    def _crossing(self, i: int, pos: int):
+        """
+        Matches starting on line i at/after `pos`, scanned together with the
+        pass-through lines after it and the next other line: (matches, line the
+        last one ends on or -1 when none runs across, its end on that line).
+        """
+        parts, j = [self.lines[i].text[pos:]], i
+        for j in range(i + 1, len(self.lines)):
+            parts.append(self.lines[j].text)
+            if not self.lines[j].passthrough:
+                break
+        window = "\n".join(parts)
+        found = []
+        for m in self.codes.order.finditer(window):
+            if m.start() >= len(parts[0]):
+                break
+            found.append(_order_match(m, pos))
+            if m.end() > len(parts[0]):
+                return found, j, m.end() - (len(window) - len(parts[-1]))
+        return found, -1, 0
+
+    def _apply(self, matches, sign: int, changed: set) -> None:
+        for _, _, product, qty, plus in matches:
+            if product is not None:
+                self.counts[product] += sign * qty
+                self.hits[product] += sign
+                if not self.hits[product]:
+                    del self.counts[product], self.hits[product]
+                changed.add(product)
+            if plus is not None:
+                self.total += sign * plus
+                changed.add(TOTAL)
+
+
+class StreamCounts:
+    """
+    count_products and count_total of a text that arrives in pieces of whole
+    lines, plus line diagnostics. The line holding a trailing “A +” or “+”
+    (ProductCodes.open_tail) may still get its digits from the next piece, so
+    it is held back in `carry`, unscanned, and scanned with that piece; every
+    match before it is complete, so the totals equal the one-shot counts of all
+    the text fed so far. finish() settles the last line once nothing more will
+    come.
+    """
+
+    def __init__(self, codes: ProductCodes = DEFAULT_CODES):
+        self.codes = codes
+        self.counts: dict[str, int] = defaultdict(int)
+        self.total = 0
+        self.lines = 0                          # newlines fed
+        self.matched = 0                        # lines a match starts on or runs into
+        self.unmatched = 0                      # other lines that are not blank
+        self.unmatched_lines: list[tuple[int, str]] = []  # first few: (line number from 1, text)
+        self.carry = ""
+        self._first_line = 0                    # line number (from 0) the carry starts on
+
+    def feed(self, text: str) -> set:
+        """Count the new text (raw, normalised here); return the changed keys."""
+        new = unicodedata.normalize("NFKC", text)
+        self.lines += new.count("\n")
+        return self._scan(self.carry + new, final=False)
+
+    def finish(self) -> set:
+        """Count what is still held back (the end of the text was reached)."""
+        return self._scan(self.carry, final=True)
+
+    def settled(self, tail: str = "") -> "StreamCounts":
+        """A copy that has also counted `tail` and finished, as if the text ended there."""
+        if not (tail or self.carry):
+            return self
+        copy = deepcopy(self)
+        copy.feed(tail)
+        copy.finish()
+        return copy
+
+    def _scan(self, text: str, final: bool) -> set:
+        end = len(text)
+        if not final:
+            end = text.rfind("\n") + 1         # whole lines only …
+            while tail := self.codes.open_tail.search(text, 0, end):
+                end = text.rfind("\n", 0, tail.start()) + 1    # … none a match may run on from
+        self.carry = text[end:]
+        tokens = self.codes.tokenize(text, end)
+        changed: set = set()
+        # Counted per distinct match text: a paste repeats few of them
+        for token, n in Counter(tokens).items():
+            if token == "\n":
+                continue
+            code, op, num, plus = self.codes.order.match(token).group("code", "op", "num", "plus")
+            if code is not None:
+                product, qty = code.upper(), int(num) * n
+                self.counts[product] += qty
+                changed.add(product)
+                if op:
+                    self.total += qty
+                    changed.add(TOTAL)
+            else:
+                self.total += int(plus) * n
+                changed.add(TOTAL)
+        # Every newline is a token or inside one, so line k of the joined tokens
+        # is what the matches left of line k: empty when none touched it
+        touched = list(map(bool, "".join(tokens).split("\n")))
+        lines = text[:end].split("\n")
+        if not final:
+            touched.pop()                       # after the last newline: nothing yet
+            lines.pop()
+        self._settle_lines(lines, touched)
+        return changed
+
+    def _settle_lines(self, lines: list[str], touched: list[bool]) -> None:
+        self.matched += sum(touched)
+        unmatched = list(map(gt, map(bool, map(str.strip, lines)), touched))
+        self.unmatched += sum(unmatched)
+        wanted = UNMATCHED_SHOWN - len(self.unmatched_lines)
+        for k in islice(compress(count(), unmatched), max(wanted, 0)):
+            self.unmatched_lines.append((self._first_line + k + 1, lines[k]))
+        self._first_line += len(lines)
+
+
+# ── one-shot counting ─────────────────────────────────────────
+def count_comments(comments: str, codes: ProductCodes = DEFAULT_CODES, job=None) -> StreamCounts:
+    """
+    Everything 統計.py shows for a paste, in one pass over the raw text: counts,
+    total and line diagnostics. The text is normalised and scanned CHUNK_CHARS
+    of whole lines at a time; `job` (排程.Job) can cancel between chunks.
+    """
+    stream = StreamCounts(codes)
+    start = 0
+    while start < len(comments):
+        stop = comments.find("\n", start + CHUNK_CHARS) + 1 or len(comments)
+        stream.feed(comments[start:stop])
+        start = stop
+        if job is not None:
+            job.check()
+    stream.finish()
+    return stream
+
+def count_products(comments: str, codes: ProductCodes = DEFAULT_CODES) -> dict[str, int]:
+    """Per-product totals of A+1、b 2、C*3 (case-insensitive) in NFKC-normalised text."""
+    counts: dict[str, int] = defaultdict(int)
+    if codes.products.groups == 2:              # no groups of its own: findall pairs
+        pairs = codes.products.findall(comments)
+    else:
+        pairs = (m.group("code", "num") for m in codes.products.finditer(comments))
+    for code, num in pairs:
+        counts[code.upper()] += int(num)
+    return counts
+
+def count_total(comments: str) -> int:
+    """Sum of every '+n' / '*n' in NFKC-normalised text."""
+    return sum(int(n) for n in re.findall(r"[\+\*]\s*(\d+)", comments))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Follow mode · read comment files that keep growing during a live sale.
+
+  • TailFile remembers how far a file was read (a byte offset) and only reads
+    what was appended since, whole lines at a time. Appends of MMAP_BYTES or more
+    are read through mmap.
+  • A last line without a newline (Notepad and most exports save files that way)
+    stays unread, but once the file stops growing it is offered as `pending`
+    text: callers count it provisionally and count it again, from the saved
+    offset, when the line grows or gets its newline.
+  • A file that shrank, or whose bytes just before the offset changed (exported
+    again from scratch), is reported as rewritten and read from the start.
+  • Follower polls comment files and drop folders (every *.txt, new files too)
+    and saves the offsets together with the caller's running totals in one
+    atomic write, so a restart resumes where it stopped instead of re-parsing.
+    The state is a pickle, so by default it lives in the cache directory
+    (state_path), never in a drop folder others can write to.
+"""
+
+import codecs
+import hashlib
+import mmap
+import os
+import pickle
+import threading
+from pathlib import Path
+
+FOLLOW_DIR = "follow"           # state files, inside the cache directory
+MMAP_BYTES = 1 << 20            # appends at least this big are read through mmap
+BLOCK_BYTES = 8 << 20           # text handed out per block (bounded memory on a first read)
+ANCHOR_BYTES = 4096             # bytes before the offset checked for a rewrite
+STATE_VERSION = 1
+
+def state_path(kind: str, *followed) -> Path:
+    """
+    Default state file of one follow setup, keyed by `kind` and the followed
+    paths, in the upload cache directory (GROUP_BUYING_CACHE, ~/.cache/group_buying).
+    """
+    key = "\0".join([kind, *(os.path.abspath(p) for p in followed)])
+    digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=12).hexdigest()
+    directory = os.environ.get("GROUP_BUYING_CACHE") or Path.home() / ".cache" / "group_buying"
+    return Path(directory) / FOLLOW_DIR / f"{kind}-{digest}.pkl"
+
+# ── One file ────────────────────────────────────────────────────────
+class TailFile:
+    """Byte offset into one comment file plus a digest of the bytes just before it."""
+
+    def __init__(self, path: str, offset: int = 0, anchor: bytes = b""):
+        self.path = path
+        self.offset = offset
+        self.anchor = anchor
+        self.pending = ""                   # unfinished last line of a file that stopped growing
+        self._size = None                   # file size at the previous blocks()
+
+    def check(self) -> bool:
+        """True (and back to offset 0) when the text already read is no longer there."""
+        if self.offset == 0:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size >= self.offset and self._digest(f) == self.anchor:
+                    return False
+        except OSError:
+            return False                    # deleted or locked: keep what it contributed
+        self.offset, self.anchor, self.pending = 0, b"", ""
+        return True
+
+    def blocks(self):
+        """Decoded whole lines appended since the last call, at most ~BLOCK_BYTES at a time."""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return                          # gone or locked by the writer: next poll
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            stable, self._size = size == self._size, size
+            if size - self.offset >= MMAP_BYTES:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    yield from self._split(f, view, 0, size)
+            elif size > self.offset:
+                f.seek(self.offset)
+                yield from self._split(f, f.read(size - self.offset), self.offset, size)
+            # Left over: a last line with no newline yet. Still growing means the
+            # writer is mid-line; unchanged since the last poll means it is done
+            self.pending = self._tail(f, size) if stable and size > self.offset else ""
+
+    def _split(self, f, buf, base: int, end: int):
+        # buf[pos - base] is the byte at file offset pos
+        while self.offset < end:
+            stop = min(self.offset + BLOCK_BYTES, end)
+            cut = buf.rfind(b"\n", self.offset - base, stop - base)
+            if cut < 0:
+                cut = buf.find(b"\n", stop - base, end - base)   # one very long line
+                if cut < 0:
+                    return                  # unfinished last line: wait for more
+            chunk = buf[self.offset - base:cut + 1]
+            if self.offset == 0 and chunk.startswith(codecs.BOM_UTF8):
+                chunk = chunk[len(codecs.BOM_UTF8):]
+            # Offset and anchor move before the text is handed out, so a caller
+            # that stops early never sees a block twice
+            self.offset = base + cut + 1
+            self.anchor = self._digest(f)
+            yield chunk.decode("utf-8", errors="replace")
+
+    def _tail(self, f, size: int) -> str:
+        f.seek(self.offset)
+        chunk = f.read(size - self.offset)
+        if self.offset == 0 and chunk.startswith(codecs.BOM_UTF8):
+            chunk = chunk[len(codecs.BOM_UTF8):]
+        return chunk.decode("utf-8", errors="replace")
+
+    def _digest(self, f) -> bytes:
+        start = max(0, self.offset - ANCHOR_BYTES)
+        f.seek(start)
+        return hashlib.blake2b(f.read(self.offset - start), digest_size=16).digest()
+
+# ── Files and folders ───────────────────────────────────────────────
+class Follower:
+    """
+    Polls comment files and drop folders. poll() yields (path, text, rewritten):
+    the new whole lines of a file, or ("", True) first when a file was rewritten
+    and the caller should forget what it parsed from it. After a poll, pending()
+    holds the unfinished last lines to count provisionally.
+    """
+
+    def __init__(self, files=(), folders=()):
+        self.files = [os.path.abspath(p) for p in files]
+        self.folders = [os.path.abspath(p) for p in folders]
+        self.tails: dict[str, TailFile] = {}
+
+    def paths(self) -> list[str]:
+        """Followed files: the given ones, then each folder's *.txt by name."""
+        paths = dict.fromkeys(self.files)
+        for folder in self.folders:
+            paths.update(dict.fromkeys(str(p) for p in sorted(Path(folder).glob("*.txt"))))
+        return list(paths)
+
+    def poll(self):
+        for path in self.paths():
+            tail = self.tails.get(path)
+            if tail is None:
+                tail = self.tails[path] = TailFile(path)
+            if tail.check():
+                yield path, "", True
+            for text in tail.blocks():
+                yield path, text, False
+
+    def pending(self) -> dict[str, str]:
+        """path → unfinished last line of each file that stopped growing (see TailFile)."""
+        return {path: tail.pending for path, tail in self.tails.items() if tail.pending}
+
+    # ── Saved state ────────────────────────────────────────────────
+    def save(self, path, payload) -> None:
+        """Offsets plus `payload` (the caller's totals), replaced atomically."""
+        offsets = {p: (t.offset, t.anchor) for p, t in self.tails.items()}
+        data = pickle.dumps((STATE_VERSION, offsets, payload), protocol=pickle.HIGHEST_PROTOCOL)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def load(self, path):
+        """Restore offsets saved by save() and return its payload (None: start from scratch)."""
+        try:
+            with open(path, "rb") as f:
+                version, offsets, payload = pickle.load(f)
+        except Exception:
+            return None                     # missing or unreadable: read everything again
+        if version != STATE_VERSION:
+            return None
+        self.tails = {p: TailFile(p, offset, anchor) for p, (offset, anchor) in offsets.items()}
+        return payload
@@ -4,45 +4,277 @@
 Order Counter with dual modes:
   • Mode "product": counts each product code (A+1, B+2 …).
   • Mode "total"  : sums all '+n' regardless of product codes.
+One pass over the comments fills both, so switching modes never recounts.
+Product codes are single letters unless 商品代碼 lists longer ones (A1, AB, 草莓).
+Lines no order matches are listed under 無法判讀的行.
 Supports full-width / half-width characters via Unicode NFKC normalization.
+Live mode keeps a per-line cache and re-parses only the edited lines.
+Follow mode (`python 統計.py --follow 留言.txt`) counts comment files as they grow,
+reading only the new bytes; a restart resumes from the saved offsets.
+The counting itself lives in 數量統計.py (no window, importable on its own).
 """
 
-import re
-import unicodedata
+import sys
+import time
+import argparse
+import bisect
 from collections import defaultdict
+from datetime import datetime
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
+from 數量統計 import (DEFAULT_CODES, TOTAL, LineCounts, ProductCodes, StreamCounts,
+                  count_comments, parse_codes)
+from 排程 import JobRunner, JobStatusBar
+from 留言追蹤 import Follower, state_path
+import 計時
 
-# ── main window ───────────────────────────────────────────────
-root = tk.Tk()
-root.title("Order Counter")
-root.geometry("500x600")
+# ── live counting ─────────────────────────────────────────────
+class LiveText:
+    """Forwards every insert/delete/replace of a tk.Text to a LineCounts splice."""
 
+    def __init__(self, widget: tk.Text, counts: LineCounts, on_change):
+        self.widget, self.counts, self.on_change = widget, counts, on_change
+        self.active = False
+        self._orig = widget._w + "_orig"
+        widget.tk.call("rename", widget._w, self._orig)
+        widget.tk.createcommand(widget._w, self._proxy)
+
+    def start(self) -> None:
+        """Parse the whole buffer once; later edits are spliced in."""
+        self.active = True
+        self.counts.reset(str(self._call("get", "1.0", "end-1c")).split("\n"))
+
+    def stop(self) -> None:
+        self.active = False
+
+    def _call(self, *args):
+        return self.widget.tk.call((self._orig,) + args)
+
+    def _line(self, index) -> int:
+        return int(str(self._call("index", index)).split(".")[0])
+
+    def _proxy(self, *args):
+        if not self.active or not args or args[0] not in ("insert", "delete", "replace"):
+            return self._call(*args)
+        last_line = self._line("end-1c")
+        if args[0] == "insert":
+            touched = [args[1]]
+        elif args[0] == "delete":
+            touched = list(args[1:])
+            if len(touched) % 2:                # “delete i1” removes one character
+                touched.append(f"{touched[-1]}+1c")
+        else:
+            touched = list(args[1:3])
+        rows = [min(self._line(ix), last_line) for ix in touched]
+        first, last = min(rows), max(rows)
+
+        result = self._call(*args)
+        new_last = last + self._line("end-1c") - last_line
+        text = self._call("get", f"{first}.0", f"{new_last}.end")
+        self.on_change(self.counts.splice(first - 1, last - first + 1,
+                                          str(text).split("\n")))
+        return result
+
+
+# ── background counting ───────────────────────────────────────
+def count_text(job, comments_raw: str, codes: ProductCodes) -> StreamCounts:
+    """Worker side of 計算統計: counts, '+n' total and unmatched lines of the raw text."""
+    with 計時.span("統計.count", "統計留言") as sp:
+        result = count_comments(comments_raw, codes, job)
+        sp.count(lines=result.lines, unmatched=result.unmatched)
+    return result
+
+
+# ── follow mode ───────────────────────────────────────────────
+def run_follow(files, folders, mode: str, interval: float, state: str | None = None,
+               codes: ProductCodes = DEFAULT_CODES) -> int:
+    """Print the running counts of growing comment files whenever they change."""
+    follower = Follower(files, folders)
+    state = state or state_path("統計", *files, *folders)
+    streams = follower.load(state)              # path → StreamCounts
+    if streams is not None and any(getattr(s, "codes", None) != codes for s in streams.values()):
+        print("商品代碼已變更，重新統計", file=sys.stderr)
+        streams, follower.tails = None, {}      # counted with other codes: start over
+    if streams is None:
+        streams = {}
+    else:                                       # files no longer followed drop out
+        followed = set(follower.paths())
+        streams = {path: s for path, s in streams.items() if path in followed}
+    shown = format_counts(settled_counts(streams, {}, codes), mode)
+    if streams:
+        print(shown)
+    print("追蹤中，按 Ctrl+C 結束", file=sys.stderr)
+    try:
+        while True:
+            changed = False
+            with 計時.span("統計.follow", "追蹤留言") as sp:
+                lines = sum(s.lines for s in streams.values())
+                for path, text, rewritten in follower.poll():
+                    if rewritten:               # count it again from the start
+                        streams[path] = StreamCounts(codes)
+                        changed = True
+                    else:
+                        stream = streams.get(path)
+                        if stream is None:
+                            stream = streams[path] = StreamCounts(codes)
+                        changed |= bool(stream.feed(text))
+                sp.count(lines=sum(s.lines for s in streams.values()) - lines)
+            if changed:
+                try:
+                    follower.save(state, streams)
+                except OSError as exc:
+                    print(f"⚠ 無法儲存追蹤進度 {state}：{exc}", file=sys.stderr)
+            # Printed as if every file ended now; a line still open is counted again later
+            text = format_counts(settled_counts(streams, follower.pending(), codes), mode)
+            if text != shown:
+                print(f"{datetime.now():%H:%M:%S} {text}")
+                shown = text
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+
+def settled_counts(streams, pending, codes: ProductCodes) -> dict:
+    """path → StreamCounts.settled(): held-back lines and unfinished last lines counted."""
+    return {path: streams.get(path, StreamCounts(codes)).settled(pending.get(path, ""))
+            for path in streams.keys() | pending.keys()}
+
+def format_counts(streams, mode: str) -> str:
+    """The 複製結果 text of the files' combined counts."""
+    if mode != "product":
+        return str(sum(s.total for s in streams.values()))
+    counts: dict[str, int] = defaultdict(int)
+    for stream in streams.values():
+        for product, qty in stream.counts.items():
+            counts[product] += qty
+    return ",".join(f"{p}.{c}" for p, c in sorted(counts.items()))
+
+def _arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="留言商品數量統計（不帶參數時開啟視窗）")
+    ap.add_argument("--follow", nargs="*", default=None, metavar="留言檔",
+                    help="持續追蹤這些留言檔，新留言一寫入就更新統計")
+    ap.add_argument("--folder", action="append", default=[], metavar="資料夾",
+                    help="一併追蹤資料夾內所有 .txt（包含之後新增的檔案）")
+    ap.add_argument("--mode", choices=("product", "total"), default="product",
+                    help="product：依產品統計（預設）；total：僅計算 +n 總量")
+    ap.add_argument("--codes", default="", metavar="代碼",
+                    help="多字元商品代碼，逗號分隔（如 \"A1, AB, 草莓\"）；單一字母一律計入")
+    ap.add_argument("--code-pattern", default=None, metavar="正規表示式",
+                    help="直接以正規表示式指定商品代碼（取代 --codes）")
+    ap.add_argument("--interval", type=float, default=2.0, metavar="秒",
+                    help="檢查新留言的間隔秒數（預設 2）")
+    ap.add_argument("--state", default=None, metavar="檔案",
+                    help="追蹤進度檔（預設在快取資料夾，依追蹤的檔案區分），重新啟動時從上次讀到的位置繼續")
+    return ap
+
+
+# ── statistics state ──────────────────────────────────────────
 order_count: dict[str, int] = defaultdict(int)  # per-product counts
 total_qty: int = 0                               # grand total for '+n' mode
-mode_var = tk.StringVar(value="product")         # default statistics mode
+line_counts = LineCounts(order_count)            # per-line cache for live mode
+last_result: StreamCounts | None = None          # the last 計算統計, for 無法判讀的行
 
 # ── functions ─────────────────────────────────────────────────
 def calculate_statistics() -> None:
     """Parse the comment area and refresh the result table."""
     global total_qty
-    comments_raw = text_input.get("1.0", tk.END)
-    comments = unicodedata.normalize("NFKC", comments_raw)   # full-width → half-width
+    if live_var.get():
+        live_text.start()           # full rebuild of the line cache
+        show_live()
+        return
+    # Counting runs on a worker; a newer click replaces a count still in progress
+    jobs.submit("count", count_text, text_input.get("1.0", tk.END), line_counts.codes,
+                label="統計中", on_done=show_counts)
 
+def show_counts(result: StreamCounts) -> None:
+    """Put a finished count_text result into the table (Tk thread); both modes at once."""
+    global total_qty, last_result
+    if live_var.get():              # live mode took over meanwhile
+        return
     order_count.clear()
-    total_qty = 0
-    tree.delete(*tree.get_children())
+    order_count.update(result.counts)
+    total_qty = result.total
+    last_result = result
+    render_table()
+    timing = 計時.summary()
+    if timing:
+        status_bar.set_text(timing)
 
+def render_table() -> None:
+    """Show the cached statistics of the current mode (no re-parsing)."""
+    tree.delete(*tree.get_children())
     if mode_var.get() == "product":
-        # Capture like A+1、b 2、C*3 (case-insensitive)
-        for letter, num in re.findall(r"([A-Za-z])\s*[\+\*]?\s*(\d+)", comments):
-            order_count[letter.upper()] += int(num)
         for product, count in sorted(order_count.items()):
-            tree.insert("", tk.END, values=(product, count))
-    else:  # total mode
-        numbers = [int(n) for n in re.findall(r"[\+\*]\s*(\d+)", comments)]
-        total_qty = sum(numbers)
-        tree.insert("", tk.END, values=("TOTAL", total_qty))
+            tree.insert("", tk.END, iid=product, values=(product, count))
+    else:
+        tree.insert("", tk.END, iid="TOTAL", values=("TOTAL", total_qty))
+
+def show_live() -> None:
+    global total_qty
+    total_qty = line_counts.total
+    render_table()
+
+def on_live_change(changed: set) -> None:
+    """Apply a LineCounts change set: only rows whose values moved are touched."""
+    global total_qty
+    total_qty = line_counts.total
+    if mode_var.get() != "product":
+        if TOTAL in changed:
+            if tree.exists("TOTAL"):
+                tree.item("TOTAL", values=("TOTAL", total_qty))
+            else:
+                render_table()
+        return
+    for product in changed - {TOTAL}:
+        if product not in order_count:
+            if tree.exists(product):
+                tree.delete(product)
+        elif not tree.exists(product):
+            index = bisect.bisect_left(sorted(order_count), product)
+            tree.insert("", index, iid=product, values=(product, order_count[product]))
+        elif tree.set(product, "count") != str(order_count[product]):
+            tree.set(product, "count", order_count[product])
+
+def toggle_live() -> None:
+    if live_var.get():
+        live_text.start()
+        show_live()
+    else:
+        live_text.stop()
+
+def on_mode_change() -> None:
+    render_table()                  # both modes are counted already
+
+def apply_codes(event=None) -> None:
+    """Use the 商品代碼 typed in; live mode recounts with them at once."""
+    global last_result
+    try:
+        codes = parse_codes(codes_var.get())
+    except ValueError as exc:
+        messagebox.showwarning("商品代碼無效", str(exc))
+        return
+    if codes == line_counts.codes:
+        return
+    line_counts.codes = codes
+    last_result = None              # counted with the old codes
+    if live_var.get():
+        live_text.start()
+        show_live()
+
+def show_unmatched() -> None:
+    """List the first lines no order matched (typos, unknown codes, chatter)."""
+    if live_var.get():
+        count, lines = line_counts.unmatched, line_counts.unmatched_lines()
+    elif last_result is not None:
+        count, lines = last_result.unmatched, last_result.unmatched_lines
+    else:
+        messagebox.showinfo("無法判讀的行", "請先計算統計")
+        return
+    if not count:
+        messagebox.showinfo("無法判讀的行", "每一行都有判讀到訂購")
+        return
+    shown = "\n".join(f"第 {number} 行：{text.strip()}" for number, text in lines)
+    more = f"\n…（共 {count} 行）" if count > len(lines) else ""
+    messagebox.showinfo("無法判讀的行", shown + more)
 
 def copy_to_clipboard() -> None:
     """Copy statistics to clipboard in a compact form."""
@@ -57,53 +289,101 @@ def copy_to_clipboard() -> None:
 
 def clear_all() -> None:
     """Clear text input, table and stored statistics."""
+    jobs.cancel_all()
     text_input.delete("1.0", tk.END)
     tree.delete(*tree.get_children())
     order_count.clear()
-    global total_qty
+    global total_qty, last_result
     total_qty = 0
+    last_result = None
+
+# The window is only built when run as a script; importing this module never opens one.
+if __name__ == "__main__":
+    ap = _arg_parser()
+    args = ap.parse_args()
+    try:
+        codes = (ProductCodes(args.code_pattern) if args.code_pattern is not None
+                 else parse_codes(args.codes))
+    except ValueError as exc:
+        ap.error(str(exc))
+    if args.follow is not None or args.folder:
+        if not (args.follow or args.folder):
+            sys.exit("請指定要追蹤的留言檔或 --folder 資料夾")
+        sys.exit(run_follow(args.follow or [], args.folder, args.mode,
+                            args.interval, args.state, codes))
+    line_counts.codes = codes
+
+    # ── main window ───────────────────────────────────────────────
+    root = tk.Tk()
+    root.title("Order Counter")
+    root.geometry("500x600")
+
+    mode_var = tk.StringVar(value="product")         # default statistics mode
+    live_var = tk.BooleanVar(value=False)            # recount while typing
+    codes_var = tk.StringVar(value=args.codes if args.code_pattern is None else "")
+
+    # ── widgets ───────────────────────────────────────────────────
+    # status line with progress / cancel for background counting
+    status_bar = JobStatusBar(root)
+    status_bar.pack(side="bottom", fill="x")
+    jobs = JobRunner(root, on_progress=status_bar.show)
+
+    # input label + text box with scrollbar
+    tk.Label(root, text="請輸入留言資料：").pack(pady=5)
+    text_frame = tk.Frame(root)
+    text_frame.pack(pady=10)
+
+    text_input = tk.Text(text_frame, height=10, width=50, wrap="word")
+    scrollbar = tk.Scrollbar(text_frame, command=text_input.yview)
+    text_input.config(yscrollcommand=scrollbar.set)
+    text_input.pack(side="left", fill="both")
+    scrollbar.pack(side="right", fill="y")
+    live_text = LiveText(text_input, line_counts, on_live_change)
+
+    # product codes longer than one letter
+    codes_frame = tk.Frame(root)
+    codes_frame.pack(pady=5)
+    tk.Label(codes_frame, text="商品代碼：").pack(side="left")
+    codes_entry = tk.Entry(codes_frame, textvariable=codes_var, width=24)
+    codes_entry.pack(side="left")
+    codes_entry.bind("<Return>", apply_codes)
+    codes_entry.bind("<FocusOut>", apply_codes)
+    tk.Label(codes_frame, text="逗號分隔，如 A1, AB, 草莓；空白＝單一字母",
+             fg="gray").pack(side="left", padx=5)
+
+    # mode selection
+    mode_frame = tk.Frame(root)
+    mode_frame.pack(pady=5)
+    tk.Radiobutton(mode_frame, text="依產品統計 (A+1)", variable=mode_var,
+                   value="product", command=on_mode_change).pack(side="left", padx=5)
+    tk.Radiobutton(mode_frame, text="僅計算 +n 總量", variable=mode_var,
+                   value="total", command=on_mode_change).pack(side="left", padx=5)
+    tk.Checkbutton(mode_frame, text="即時統計", variable=live_var,
+                   command=toggle_live).pack(side="left", padx=5)
+
+    # result table
+    result_frame = tk.Frame(root)
+    result_frame.pack(pady=10)
+
+    tree = ttk.Treeview(result_frame, columns=("product", "count"),
+                        show="headings", height=15)
+    tree.heading("product", text="產品")
+    tree.heading("count", text="數量")
+    tree.column("product", width=100, anchor="center")
+    tree.column("count", width=100, anchor="center")
+    tree.pack(side="left", padx=10)
+
+    # buttons
+    button_frame = tk.Frame(root)
+    button_frame.pack(pady=10)
+
+    tk.Button(button_frame, text="計算統計",
+              command=calculate_statistics).pack(side="left", padx=10)
+    tk.Button(button_frame, text="複製結果",
+              command=copy_to_clipboard).pack(side="left", padx=10)
+    tk.Button(button_frame, text="無法判讀的行",
+              command=show_unmatched).pack(side="left", padx=10)
+    tk.Button(button_frame, text="清除",
+              command=clear_all).pack(side="left", padx=10)
 
-# ── widgets ───────────────────────────────────────────────────
-# input label + text box with scrollbar
-tk.Label(root, text="請輸入留言資料：").pack(pady=5)
-text_frame = tk.Frame(root)
-text_frame.pack(pady=10)
-
-text_input = tk.Text(text_frame, height=10, width=50, wrap="word")
-scrollbar = tk.Scrollbar(text_frame, command=text_input.yview)
-text_input.config(yscrollcommand=scrollbar.set)
-text_input.pack(side="left", fill="both")
-scrollbar.pack(side="right", fill="y")
-
-# mode selection
-mode_frame = tk.Frame(root)
-mode_frame.pack(pady=5)
-tk.Radiobutton(mode_frame, text="依產品統計 (A+1)", variable=mode_var,
-               value="product").pack(side="left", padx=5)
-tk.Radiobutton(mode_frame, text="僅計算 +n 總量", variable=mode_var,
-               value="total").pack(side="left", padx=5)
-
-# result table
-result_frame = tk.Frame(root)
-result_frame.pack(pady=10)
-
-tree = ttk.Treeview(result_frame, columns=("product", "count"),
-                    show="headings", height=15)
-tree.heading("product", text="產品")
-tree.heading("count", text="數量")
-tree.column("product", width=100, anchor="center")
-tree.column("count", width=100, anchor="center")
-tree.pack(side="left", padx=10)
-
-# buttons
-button_frame = tk.Frame(root)
-button_frame.pack(pady=10)
-
-tk.Button(button_frame, text="計算統計",
-          command=calculate_statistics).pack(side="left", padx=10)
-tk.Button(button_frame, text="複製結果",
-          command=copy_to_clipboard).pack(side="left", padx=10)
-tk.Button(button_frame, text="清除",
-          command=clear_all).pack(side="left", padx=10)
-
-root.mainloop()
+    root.mainloop()
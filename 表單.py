@@ -4,96 +4,55 @@
 FB group-buy order-sheet generator · v2.6
   • Supports automatic accumulation for the same customer when using the pattern “String+Number”.
   • Global font family / size can be changed via constants at the top of the file.
+  • Headless batch mode: `python 表單.py --post 商品 留言.txt [--post …] -o 訂單.xlsx`
+    streams comment dumps (or stdin via “-”) line by line without opening a window.
+  • Folder ingestion (GUI button or `--folder DIR`): one .txt per product, named after
+    the product, parsed in a process pool and merged in file order.
+  • Export streams .xlsx through a write-only workbook; .csv / .parquet share the layout (see 工作表.py).
+  • Parsing, merging, table refreshes and exports are timed (see 計時.py); the last
+    timings show in the status bar, `--timing` prints them in batch mode.
+  • The parsing / merging logic lives in 訂單解析.py; pandas is only loaded once a
+    table is exported, so the window opens without it.
+  • Follow mode (追蹤資料夾 button or `--follow`): comment files that keep growing
+    during a live sale are read from where the last poll stopped (see 留言追蹤.py)
+    and only the new orders are merged; a restart resumes from the saved offsets.
+  • Buyer names are NFKC-normalized and matched case-, space- and ·-insensitively, so
+    one customer keeps one row; 相似姓名 lists near duplicates to merge (see 姓名比對.py).
+  • Every change to the sheet is journaled (see 工作紀錄.py); after a crash or a close
+    without 匯出 Excel the next start offers to restore the sheet.
+  • Pasting a post again under the same product (新增商品) only parses its new and
+    edited comments and swaps them in, instead of counting the post twice.
 """
 
-import re
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import tkinter.font as tkfont           # ← new import
-from collections import defaultdict, OrderedDict
-import pandas as pd
+from 訂單解析 import (PostStreams, SheetModel, cell_value, export_frame, folder_posts,
+                  parse_posts)
+from 工作表 import SAVE_FILETYPES, write_sheet
+from 排程 import JobRunner, JobStatusBar
+from 留言追蹤 import Follower, state_path
+from 姓名比對 import similar_names
+from 工作紀錄 import SessionBusy, SessionJournal
+import 計時
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ── Global font settings ─────────────────────────────────────────────
 DEFAULT_FONT_FAMILY = "Segoe UI"        # Change to "Microsoft JhengHei" for Chinese UI, etc.
 DEFAULT_FONT_SIZE   = 14                # Adjust font size here
 APP_FONT = (DEFAULT_FONT_FAMILY, DEFAULT_FONT_SIZE)
 
-# ── Regular expressions ─────────────────────────────────────────────
-RE_NAME_PLUS = re.compile(r'^([\u4e00-\u9fa5\u00C0-\u024F A-Za-z\s·\._-]+?)\s*[\+\*]\s*([0-9]+)\s*$')
-RE_NAME_LINE = re.compile(r'^[\u4e00-\u9fa5\u00C0-\u024F A-Za-z\s·\._-]+$')
-RE_PURE_NUM    = re.compile(r'^\s*\+?\s*([0-9]+)\s*$')
-RE_ANY_LETTER_PLUS = re.compile(r'[A-Za-z]\s*[\+\*]\s*\d+')
-RE_TIME        = re.compile(r'^\d+\s*(天|日|週|周|小時|分鐘)$')
-NOISE_WORDS    = {"回覆", "翻譯年糕"}
-RE_STR_QTY     = re.compile(r'^(.*?)(?:\s*)[\+\*]\s*(\d+)$')        # Generic “string+qty”
-
-# ── Sort keys ───────────────────────────────────────────────────────
-def buyer_key(name: str):
-    first = name.lstrip()[0]
-    return (0, name.casefold()) if first.isascii() and first.isalpha() else (1, name)
-
-def item_key(item: str):
-    first = item.lstrip()[0]
-    return (0, item.casefold()) if first.isascii() and first.isalpha() else (1, item)
-
-# ── Parsing logic ───────────────────────────────────────────────────
-def parse_orders(text: str) -> dict[str, object]:
-    buyers = defaultdict(lambda: None)      # type: ignore
-    current: str | None = None              # remember current buyer name
-
-    for raw in text.splitlines():
-        line = raw.strip()
-
-        # ── Noise filtering ──
-        if (not line or "已編輯" in line or line in NOISE_WORDS or RE_TIME.match(line)):
-            continue
-
-        # Same-line “Name +2”
-        m = RE_NAME_PLUS.match(line)
-        if m:
-            _merge_val(buyers, m.group(1).strip(), int(m.group(2)))
-            current = None
-            continue
-
-        # New buyer’s name line
-        if RE_NAME_LINE.match(line):
-            current = line
-            continue
-
-        # Quantity / combo line (may be multiple lines)
-        if current is not None:
-            _store_qty(buyers, current, line)
-
-    return dict(buyers)
-
-def _store_qty(buyers, name, line):
-    if RE_PURE_NUM.match(line) and not RE_ANY_LETTER_PLUS.search(line):
-        _merge_val(buyers, name, int(RE_PURE_NUM.match(line).group(1)))   # type: ignore
-    else:
-        _merge_val(buyers, name, line)
-
-def _merge_val(dic, key, new):
-    """Merge `new` into dic[key]; auto-sum if both are numeric or share same prefix."""
-    old = dic.get(key)
-
-    # Two original cases remain the same
-    if old in (None, ''):
-        dic[key] = new
-        return
-    if isinstance(old, int) and isinstance(new, int):
-        dic[key] = old + new
-        return
-
-    # New: handle “same prefix string+number” accumulation
-    s_old, s_new = str(old).strip(), str(new).strip()
-    m_old, m_new = RE_STR_QTY.match(s_old), RE_STR_QTY.match(s_new)
-
-    if m_old and m_new and m_old.group(1) == m_new.group(1):
-        qty_sum = int(m_old.group(2)) + int(m_new.group(2))
-        dic[key] = f"{m_old.group(1)}+{qty_sum}"
-    else:
-        # Different prefixes → deduplicate and join with space
-        dic[key] = " ".join(sorted({s_old, s_new}))
+# ── Follow mode ─────────────────────────────────────────────────────
+FOLLOW_MS = 2000                        # GUI poll interval
 
 # ── GUI application ─────────────────────────────────────────────────
 class App(tk.Tk):
@@ -106,11 +65,35 @@ class App(tk.Tk):
         self.option_add("*Font", APP_FONT)
         self._tune_tree_style()
 
-        # {buyer: {item: qty/str}}
-        self.data = defaultdict(lambda: OrderedDict())
-        self.df_display: pd.DataFrame | None = None
+        # {buyer: {item: qty/str/Tally}} plus sort order / change tracking
+        self.model = SheetModel()
+        self._row_ids: dict[str, str] = {}      # buyer → Treeview item id
+        self._col_ids: dict[str, str] = {}      # item  → Treeview column id
+        # Called with every take_changes() batch once the table shows it
+        self.change_listeners: list = []
+        # folder → (Follower, PostStreams, state file); kept after 停止追蹤 so
+        # following the same folder again continues instead of re-reading it
+        self._follows: dict[str, tuple] = {}
+        self._following: str | None = None
+        self._follow_pending: set[str] = set()  # folders with a poll in flight
         self._build_ui()
 
+        # Parsing / export run on one worker thread, so adds are merged in click order
+        self.jobs = JobRunner(self, max_workers=1, on_progress=self.status.show)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Every merge is journaled (工作紀錄.py); opened once the window is up
+        self.journal: SessionJournal | None = None
+        self.after(0, self._open_session)
+
+    @property
+    def data(self):
+        return self.model.data
+
+    @property
+    def df_display(self) -> "pd.DataFrame | None":
+        """Rebuilt lazily, only when something (export) reads it."""
+        return self.model.frame()
+
     # Customise ttk.Treeview fonts and row height
     def _tune_tree_style(self):
         style = ttk.Style(self)
@@ -133,11 +116,18 @@ class App(tk.Tk):
         self.txt_post = tk.Text(top, width=80, height=10, wrap="word")
         self.txt_post.grid(row=2, column=0, columnspan=2, sticky="we", pady=(0, 4))
 
-        btns = ttk.Frame(top)
+        self.btns = btns = ttk.Frame(top)
         btns.grid(row=3, column=0, columnspan=2, sticky="we")
         ttk.Button(btns, text="新增商品", command=self.on_add).pack(side="left", padx=4)
+        ttk.Button(btns, text="批次匯入資料夾", command=self.on_add_folder).pack(side="left", padx=4)
+        self.follow_btn = ttk.Button(btns, text="追蹤資料夾", command=self.on_follow)
+        self.follow_btn.pack(side="left", padx=4)
+        ttk.Button(btns, text="相似姓名", command=self.on_similar_names).pack(side="left", padx=4)
         ttk.Button(btns, text="匯出 Excel", command=self.on_export).pack(side="left", padx=4)
 
+        self.status = JobStatusBar(self)
+        self.status.pack(side="bottom", fill="x")
+
         tblfrm = ttk.Frame(self)
         tblfrm.pack(fill="both", expand=True, padx=8, pady=4)
         self.tree = ttk.Treeview(tblfrm, show="headings")
@@ -154,57 +144,430 @@ class App(tk.Tk):
         if not item:
             messagebox.showwarning("缺少商品名稱", "請輸入『商品名稱』")
             return
-
-        buyers = parse_orders(self.txt_post.get("1.0", "end"))
-        if not buyers:
-            messagebox.showwarning("無符合格式", "找不到任何有效訂購資訊")
+        text = self.txt_post.get("1.0", "end")
+
+        def done(plan):
+            # Pasting a post again only merges its new / edited comments
+            new, buyers = self.model.paste(item, text, plan)
+            if new and not buyers:
+                messagebox.showwarning("無符合格式", "找不到任何有效訂購資訊")
+                return
+            if not buyers:
+                messagebox.showinfo("沒有新留言", f"「{item}」的這篇貼文已匯入過，沒有新增或修改的留言")
+            # Only clear the inputs if nobody started typing the next post meanwhile
+            if self.ent_item.get().strip() == item and self.txt_post.get("1.0", "end") == text:
+                self.ent_item.delete(0, "end")
+                self.txt_post.delete("1.0", "end")
+            self._refresh_tree()
+
+        self.jobs.submit(None, lambda job: self.model.plan_paste(item, text),
+                         label=f"解析「{item}」", on_done=done)
+
+    def on_add_folder(self):
+        folder = filedialog.askdirectory(title="選擇留言資料夾（每個商品一個 .txt）")
+        if not folder:
+            return
+        posts = folder_posts(folder)
+        if not posts:
+            messagebox.showwarning("沒有檔案", "資料夾內找不到 .txt 留言檔")
             return
 
-        for buyer, val in buyers.items():
-            _merge_val(self.data[buyer], item, val)
-
-        self.ent_item.delete(0, "end")
-        self.txt_post.delete("1.0", "end")
-        self._refresh_tree()
+        def done(results):
+            empty = []
+            for (item, path), buyers in zip(posts, results):
+                if buyers:
+                    self.model.merge(item, buyers)
+                else:
+                    empty.append(Path(path).name)
+
+            self._refresh_tree()
+            if empty:
+                messagebox.showwarning("部分檔案無符合格式",
+                                       "找不到有效訂購資訊：\n" + "\n".join(empty))
+
+        self.jobs.submit("folder", lambda job: parse_posts(p for _, p in posts),
+                         label=f"解析 {len(posts)} 個留言檔", on_done=done)
+
+    def on_follow(self):
+        if self._following is not None:
+            self._following = None
+            self.follow_btn.config(text="追蹤資料夾")
+            return
+        folder = filedialog.askdirectory(title="選擇要追蹤的留言資料夾（每個商品一個 .txt）")
+        if not folder:
+            return
+        folder = os.path.abspath(folder)
+        if folder not in self._follows:
+            follower = Follower(folders=[folder])
+            state = state_path("表單", folder)
+            streams = follower.load(state)
+            if streams is None:
+                streams = PostStreams()
+            else:                           # orders read before the last exit; the
+                for path, buyers in streams.posts.items():   # restored sheet may hold them already
+                    if buyers:
+                        self.model.replace(Path(path).stem, buyers)
+                self._refresh_tree()
+            self._follows[folder] = (follower, streams, state)
+        self._following = folder
+        self.follow_btn.config(text="停止追蹤")
+        self._poll_follow()
+
+    def _poll_follow(self):
+        folder = self._following
+        if folder is None or folder in self._follow_pending:
+            return
+        follower, streams, state = self._follows[folder]
+
+        def read(job):
+            events = follow_step(follower, streams)
+            try:
+                if events:
+                    follower.save(state, streams)
+            except OSError as exc:          # keep the orders; only resuming is affected
+                return events, f"無法儲存追蹤進度：{exc}"
+            return events, None
+
+        def done(result):
+            self._follow_pending.discard(folder)
+            events, warning = result
+            # Applied even after 停止追蹤: the saved state already counts them
+            if apply_follow(self.model, streams, events):
+                self._refresh_tree()
+            if warning:
+                self.status.set_text(warning)
+            if self._following == folder:
+                self.after(FOLLOW_MS, self._poll_follow)
+
+        def failed(exc):
+            self._follow_pending.discard(folder)
+            self._following = None
+            self.follow_btn.config(text="追蹤資料夾")
+            messagebox.showerror("追蹤失敗", str(exc))
+
+        # Never replaced or cancelled: a dropped poll would leave the table behind the offsets
+        self._follow_pending.add(folder)
+        self.jobs.submit(None, read, label="追蹤留言", cancellable=False, quiet=True,
+                         on_done=done, on_error=failed)
+
+    def on_similar_names(self):
+        names = [buyer for buyer in self.model.buyers if self.data[buyer]]
+        if not names:
+            messagebox.showwarning("無資料", "請先新增商品")
+            return
+        self.jobs.submit("names", lambda job: similar_names(names),
+                         label="比對相似姓名", on_done=self._pick_merges,
+                         on_error=lambda exc: messagebox.showerror("比對相似姓名失敗", str(exc)))
+
+    def _pick_merges(self, pairs):
+        """List near-duplicate buyers; the selected ones are folded into the row with more orders."""
+        merges = []
+        for a, b, score in pairs:
+            if self.data[a] and self.data[b]:           # not merged away meanwhile
+                keep, drop = (a, b) if len(self.data[a]) >= len(self.data[b]) else (b, a)
+                merges.append((drop, keep, score))
+        if not merges:
+            messagebox.showinfo("沒有相似姓名", "找不到可能是同一人的訂購人")
+            return
+        window = tk.Toplevel(self)
+        window.title("相似姓名")
+        ttk.Label(window, text="選取要合併的訂購人（左邊併入右邊）").pack(anchor="w", padx=8, pady=(8, 0))
+        box = tk.Listbox(window, selectmode="extended", width=48, height=16, font=APP_FONT)
+        box.pack(fill="both", expand=True, padx=8, pady=4)
+        for drop, keep, score in merges:
+            box.insert("end", f"{drop} → {keep}（{score:.0%}）")
+
+        def merge():
+            for k in box.curselection():
+                self.model.merge_buyers(merges[k][0], merges[k][1])
+            window.destroy()
+            self._refresh_tree()
+
+        ttk.Button(window, text="合併所選", command=merge).pack(pady=(0, 8))
 
     def on_export(self):
         if self.df_display is None or self.df_display.empty:
             messagebox.showwarning("無資料", "目前沒有可匯出的資料")
             return
         path = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                            filetypes=[("Excel 活頁簿", "*.xlsx")])
-        if path:
-            self._export_df().to_excel(path, index=False)
+                                            filetypes=SAVE_FILETYPES)
+        if not path:
+            return
+        # The frame is built here on the Tk thread, so later merges can't race the writer
+        df = self._export_df()
+        position = self.journal.position() if self.journal else 0
+
+        def done(_):
+            if self.journal:
+                self.journal.mark_exported(position)
+            self._show_timing()
             messagebox.showinfo("已匯出", f"檔案已儲存至：\n{path}")
 
+        self.jobs.submit(
+            "export", lambda job: write_sheet(df, path), label="匯出中", cancellable=False,
+            on_done=done,
+            on_error=lambda exc: messagebox.showerror("匯出失敗", str(exc)))
+
+    def _on_close(self):
+        self._following = None
+        self.jobs.shutdown()
+        if self.journal:
+            self.journal.close()
+        self.destroy()
+
+    # ── Session journal ─────────────────────────────────────────────
+    def _open_session(self):
+        """Open the journal; offer back the sheet of a session that ended before its export."""
+        try:
+            journal = SessionJournal(on_error=self._journal_failed)
+        except SessionBusy:
+            self.status.set_text("另一個視窗正在使用工作紀錄，這個視窗的變更不會自動保存")
+            return
+        except Exception as exc:                # no journal is no reason not to work
+            self.status.set_text(f"無法開啟工作紀錄，變更不會自動保存：{exc}")
+            return
+        if journal.pending() and messagebox.askyesno(
+                "還原訂單表", "上次的訂單表還沒匯出就關閉了，要還原嗎？"):
+            restored = SheetModel()
+            try:
+                with 計時.span("表單.restore", "還原訂單表") as sp:
+                    journal.restore(restored)
+                    sp.count(buyers=len(restored.buyers), products=len(restored.items))
+            except Exception as exc:
+                messagebox.showerror("無法還原", f"工作紀錄已損毀，將從空白的訂單表開始：{exc}")
+                journal.clear()
+            else:
+                self.model.__setstate__(restored.__getstate__())
+                self._refresh_tree(self.model.take_all())
+        else:
+            journal.clear()
+        journal.attach(self.model)
+        self.journal = journal
+
+    def _journal_failed(self, exc):
+        self.status.set_text(f"無法寫入工作紀錄，之後的變更不會自動保存：{exc}")
+
     # ── Helpers ────────────────────────────────────────────────────
-    def _refresh_tree(self):
-        items = sorted({it for od in self.data.values() for it in od}, key=item_key)
-        buyers = sorted(self.data.keys(), key=buyer_key)
-
-        rows = [dict(self.data[b]) for b in buyers]
-        df = pd.DataFrame(rows, index=buyers).reindex(columns=items).fillna("")
-        df.index.name = "姓名"
-        df.reset_index(inplace=True)
-        self.df_display = df
-
-        self.tree.delete(*self.tree.get_children())
-        self.tree["columns"] = list(df.columns)
-        for col in df.columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, anchor="center",
-                             width=max(80, int(len(col) * 14)))
-        for _, row in df.iterrows():
-            self.tree.insert("", "end", values=list(row))
-
-    def _export_df(self) -> pd.DataFrame:
+    def _refresh_tree(self, changes=None):
+        """Patch the Treeview with what the merges since the last refresh changed."""
+        if changes is None:
+            changes = self.model.take_changes()
+        with 計時.span("表單.refresh", "更新表格") as sp:
+            self._patch_tree(sp, changes)
+        for listener in self.change_listeners:
+            listener(changes)
+        self._show_timing()
+
+    def _show_timing(self):
+        text = 計時.summary()
+        if text:
+            self.status.set_text(text)
+
+    def _patch_tree(self, sp, changes):
+        new_items, new_buyers, touched = changes
+        sp.count(rows=len(new_buyers), cells=sum(map(len, touched.values())))
+        if new_items:
+            self._add_columns([item for _, item in new_items])
+        for pos, buyer in new_buyers:
+            self._row_ids[buyer] = self.tree.insert("", pos, values=self._row_values(buyer))
+        fresh = {buyer for _, buyer in new_buyers}
+        for buyer, items in touched.items():
+            if buyer in fresh:
+                continue
+            row = self.data[buyer]
+            for item in items:
+                value = cell_value(row[item]) if item in row else ""
+                self.tree.set(self._row_ids[buyer], self._col_ids[item], value)
+
+    def _add_columns(self, items):
+        # Values are stored per column id in insertion order; the sorted layout
+        # only lives in displaycolumns, so existing rows never need rewriting.
+        for item in items:
+            self._col_ids[item] = f"c{len(self._col_ids)}"
+        self.tree["columns"] = ["姓名"] + list(self._col_ids.values())
+        self.tree["displaycolumns"] = ["姓名"] + [self._col_ids[it] for it in self.model.items]
+        for cid, text in [("姓名", "姓名")] + [(c, it) for it, c in self._col_ids.items()]:
+            self.tree.heading(cid, text=text)
+            self.tree.column(cid, anchor="center", width=max(80, int(len(text) * 14)))
+
+    def _row_values(self, buyer: str) -> list:
+        row = self.data[buyer]
+        return [buyer] + [cell_value(row[item]) if item in row else "" for item in self._col_ids]
+
+    def _export_df(self) -> "pd.DataFrame":
         if self.df_display is None:
             raise ValueError("No DataFrame to export.")
-        df = self.df_display.copy()
-        df.insert(0, 'Unnamed: 0', '')
-        df.rename(columns={'姓名': 'Unnamed: 1'}, inplace=True)
-        return df
+        return export_frame(self.df_display)
+
+# ── Headless batch mode ────────────────────────────────────────────
+def run_batch(posts, output: str, jobs: int | None = None) -> int:
+    """Equivalent of pressing 新增商品 for every (item, path) pair, then 匯出 Excel."""
+    model = SheetModel()
+    # stdin cannot be handed to a worker process
+    workers = 1 if any(path == "-" for _, path in posts) else jobs
+    for (item, path), buyers in zip(posts, parse_posts((p for _, p in posts), workers)):
+        if not buyers:
+            print(f"⚠ {path}: 找不到任何有效訂購資訊（{item}）", file=sys.stderr)
+            continue
+        model.merge(item, buyers)
+
+    if not model.data:
+        print("無資料可匯出", file=sys.stderr)
+        return 1
+    try:
+        write_sheet(export_frame(model.frame()), output)
+    except (ImportError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"已匯出 {len(model.data)} 位買家 → {output}", file=sys.stderr)
+    return 0
+
+def follow_step(follower: Follower, streams: PostStreams) -> list:
+    """
+    Parse what the followed files gained since the last poll: (path, new orders)
+    per block read, (path, None) when the file's column must be rebuilt from
+    streams.shown(path): it was rewritten, or its unfinished last line was counted
+    provisionally and has changed (or been read for good) since.
+    """
+    events = []
+    with 計時.span("表單.follow", "追蹤留言") as sp:
+        before = streams.stats()["lines"]
+        for path, text, rewritten in follower.poll():
+            if rewritten:
+                streams.reset(path)
+                events.append((path, None))
+            else:
+                events.append((path, streams.feed(path, text)))
+        fed = {path for path, _ in events}
+        pending = follower.pending()
+        for path in pending.keys() | streams.provisional.keys():
+            shown = streams.provisional.get(path, ("", {}))[0]
+            if pending.get(path, "") != shown or (shown and path in fed):
+                streams.set_pending(path, pending.get(path, ""))
+                events.append((path, None))
+        sp.count(files=len({path for path, _ in events}),
+                 lines=streams.stats()["lines"] - before)
+    return events
+
+def apply_follow(model: SheetModel, streams: PostStreams, events, items=None) -> bool:
+    """Merge follow_step() events into the sheet; True when the sheet changed."""
+    item_of = (items or {}).get
+    rebuilt = {path for path, buyers in events if buyers is None}
+    changed = False
+    for path, buyers in events:
+        if buyers and path not in rebuilt:
+            model.merge(item_of(path) or Path(path).stem, buyers)
+            changed = True
+    for path in rebuilt:                    # rewritten, or a provisional last line moved
+        model.replace(item_of(path) or Path(path).stem, streams.shown(path))
+        changed = True
+    return changed
+
+def run_follow(posts, folders, output: str, interval: float, state: str | None = None) -> int:
+    """--follow: keep reading the comment files as they grow and rewrite `output` on changes."""
+    if any(path == "-" for _, path in posts):
+        print("追蹤模式無法讀取 stdin", file=sys.stderr)
+        return 1
+    follower = Follower([path for _, path in posts], folders)
+    items = dict(zip(follower.files, (item for item, _ in posts)))
+    state = state or state_path("表單", output)
+    streams = follower.load(state)
+    model = SheetModel()
+    if streams is None:
+        streams = PostStreams()
+    else:
+        followed = set(follower.paths())
+        for path in [path for path in streams.posts if path not in followed]:
+            streams.reset(path)             # no longer followed
+        for path, buyers in streams.posts.items():
+            if buyers:
+                model.merge(items.get(path) or Path(path).stem, buyers)
+        print(f"從上次的進度繼續（{len(model.data)} 位買家）", file=sys.stderr)
+    dirty = bool(model.data)
+    print("追蹤中，按 Ctrl+C 結束", file=sys.stderr)
+    try:
+        while True:
+            events = follow_step(follower, streams)
+            if events:
+                try:
+                    follower.save(state, streams)
+                except OSError as exc:
+                    print(f"⚠ 無法儲存追蹤進度 {state}：{exc}", file=sys.stderr)
+            dirty = apply_follow(model, streams, events, items) or dirty
+            if dirty and model.data:
+                try:
+                    _write_replacing(export_frame(model.frame()), output)
+                except OSError as exc:      # e.g. open in Excel: try again next poll
+                    print(f"⚠ 無法寫入 {output}：{exc}", file=sys.stderr)
+                else:
+                    dirty = False
+                    print(f"{datetime.now():%H:%M:%S} 已更新 {len(model.data)} 位買家、"
+                          f"{len(model.items)} 項商品 → {output}", file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+
+def _write_replacing(df: "pd.DataFrame", output: str) -> None:
+    """write_sheet to a temporary name, then swap it in: readers never see half a file."""
+    path = Path(output)
+    tmp = path.with_name(f".~{path.name}")
+    try:
+        write_sheet(df, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def print_timings() -> None:
+    for sp in 計時.take_recent():
+        print(f"⏱ {sp.describe()}", file=sys.stderr)
+
+def _arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        description="團購訂單表產生器（不帶參數時開啟視窗）")
+    ap.add_argument("--post", nargs=2, action="append", default=[],
+                    metavar=("商品名稱", "留言檔"),
+                    help="商品名稱與留言檔路徑（“-” 代表 stdin），可重複指定")
+    ap.add_argument("--folder", action="append", default=[], metavar="資料夾",
+                    help="資料夾內每個 .txt 視為一個商品（檔名即商品名稱）")
+    ap.add_argument("-o", "--output", default="訂單.xlsx",
+                    help="輸出檔（.xlsx、.csv 或 .parquet），預設 訂單.xlsx")
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="平行解析的行程數（預設為 CPU 核心數）")
+    ap.add_argument("--follow", nargs="?", type=float, const=2.0, default=None, metavar="秒",
+                    help="持續追蹤留言檔與資料夾，每隔幾秒（預設 2）讀取新留言並重寫輸出檔")
+    ap.add_argument("--state", metavar="檔案",
+                    help="追蹤進度檔（預設在快取資料夾，依輸出檔區分），重新啟動時從上次讀到的位置繼續")
+    ap.add_argument("--timing", action="store_true",
+                    help="結束時印出各步驟耗時")
+    ap.add_argument("--trace", metavar="檔案",
+                    help="把每個步驟的耗時以 JSON lines 附加到檔案")
+    ap.add_argument("--profile", metavar="檔案",
+                    help="以 cProfile 記錄各步驟，存成 pstats 檔")
+    return ap
 
 # ── Entry point ────────────────────────────────────────────────────
+def main(argv=None) -> int:
+    args = _arg_parser().parse_args(argv)
+    計時.configure(trace=args.trace, profile=args.profile)
+    posts = [tuple(p) for p in args.post]
+    if args.follow is not None:
+        if not (posts or args.folder):
+            print("請以 --post 或 --folder 指定要追蹤的留言", file=sys.stderr)
+            return 1
+        return run_follow(posts, args.folder, args.output, args.follow, args.state)
+    for folder in args.folder:
+        posts.extend(folder_posts(folder))
+    if not posts:
+        if args.post or args.folder:
+            print("找不到任何留言檔", file=sys.stderr)
+            return 1
+        App().mainloop()
+        return 0
+    status = run_batch(posts, args.output, args.jobs)
+    if args.timing:
+        print_timings()
+    return status
+
 if __name__ == "__main__":
-    App().mainloop()
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Order history · many days of order workbooks in one local columnar store.
+
+  • add() reads workbooks in the layout 訊息.py uploads (price row, then one row
+    per buyer) through OrderBook, so spend is what the messages say, and keeps
+    one row per sheet × buyer × product ordered: day, buyer, product and sheet
+    codes plus quantity and amount. Compiled books are shared with 訊息.py's
+    upload cache, so a workbook already opened there is not read again.
+  • Buyers are coded by canonical_name() (“Amy” and “ＡＭＹ” on two days are one
+    buyer), products by name. Rows are kept sorted by day: a date range is two
+    binary searches and every rollup one np.bincount over that slice.
+  • The store is one uncompressed .npz (the columns plus a JSON header) replaced
+    atomically. A workbook added again unchanged is skipped; an edited one
+    replaces its earlier rows. Queries never open the workbooks again.
+
+    python 訂單歷史.py add 2024-06-01.xlsx 2024-06-02.xlsx ...   # day from the file name
+    python 訂單歷史.py add 團購.xlsx --date 2024-06-03
+    python 訂單歷史.py buyers --from 2024-01-01 --to 2024-12-31 --top 20
+    python 訂單歷史.py products --from 2024-06-01
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from 姓名比對 import canonical_name
+import 計時
+
+HISTORY_FILE = "訂單歷史.npz"
+STORE_VERSION = 1
+COLUMNS = {                     # name → dtype; every column has one entry per row
+    "day": "int32",             # days since 1970-01-01
+    "buyer": "int32",           # index into OrderHistory.buyers
+    "product": "int32",         # index into OrderHistory.products
+    "sheet": "int32",           # index into OrderHistory.sheets
+    "quantity": "float64",
+    "amount": "float64",
+}
+DISTINCT_GRID = 64 << 20         # cells of the bitmap counting distinct pairs; a sort above
+_EPOCH = date(1970, 1, 1).toordinal()
+RE_FILE_DATE = re.compile(r"(20\d\d)[-_./年]?(\d{1,2})[-_./月]?(\d{1,2})(?!\d)")
+
+def default_path() -> Path:
+    """The store next to the upload cache (GROUP_BUYING_CACHE, ~/.cache/group_buying)."""
+    directory = os.environ.get("GROUP_BUYING_CACHE") or Path.home() / ".cache" / "group_buying"
+    return Path(directory) / HISTORY_FILE
+
+# ── Days ────────────────────────────────────────────────────────────
+def day_number(day: date) -> int:
+    return day.toordinal() - _EPOCH
+
+def day_date(number: int) -> date:
+    return date.fromordinal(int(number) + _EPOCH)
+
+def sheet_day(path) -> date:
+    """The sale day of a workbook: a date in its file name (2024-06-01, 20240601 …), else its mtime."""
+    for match in RE_FILE_DATE.finditer(Path(path).stem):
+        try:
+            return date(*map(int, match.groups()))
+        except ValueError:
+            continue
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+def parse_day(text: str | None) -> date | None:
+    return date.fromisoformat(text) if text else None
+
+# ── Store ───────────────────────────────────────────────────────────
+class OrderHistory:
+    """
+    The columnar store. open() loads it (empty when missing); add() appends
+    workbooks and save() writes it back. The rollups take an optional inclusive
+    date range and return plain lists, largest first.
+    """
+
+    def __init__(self, path=None):
+        import numpy as np
+
+        self.path = Path(path) if path is not None else default_path()
+        self.buyers: list[str] = []             # code → shown name (first spelling)
+        self.products: list[str] = []           # code → product name
+        self.sheets: list[dict | None] = []     # code → {"path", "digest", "day"}; None once replaced
+        self.columns = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self._buyer_codes: dict[str, int] = {}  # canonical name → code
+        self._product_codes: dict[str, int] = {}
+
+    @classmethod
+    def open(cls, path=None) -> "OrderHistory":
+        import numpy as np
+
+        history = cls(path)
+        try:
+            with np.load(history.path, allow_pickle=False) as store:
+                header = json.loads(store["header"].tobytes().decode("utf-8"))
+                if header["version"] != STORE_VERSION:
+                    raise ValueError(f"訂單歷史版本不符：{header['version']}")
+                history.columns = {name: store[name] for name in COLUMNS}
+        except FileNotFoundError:
+            return history
+        history.buyers, history.products = header["buyers"], header["products"]
+        history.sheets = header["sheets"]
+        history._buyer_codes = {canonical_name(b): k for k, b in enumerate(history.buyers)}
+        history._product_codes = {p: k for k, p in enumerate(history.products)}
+        return history
+
+    def __len__(self) -> int:
+        return len(self.columns["day"])
+
+    def save(self) -> None:
+        """Write the store as one .npz, replaced atomically."""
+        import numpy as np
+
+        header = {"version": STORE_VERSION, "buyers": self.buyers,
+                  "products": self.products, "sheets": self.sheets}
+        raw = np.frombuffer(json.dumps(header, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, header=raw, **self.columns)
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    # ── Adding workbooks ───────────────────────────────────────────
+    def add(self, paths, day: date | None = None, cache=None, job=None) -> tuple[int, int]:
+        """
+        Append workbooks (day None: sheet_day() of each); returns (added, skipped).
+        `cache` is a 訂購訊息.ParseCache (the upload cache by default).
+        """
+        import numpy as np
+        from 訂購訊息 import OrderBook, ParseCache
+        from 工作表 import read_sheet
+
+        cache = cache if cache is not None else ParseCache()
+        live = {s["digest"]: k for k, s in enumerate(self.sheets) if s is not None}
+        by_path = {s["path"]: k for k, s in enumerate(self.sheets) if s is not None}
+        chunks, dropped, added, skipped = [], set(), 0, 0
+        with 計時.span("訂單歷史.add", "匯入訂單歷史") as sp:
+            for path in paths:
+                if job is not None:
+                    job.check()
+                path = str(Path(path).resolve())
+                digest = cache.digest(path)
+                if digest in live:                      # same workbook (maybe a copy)
+                    skipped += 1
+                    continue
+                when = day or sheet_day(path)
+                book = cache.load(digest)
+                if book is None:
+                    data = read_sheet(path)
+                    if data.empty:
+                        skipped += 1
+                        continue
+                    book = OrderBook(data, when.strftime("%m/%d"))
+                    cache.store(digest, book)
+                if path in by_path:                     # edited since it was added
+                    dropped.add(by_path[path])
+                    self.sheets[by_path[path]] = None
+                code = len(self.sheets)
+                self.sheets.append({"path": path, "digest": digest, "day": when.isoformat()})
+                live[digest] = by_path[path] = code
+                chunks.append(self._sheet_rows(book, day_number(when), code))
+                added += 1
+            if chunks or dropped:
+                columns = self.columns
+                if dropped:
+                    keep = ~np.isin(columns["sheet"], list(dropped))
+                    columns = {name: column[keep] for name, column in columns.items()}
+                merged = {name: np.concatenate([columns[name]] + [c[name] for c in chunks])
+                          for name in COLUMNS}
+                order = np.argsort(merged["day"], kind="stable")
+                self.columns = {name: column[order] for name, column in merged.items()}
+            sp.count(files=added, rows=len(self), buyers=len(self.buyers))
+        return added, skipped
+
+    def _sheet_rows(self, book, day: int, sheet: int) -> dict:
+        import numpy as np
+
+        names, who, item, quantity, amount = book.line_items()
+        buyer_codes = np.fromiter((self._buyer_code(str(n)) for n in names), dtype=np.int32,
+                                  count=len(names))
+        product_codes = np.fromiter((self._product_code(str(p)) for p in book.item_names),
+                                    dtype=np.int32, count=len(book.item_names))
+        n = len(who)
+        return {"day": np.full(n, day, dtype=np.int32), "buyer": buyer_codes[who],
+                "product": product_codes[item], "sheet": np.full(n, sheet, dtype=np.int32),
+                "quantity": quantity, "amount": amount}
+
+    def _buyer_code(self, name: str) -> int:
+        key = canonical_name(name.strip())
+        code = self._buyer_codes.get(key)
+        if code is None:
+            code = self._buyer_codes[key] = len(self.buyers)
+            self.buyers.append(name.strip())
+        return code
+
+    def _product_code(self, name: str) -> int:
+        name = name.strip()
+        code = self._product_codes.get(name)
+        if code is None:
+            code = self._product_codes[name] = len(self.products)
+            self.products.append(name)
+        return code
+
+    # ── Rollups ────────────────────────────────────────────────────
+    def span(self, start: date | None = None, end: date | None = None) -> slice:
+        """Rows of the days start … end (inclusive; None is open)."""
+        days = self.columns["day"]
+        lo = 0 if start is None else int(days.searchsorted(day_number(start), "left"))
+        hi = len(days) if end is None else int(days.searchsorted(day_number(end), "right"))
+        return slice(lo, max(lo, hi))
+
+    def buyer_spend(self, start=None, end=None, top: int | None = None):
+        """[(buyer, amount, quantity, days with orders)], biggest spender first; `top` keeps the first n."""
+        import numpy as np
+
+        rows = self.span(start, end)
+        buyer = self.columns["buyer"][rows]
+        n = len(self.buyers)
+        amount = np.bincount(buyer, weights=self.columns["amount"][rows], minlength=n)
+        quantity = np.bincount(buyer, weights=self.columns["quantity"][rows], minlength=n)
+        days = self._distinct(buyer, self.columns["day"][rows], n)
+        codes = _largest(amount, np.flatnonzero(quantity), top)
+        return [(self.buyers[k], amount[k], quantity[k], int(days[k])) for k in codes.tolist()]
+
+    def top_buyers(self, n: int = 10, start=None, end=None):
+        return self.buyer_spend(start, end, top=n)
+
+    def product_volume(self, start=None, end=None, top: int | None = None):
+        """[(product, quantity, amount, buyers)], most ordered first."""
+        import numpy as np
+
+        rows = self.span(start, end)
+        product = self.columns["product"][rows]
+        n = len(self.products)
+        quantity = np.bincount(product, weights=self.columns["quantity"][rows], minlength=n)
+        amount = np.bincount(product, weights=self.columns["amount"][rows], minlength=n)
+        buyers = self._distinct(product, self.columns["buyer"][rows], n)
+        codes = _largest(quantity, np.flatnonzero(quantity), top)
+        return [(self.products[k], quantity[k], amount[k], int(buyers[k])) for k in codes.tolist()]
+
+    def buyer_orders(self, name: str, start=None, end=None):
+        """[(day, product, quantity, amount)] of one buyer (any spelling), oldest first."""
+        import numpy as np
+
+        code = self._buyer_codes.get(canonical_name(name.strip()))
+        if code is None:
+            return []
+        rows = self.span(start, end)
+        hits = np.flatnonzero(self.columns["buyer"][rows] == code) + rows.start
+        day, product = self.columns["day"][hits], self.columns["product"][hits]
+        quantity, amount = self.columns["quantity"][hits], self.columns["amount"][hits]
+        return [(day_date(d), self.products[p], q, a)
+                for d, p, q, a in zip(day.tolist(), product.tolist(), quantity.tolist(), amount.tolist())]
+
+    def date_range(self) -> tuple[date, date] | None:
+        days = self.columns["day"]
+        return (day_date(days[0]), day_date(days[-1])) if len(days) else None
+
+    @staticmethod
+    def _distinct(group, other, n: int):
+        """Per group code: how many different `other` codes occur with it."""
+        import numpy as np
+
+        if not len(group):
+            return np.zeros(n, dtype=np.int64)
+        low = int(other.min())
+        width = int(other.max()) - low + 1
+        pairs = group.astype(np.int64) * width + (other - low)
+        if n * width <= DISTINCT_GRID:          # mark a group × other grid, count per row
+            seen = np.zeros(n * width, dtype=bool)
+            seen[pairs] = True
+            return np.count_nonzero(seen.reshape(n, width), axis=1)
+        pairs.sort()
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] != pairs[:-1]
+        return np.bincount(pairs[first] // width, minlength=n)
+
+def _largest(values, codes, top: int | None):
+    """`codes` ordered by values descending (ties by code); only the first `top` are sorted."""
+    import numpy as np
+
+    if top is not None and top < len(codes):
+        codes = codes[np.argpartition(-values[codes], top - 1)[:top]]
+    return codes[np.lexsort((codes, -values[codes]))]
+
+# ── Command line ────────────────────────────────────────────────────
+def _number(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+def _arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="多天訂單歷史：匯入訂單檔、統計買家消費與商品銷量")
+    ap.add_argument("--store", metavar="檔案", default=None,
+                    help=f"歷史檔（預設 {default_path()}）")
+    sub = ap.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="匯入訂單檔（與訊息.py 上傳的格式相同）")
+    add.add_argument("files", nargs="+", metavar="訂單檔")
+    add.add_argument("--date", metavar="YYYY-MM-DD",
+                     help="這些訂單檔的日期（預設取檔名中的日期，沒有則用修改時間）")
+    for name, text in (("buyers", "買家消費金額排行"), ("products", "商品銷量排行")):
+        query = sub.add_parser(name, help=text)
+        query.add_argument("--from", dest="start", metavar="YYYY-MM-DD", help="起始日期（含）")
+        query.add_argument("--to", dest="end", metavar="YYYY-MM-DD", help="結束日期（含）")
+        query.add_argument("--top", type=int, default=None, metavar="N", help="只列出前 N 名")
+    buyer = sub.add_parser("buyer", help="一位買家的訂購紀錄")
+    buyer.add_argument("name", metavar="姓名")
+    buyer.add_argument("--from", dest="start", metavar="YYYY-MM-DD")
+    buyer.add_argument("--to", dest="end", metavar="YYYY-MM-DD")
+    return ap
+
+def main(argv=None) -> int:
+    args = _arg_parser().parse_args(argv)
+    try:
+        history = OrderHistory.open(args.store)
+        if args.command == "add":
+            added, skipped = history.add(args.files, parse_day(args.date))
+            history.save()
+            span = history.date_range()
+            print(f"匯入 {added} 個訂單檔（略過 {skipped} 個未變更或空白的檔案），"
+                  f"共 {len(history):,} 筆" + (f"，{span[0]} ～ {span[1]}" if span else ""))
+            return 0
+        start, end = parse_day(args.start), parse_day(args.end)
+        if args.command == "buyers":
+            print("買家\t金額\t數量\t天數")
+            for name, amount, quantity, days in history.buyer_spend(start, end, args.top):
+                print(f"{name}\t{_number(amount)}\t{_number(quantity)}\t{days}")
+        elif args.command == "products":
+            print("商品\t數量\t金額\t買家數")
+            for name, quantity, amount, buyers in history.product_volume(start, end, args.top):
+                print(f"{name}\t{_number(quantity)}\t{_number(amount)}\t{buyers}")
+        else:
+            print("日期\t商品\t數量\t金額")
+            for day, product, quantity, amount in history.buyer_orders(args.name, start, end):
+                print(f"{day}\t{product}\t{_number(quantity)}\t{_number(amount)}")
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
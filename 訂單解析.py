@@ -0,0 +1,800 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Order parsing core of 表單.py · importable without a window or pandas.
+
+  • parse_orders / collect_orders / iter_orders turn a comment dump into
+    {buyer: qty/str/Tally}; parse_posts does a folder of posts across processes.
+  • OrderStream / PostStreams parse comment files that keep growing, a few new
+    lines at a time (follow mode, see 留言追蹤.py).
+  • PostIndex fingerprints the buyer blocks of a pasted post, so pasting it again
+    only parses new / edited comments (SheetModel.paste).
+  • SheetModel merges posts into the buyer × item table; pandas is imported the
+    first time a DataFrame is actually built (build_sheet / export_frame).
+"""
+
+import re
+import sys
+import bisect
+import unicodedata
+from pathlib import Path
+from collections import defaultdict, OrderedDict
+from typing import TYPE_CHECKING
+from 姓名比對 import BuyerNames
+import 計時
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ── Regular expressions ─────────────────────────────────────────────
+RE_NAME_PLUS = re.compile(r'^([\u4e00-\u9fa5\u00C0-\u024F A-Za-z\s·\._-]+?)\s*[\+\*]\s*([0-9]+)\s*$')
+RE_NAME_LINE = re.compile(r'^[\u4e00-\u9fa5\u00C0-\u024F A-Za-z\s·\._-]+$')
+RE_TIME        = re.compile(r'^\d+\s*(天|日|週|周|小時|分鐘)$')
+NOISE_WORDS    = {"回覆", "翻譯年糕"}
+LINE_CACHE     = 1 << 16            # classify_line results kept (tuples, shared by callers)
+RE_STR_QTY     = re.compile(r'^(.*?)(?:\s*)[\+\*]\s*(\d+)$')        # Generic “string+qty”
+
+# One-pass line classifier: the alternatives are RE_TIME, RE_NAME_PLUS, RE_NAME_LINE
+# and the pure-number pattern in the order iter_orders used to try them, so fullmatch
+# picks the same branch (and the same name / qty split) the chain did; the chain
+# itself is kept in benchmarks/bench_tokenizer.py, which checks the two agree.
+_NAME_CHARS = r'[\u4e00-\u9fa5\u00C0-\u024F A-Za-z\s·\._-]'
+RE_LINE = re.compile(
+    r'(?P<time>\d+\s*(?:天|日|週|周|小時|分鐘))'
+    rf'|(?P<name>{_NAME_CHARS}+?)\s*[\+\*]\s*(?P<qty>[0-9]+)\s*'
+    rf'|(?P<line>{_NAME_CHARS}+)'
+    r'|\s*\+?\s*(?P<num>[0-9]+)\s*'
+)
+
+_classified: dict[str, tuple] = {}
+
+# ── Sort keys ───────────────────────────────────────────────────────
+def buyer_key(name: str):
+    first = name.lstrip()[0]
+    return (0, name.casefold()) if first.isascii() and first.isalpha() else (1, name)
+
+def item_key(item: str):
+    first = item.lstrip()[0]
+    return (0, item.casefold()) if first.isascii() and first.isalpha() else (1, item)
+
+# ── Parsing logic ───────────────────────────────────────────────────
+def parse_orders(text: str) -> dict[str, "int | str | Tally"]:
+    return collect_orders(text.splitlines())
+
+def collect_orders(lines) -> dict[str, "int | str | Tally"]:
+    """Merge the orders of one post given as any iterable of lines."""
+    with 計時.span("表單.parse", "解析留言") as sp:
+        buyers, stats = _collect(lines)
+        sp.count(buyers=len(buyers), **stats)
+    return buyers
+
+def _collect(lines) -> tuple[dict[str, "int | str | Tally"], dict[str, int]]:
+    """Merged orders plus iter_orders' lines / noise / unmatched counts."""
+    buyers: dict[str, int | str | Tally] = {}
+    stats: dict[str, int] = {}
+    for name, val in iter_orders(lines, stats):
+        _merge_val(buyers, name, val)
+    return buyers, stats
+
+def classify_line(raw: str) -> tuple:
+    """
+    Label one comment line in a single regex pass:
+      ("noise",) · ("name+qty", name, qty) · ("name", name) · ("qty", n) · ("combo", line)
+    Non-ASCII lines are NFKC-normalized first, like 統計.py does, so full-width
+    letters, digits and ＋ read as their half-width forms.
+    Labels are remembered per raw line (at most LINE_CACHE of them): a dump
+    repeats “+1”, “回覆”, timestamps and its buyers' names over and over.
+    """
+    token = _classified.get(raw)
+    if token is None:
+        if len(_classified) >= LINE_CACHE:
+            _classified.clear()
+        token = _classified[raw] = _classify(raw)
+    return token
+
+def _classify(raw: str) -> tuple:
+    line = raw.strip()
+    if not line.isascii():
+        line = unicodedata.normalize("NFKC", line)
+    if not line or "已編輯" in line or line in NOISE_WORDS:
+        return ("noise",)
+    m = RE_LINE.fullmatch(line)
+    if m is None:
+        return ("combo", line)
+    kind = m.lastgroup
+    if kind == "qty":
+        return ("name+qty", m.group("name").strip(), int(m.group("qty")))
+    if kind == "line":
+        return ("name", line)
+    if kind == "num":
+        return ("qty", int(m.group("num")))
+    return ("noise",)                       # RE_TIME timestamp
+
+def iter_orders(lines, stats: dict | None = None, state: dict | None = None):
+    """
+    Yield (buyer, qty/str) pairs one line at a time; never buffers the input.
+    `stats`, if given, receives lines / noise / unmatched (quantity lines with no buyer).
+    `state`, if given, carries the pending buyer from one call to the next, so text
+    that arrives in pieces parses like one post (see OrderStream).
+    """
+    current: str | None = state.get("current") if state else None   # remember current buyer name
+    n = noise = unmatched = 0
+
+    try:
+        for n, raw in enumerate(lines, 1):
+            token = classify_line(raw)
+            kind = token[0]
+            if kind == "name+qty":          # same-line “Name +2”
+                yield token[1], token[2]
+                current = None
+            elif kind == "name":            # new buyer’s name line
+                current = token[1]
+            elif kind == "noise":
+                noise += 1
+            elif current is not None:
+                yield current, token[1]     # quantity / combo line (may be multiple lines)
+            else:
+                unmatched += 1
+    finally:
+        if stats is not None:
+            stats.update(lines=n, noise=noise, unmatched=unmatched)
+        if state is not None:
+            state["current"] = current
+
+def _merge_val(dic, key, new):
+    """
+    Merge `new` into dic[key]. A first value is stored as is, two ints are summed,
+    and any other combination becomes a Tally, so no cell is ever re-parsed.
+    """
+    old = dic.get(key)
+    if old is None:
+        dic[key] = new.copy() if isinstance(new, Tally) else new
+    elif isinstance(old, int) and isinstance(new, int):
+        dic[key] = old + new
+    else:
+        if not isinstance(old, Tally):
+            dic[key] = old = Tally.of(old)
+        old.add(new)
+
+def cell_value(cell):
+    """What a merged cell shows: an int or string as is, a Tally rendered as text."""
+    return cell.value() if isinstance(cell, Tally) else cell
+
+def merge_post(data, item, buyers) -> None:
+    """Merge one parsed post into {buyer: {item: qty/str/Tally}} (what 新增商品 does)."""
+    for buyer, val in buyers.items():
+        _merge_val(data[buyer], item, val)
+
+class Tally:
+    """
+    A cell merged from several values that are not all ints: a plain number,
+    “prefix+qty” variants summed per prefix, and free-text notes, kept as parts
+    instead of one growing string.
+
+    add() costs O(1) per value however often a buyer comments; value() renders the
+    cell the way the sheet always showed it: a single entry as typed, otherwise all
+    parts sorted and joined with spaces, same-prefix variants as “prefix+total”.
+    """
+    __slots__ = ("number", "variants", "notes")
+
+    def __init__(self):
+        self.number: int | None = None
+        self.variants: dict[str, list] = {}     # prefix → [qty, raw text while seen once]
+        self.notes: dict[str, None] = {}        # ordered set of free text
+
+    @classmethod
+    def of(cls, val) -> "Tally":
+        tally = cls()
+        tally.add(val)
+        return tally
+
+    def add(self, val) -> None:
+        if isinstance(val, Tally):
+            if val.number is not None:
+                self.add(val.number)
+            for prefix, (qty, raw) in val.variants.items():
+                self._add_variant(prefix, qty, raw)
+            self.notes.update(val.notes)
+            return
+        if isinstance(val, int):
+            self.number = val if self.number is None else self.number + val
+            return
+        text = str(val).strip()
+        if not text:
+            return
+        m = RE_STR_QTY.match(text)
+        if m:
+            self._add_variant(m.group(1), int(m.group(2)), text)
+        else:
+            self.notes[text] = None
+
+    def copy(self) -> "Tally":
+        twin = Tally()
+        twin.add(self)
+        return twin
+
+    def _add_variant(self, prefix: str, qty: int, raw: str | None) -> None:
+        slot = self.variants.get(prefix)
+        if slot is None:
+            self.variants[prefix] = [qty, raw]
+        else:
+            slot[0] += qty
+            slot[1] = None
+
+    def value(self):
+        parts = [f"{prefix}+{qty}" if raw is None else raw
+                 for prefix, (qty, raw) in self.variants.items()]
+        parts.extend(self.notes)
+        if self.number is not None:
+            if not parts:
+                return self.number
+            parts.append(str(self.number))
+        if len(parts) == 1:
+            return parts[0]
+        return " ".join(sorted(set(parts)))
+
+    def __repr__(self):
+        return f"Tally({self.value()!r})"
+
+# ── Streaming (follow mode) ─────────────────────────────────────────
+class OrderStream:
+    """
+    collect_orders over a post that keeps growing: feed() takes only the new
+    lines and returns the orders they add. A buyer whose name line came last
+    still owns the quantity lines of the next feed(), so the merged results
+    equal collect_orders of the whole text.
+    """
+
+    def __init__(self):
+        self.state: dict = {}
+        self.stats = {"lines": 0, "noise": 0, "unmatched": 0}
+
+    def feed(self, lines) -> dict[str, "int | str | Tally"]:
+        buyers: dict[str, int | str | Tally] = {}
+        stats: dict[str, int] = {}
+        for name, val in iter_orders(lines, stats, self.state):
+            _merge_val(buyers, name, val)
+        for key, value in stats.items():
+            self.stats[key] += value
+        return buyers
+
+    def peek(self, lines) -> dict[str, "int | str | Tally"]:
+        """The orders feed() would return, leaving the stream as it is."""
+        buyers: dict[str, int | str | Tally] = {}
+        for name, val in iter_orders(lines, None, dict(self.state)):
+            _merge_val(buyers, name, val)
+        return buyers
+
+class PostStreams:
+    """
+    One OrderStream per followed comment file (see 留言追蹤.Follower).
+
+    feed() parses the text appended to a file and returns the orders it added;
+    `posts` keeps each file's orders so far, which is what a restart or a
+    rewritten file rebuilds the sheet from. `provisional` holds, per file, an
+    unfinished last line and the orders it was counted as (never saved: it is
+    parsed again from the file's offset).
+    """
+
+    def __init__(self):
+        self.streams: dict[str, OrderStream] = {}
+        self.posts: dict[str, dict] = {}
+        self.provisional: dict[str, tuple[str, dict]] = {}
+
+    def __getstate__(self):
+        return {"streams": self.streams, "posts": self.posts}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+    def feed(self, path: str, text: str) -> dict[str, "int | str | Tally"]:
+        stream = self.streams.get(path)
+        if stream is None:
+            stream = self.streams[path] = OrderStream()
+        buyers = stream.feed(text.splitlines())
+        post = self.posts.setdefault(path, {})
+        for buyer, val in buyers.items():
+            _merge_val(post, buyer, val)
+        return buyers
+
+    def reset(self, path: str) -> None:
+        """Forget a file's orders (it was rewritten and is read again from the start)."""
+        self.streams.pop(path, None)
+        self.posts.pop(path, None)
+        self.provisional.pop(path, None)
+
+    def set_pending(self, path: str, text: str) -> None:
+        """Count `text`, the file's unfinished last line, provisionally (“” drops it)."""
+        self.provisional.pop(path, None)
+        if text:
+            stream = self.streams.get(path) or OrderStream()
+            self.provisional[path] = (text, stream.peek(text.splitlines()))
+
+    def shown(self, path: str) -> dict[str, "int | str | Tally"]:
+        """The file's orders so far plus the provisional ones of its unfinished last line."""
+        buyers: dict[str, int | str | Tally] = {}
+        for buyer, val in self.posts.get(path, {}).items():
+            _merge_val(buyers, buyer, val)
+        for buyer, val in self.provisional.get(path, ("", {}))[1].items():
+            _merge_val(buyers, buyer, val)
+        return buyers
+
+    def stats(self) -> dict[str, int]:
+        total = {"lines": 0, "noise": 0, "unmatched": 0}
+        for stream in self.streams.values():
+            for key, value in stream.stats.items():
+                total[key] += value
+        return total
+
+# ── Parallel ingestion ──────────────────────────────────────────────
+def folder_posts(folder: str) -> list[tuple[str, str]]:
+    """(item, path) for every .txt in `folder`; the file name is the product name."""
+    return [(p.stem, str(p)) for p in sorted(Path(folder).glob("*.txt"))]
+
+def iter_lines(path: str):
+    """Lines of a comment dump (“-” = stdin), read lazily with the same splitting as str.splitlines."""
+    if path == "-":
+        for chunk in sys.stdin:
+            yield from chunk.splitlines()
+        return
+    with open(path, encoding="utf-8-sig") as f:
+        for chunk in f:
+            yield from chunk.splitlines()
+
+def _parse_file(path: str) -> tuple[dict[str, "int | str | Tally"], dict[str, int]]:
+    # Spans of a worker process never reach the parent: the stats travel back instead
+    return _collect(iter_lines(path))
+
+def parse_posts(paths, max_workers: int | None = None) -> list[dict[str, "int | str | Tally"]]:
+    """Parse many comment files across processes; results keep the input order."""
+    paths = list(paths)
+    with 計時.span("表單.parse_posts", "解析留言檔") as sp:
+        if len(paths) < 2 or max_workers == 1:
+            results = [_parse_file(p) for p in paths]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_parse_file, paths))
+        totals: dict[str, int] = defaultdict(int)
+        for _, stats in results:
+            for key, value in stats.items():
+                totals[key] += value
+        sp.count(files=len(paths), buyers=sum(len(buyers) for buyers, _ in results), **totals)
+    return [buyers for buyers, _ in results]
+
+# ── Re-pasted posts ─────────────────────────────────────────────────
+def split_blocks(text: str, start: int = 0):
+    """
+    (begin, end, tokens) of each buyer block of text[start:], `start` being a
+    block start. A block runs from a name line to the next one; whatever comes
+    before the first name forms a block of its own.
+    """
+    begin = pos = start
+    tokens: list[tuple] = []
+    for line in text[start:].splitlines(keepends=True):
+        token = classify_line(line)
+        if token[0] in ("name", "name+qty") and pos > begin:
+            yield begin, pos, tokens
+            begin, tokens = pos, []
+        tokens.append(token)
+        pos += len(line)
+    if pos > begin:
+        yield begin, pos, tokens
+
+def block_orders(tokens) -> list[tuple[str, "int | str"]]:
+    """What iter_orders yields for one block's classify_line tokens."""
+    orders, current = [], None
+    for token in tokens:
+        kind = token[0]
+        if kind == "name+qty":
+            orders.append((token[1], token[2]))
+        elif kind == "name":
+            current = token[1]
+        elif kind != "noise" and current is not None:
+            orders.append((current, token[1]))
+    return orders
+
+def _shared_prefix(a: str, b: str) -> int:
+    """Length of the longest common prefix, compared a slice at a time."""
+    if b.startswith(a):
+        return len(a)
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class PostDiff:
+    """Blocks of a pasted text that differ from a PostIndex (see PostIndex.diff)."""
+    __slots__ = ("text", "keep", "ends", "prints", "changed", "lines")
+
+    def __init__(self, text: str, keep: int):
+        self.text = text
+        self.keep = keep                        # leading blocks known unchanged (not read)
+        self.ends: list[int] = []               # ends / prints of the blocks from `keep` on
+        self.prints: list[int] = []
+        self.changed: dict[int, list] = {}      # position → orders of a new / edited block
+        self.lines = 0                          # lines classified
+
+class PostIndex:
+    """
+    Fingerprints of the buyer blocks of one pasted post, so pasting the post
+    again once it got more comments only parses and merges what is new.
+
+    Parsed on its own a block yields exactly what it yields inside the whole
+    post (a name line resets the pending buyer), so the post's orders are the
+    merge of its blocks' orders in order. A fingerprint hashes a block's text
+    together with its position: blocks inside the text both pastes share are
+    not even read, and a block whose fingerprint changed — an edited comment
+    or a new one — replaces what that position contributed before.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.ends: list[int] = []               # offset in `text` where each block ends
+        self.prints: list[int] = []             # hash((position, block text))
+        self.orders: list[list] = []            # (buyer, qty/str) of each block
+        self.buyers: dict[str, int | str | Tally] = {}      # the whole post, merged
+        self._blocks_of: dict[str, dict[int, None]] = {}    # buyer → blocks with their orders
+
+    def shared(self, text: str) -> int:
+        """Leading blocks `text` has unchanged: each is followed by a block start it also shares."""
+        return max(bisect.bisect_left(self.ends, _shared_prefix(self.text, text)) - 1, 0)
+
+    def diff(self, text: str, keep: int | None = None) -> PostDiff:
+        """Read `text` from the first block that may differ; only changed blocks are parsed."""
+        # copies: a paste may be applied on the Tk thread meanwhile (the
+        # result is then planned again, see SheetModel.paste)
+        ends, prints = self.ends[:], self.prints[:]
+        keep = min(self.shared(text) if keep is None else keep, len(ends))
+        diff = PostDiff(text, keep)
+        start = ends[keep - 1] if keep else 0
+        for pos, (begin, end, tokens) in enumerate(split_blocks(text, start), keep):
+            fp = hash((pos, text[begin:end]))
+            diff.ends.append(end)
+            diff.prints.append(fp)
+            diff.lines += len(tokens)
+            if pos >= len(prints) or prints[pos] != fp:
+                diff.changed[pos] = block_orders(tokens)
+        return diff
+
+    def apply(self, diff: PostDiff) -> dict[str, None]:
+        """Swap the changed blocks in; returns the buyers whose merged orders may differ."""
+        count = diff.keep + len(diff.ends)
+        touched: dict[str, None] = {}
+        for pos in [*diff.changed, *range(count, len(self.orders))]:
+            if pos < len(self.orders):
+                for buyer, _ in self.orders[pos]:
+                    self._blocks_of[buyer].pop(pos, None)
+                    touched[buyer] = None
+        del self.orders[count:]
+        self.orders.extend([] for _ in range(count - len(self.orders)))
+        for pos, orders in diff.changed.items():
+            self.orders[pos] = orders
+            for buyer, _ in orders:
+                self._blocks_of.setdefault(buyer, {})[pos] = None
+                touched[buyer] = None
+        self.ends[diff.keep:] = diff.ends
+        self.prints[diff.keep:] = diff.prints
+        self.text = diff.text
+        for buyer in touched:
+            merged: dict[str, int | str | Tally] = {}
+            for pos in sorted(self._blocks_of[buyer]):
+                for name, val in self.orders[pos]:
+                    if name == buyer:
+                        _merge_val(merged, buyer, val)
+            if merged:
+                self.buyers[buyer] = merged[buyer]
+            else:
+                self.buyers.pop(buyer, None)
+                del self._blocks_of[buyer]
+        return touched
+
+    # Fingerprints use hash(), which differs from one run to the next: a saved
+    # index (工作紀錄.py) recomputes them when it is loaded
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["prints"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        text = self.text
+        self.prints = [hash((pos, text[begin:end]))
+                       for pos, (begin, end) in enumerate(zip([0, *self.ends], self.ends))]
+
+# ── Sheet building ──────────────────────────────────────────────────
+def build_sheet(data, buyers=None, items=None) -> "pd.DataFrame":
+    """{buyer: {item: qty/str/Tally}} → buyer × item table with a leading 姓名 column."""
+    import pandas as pd
+    if items is None:
+        items = sorted(dict.fromkeys(it for od in data.values() for it in od), key=item_key)
+    if buyers is None:
+        buyers = sorted(data.keys(), key=buyer_key)
+
+    rows = [{it: cell_value(cell) for it, cell in data[b].items()} for b in buyers]
+    df = pd.DataFrame(rows, index=buyers).reindex(columns=items).fillna("")
+    df.index.name = "姓名"
+    df.reset_index(inplace=True)
+    return df
+
+def export_frame(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Layout expected by 訊息.py: blank first column, names under “Unnamed: 1”."""
+    df = df.copy()
+    df.insert(0, 'Unnamed: 0', '')
+    df.rename(columns={'姓名': 'Unnamed: 1'}, inplace=True)
+    return df
+
+class SheetModel:
+    """
+    {buyer: {item: qty/str/Tally}} that remembers what each merge touched.
+
+    Buyers / items are kept in buyer_key / item_key order with bisect (ties stay in
+    first-seen order, like the stable sort build_sheet does), so a view can be patched
+    with just the new rows, new columns and changed cells. The DataFrame is only
+    built when someone asks for it.
+
+    Posts pasted through paste() keep a PostIndex each, and an item with pasted
+    posts also keeps what reached it some other way (its base), so a cell can
+    be rebuilt when a re-pasted post's share of it changes.
+
+    Buyer names go through `names` (姓名比對.BuyerNames) on the way in: every
+    spelling of a buyer (full-width, other case, stray spaces or ·) lands in the
+    row of the first spelling seen, and merge_buyers() folds near duplicates the
+    user confirmed.
+
+    With a `journal` (工作紀錄.SessionJournal) attached, every operation is also
+    recorded there once applied, and replay() applies a recorded one again.
+    """
+
+    def __init__(self):
+        self.data = defaultdict(lambda: OrderedDict())
+        self.buyers: list[str] = []
+        self.items: list[str] = []
+        self._buyer_keys: list = []
+        self._item_keys: list = []
+        self._item_set: set[str] = set()
+        self._new_buyers: list[tuple[int, str]] = []
+        self._new_items: list[tuple[int, str]] = []
+        self._touched: dict[str, dict[str, None]] = {}
+        self.names = BuyerNames()                       # spelling → row it goes to
+        self._pastes: dict[str, list[PostIndex]] = {}   # item → posts pasted for it
+        self._base: dict[str, dict] = {}                # item → {buyer: cell} not from pastes
+        self._paste_version = 0                         # bumped by every applied paste
+        self.journal = None                             # 工作紀錄.SessionJournal, if any
+        self._df: "pd.DataFrame | None" = None
+
+    def merge(self, item: str, buyers) -> None:
+        with 計時.span("表單.merge", "合併訂單") as sp:
+            sp.count(buyers=len(buyers))
+            shown = self._shown(buyers)
+            base = self._base.get(item)
+            if base is not None:
+                for buyer, val in shown.items():
+                    _merge_val(base, buyer, val)
+            self._merge(item, shown)
+        self._record("merge", item, buyers)
+
+    def _merge(self, item: str, buyers) -> None:
+        if item not in self._item_set:
+            pos = bisect.bisect_right(self._item_keys, item_key(item))
+            self._item_keys.insert(pos, item_key(item))
+            self.items.insert(pos, item)
+            self._item_set.add(item)
+            self._new_items.append((pos, item))
+        for buyer in buyers:
+            if buyer not in self.data:
+                self._add_buyer(buyer)
+            self._touched.setdefault(buyer, {})[item] = None
+        merge_post(self.data, item, buyers)
+        self._df = None
+
+    def _add_buyer(self, buyer: str) -> None:
+        pos = bisect.bisect_right(self._buyer_keys, buyer_key(buyer))
+        self._buyer_keys.insert(pos, buyer_key(buyer))
+        self.buyers.insert(pos, buyer)
+        self._new_buyers.append((pos, buyer))
+        self.data[buyer]                        # the row exists from now on
+
+    def _shown(self, buyers) -> dict:
+        """`buyers` keyed by the row each spelling goes to (two spellings merged)."""
+        resolve = self.names.resolve
+        shown: dict[str, int | str | Tally] = {}
+        for name, val in buyers.items():
+            _merge_val(shown, resolve(name), val)
+        return shown
+
+    def merge_buyers(self, name: str, into: str) -> None:
+        """Fold the row of `name` into `into` (near duplicates the user confirmed)."""
+        into = self.names.resolve(into)
+        if name == into or name not in self.data:
+            return
+        self.names.alias(name, into)
+        row = self.data[name]
+        for item in list(row):
+            base = self._base.get(item)
+            if base is None:
+                _merge_val(self.data[into], item, row.pop(item))
+                for buyer in (name, into):
+                    self._touched.setdefault(buyer, {})[item] = None
+            else:
+                if name in base:
+                    _merge_val(base, into, base.pop(name))
+                self._rebuild(item, (name, into))
+        self._df = None
+        self._record("merge_buyers", name, into)
+
+    def replace(self, item: str, buyers) -> None:
+        """Make `buyers` the whole column of `item` (a followed file was rewritten)."""
+        with 計時.span("表單.merge", "合併訂單") as sp:
+            sp.count(buyers=len(buyers))
+            self._replace(item, self._shown(buyers))
+        self._record("replace", item, buyers)
+
+    def _replace(self, item: str, buyers) -> None:
+        if item in self._base:                  # pasted posts of the item stay
+            column = [b for b, row in self.data.items() if item in row]
+            self._base[item] = {b: _copy_cell(v) for b, v in buyers.items()}
+            self._rebuild(item, dict.fromkeys([*column, *buyers]))
+            return
+        for buyer, row in self.data.items():
+            if item in row:
+                del row[item]
+                self._touched.setdefault(buyer, {})[item] = None
+        self._merge(item, buyers)
+
+    # ── Pasted posts ───────────────────────────────────────────────
+    def plan_paste(self, item: str, text: str) -> tuple:
+        """
+        The parsing half of paste(), safe on a worker thread: finds whether `text`
+        is a post already pasted for `item` and reads only what changed in it.
+        """
+        version = self._paste_version
+        with 計時.span("表單.parse", "解析留言") as sp:
+            post, diff = self._match_post(item, text)
+            sp.count(lines=diff.lines)
+        return version, post, diff
+
+    def _match_post(self, item: str, text: str) -> tuple["PostIndex | None", PostDiff]:
+        posts = self._pastes.get(item, ())
+        for post in posts:                      # the usual case: the same post, grown
+            keep = post.shared(text)
+            if keep * 2 >= len(post.prints) > 0:
+                return post, post.diff(text, keep)
+        diff = PostIndex().diff(text)
+        if posts:                               # edited near the top: most blocks still there
+            blocks = _block_texts(text, diff.ends)
+            for post in posts:
+                old = _block_texts(post.text, post.ends[:])
+                if len(blocks.intersection(old)) * 2 >= len(old) > 0:
+                    return post, post.diff(text)
+        return None, diff
+
+    def paste(self, item: str, text: str, plan: tuple | None = None) -> tuple[bool, list[str]]:
+        """
+        Merge a pasted post. Pasting the same post again (more comments, edited
+        ones) swaps in just its new and changed blocks instead of counting it
+        twice; another post for the same item adds up as merge() does.
+        Returns (new post?, buyers whose cell changed).
+        """
+        with 計時.span("表單.paste", "合併貼文") as sp:
+            if plan is None or plan[0] != self._paste_version:
+                plan = self.plan_paste(item, text)      # another paste landed in between
+            _, post, diff = plan
+            # Journaled as the post it updates plus the text after the part both
+            # pastes share, so a re-paste costs the journal only what is new
+            posts = self._pastes.get(item, [])
+            k = len(posts) if post is None else posts.index(post)
+            shared = 0 if post is None else _shared_prefix(post.text, text)
+            try:
+                new, buyers = self._apply_paste(item, post, diff)
+            finally:
+                self._paste_version += 1    # after the change, so a plan never mixes states
+            sp.count(buyers=len(buyers))
+        if not new or buyers:
+            self._record("paste", item, k, shared, text[shared:])
+        return new, buyers
+
+    def _apply_paste(self, item: str, post: PostIndex | None, diff: PostDiff) -> tuple[bool, list[str]]:
+        if post is not None:
+            resolve = self.names.resolve
+            buyers = list(dict.fromkeys(resolve(b) for b in post.apply(diff)))
+            self._rebuild(item, buyers)
+            return False, buyers
+        post = PostIndex()
+        post.apply(diff)
+        if not post.buyers:
+            return True, []
+        if item not in self._base:
+            self._base[item] = {b: _copy_cell(row[item])
+                                for b, row in self.data.items() if item in row}
+        self._pastes.setdefault(item, []).append(post)
+        buyers = self._shown(post.buyers)
+        self._merge(item, buyers)
+        return True, list(buyers)
+
+    def _rebuild(self, item: str, buyers) -> None:
+        """Recompute the cells of `item` for `buyers` (shown names) from its base and pasted posts."""
+        base, posts = self._base[item], self._pastes.get(item, ())
+        for buyer in buyers:
+            cell: dict = {}
+            if buyer in base:
+                _merge_val(cell, item, base[buyer])
+            spellings = self.names.spellings.get(buyer, ())
+            for post in posts:
+                for spelling in spellings:
+                    if spelling in post.buyers:
+                        _merge_val(cell, item, post.buyers[spelling])
+            if buyer not in self.data:
+                if not cell:
+                    continue
+                self._add_buyer(buyer)
+            row = self.data[buyer]
+            if cell:
+                row[item] = cell[item]
+            elif item in row:
+                del row[item]
+            else:
+                continue
+            self._touched.setdefault(buyer, {})[item] = None
+        self._df = None
+
+    # ── Journal (工作紀錄.py) ──────────────────────────────────────
+    def _record(self, op: str, *args) -> None:
+        if self.journal is not None:
+            self.journal.record(op, args)
+
+    def replay(self, op: str, args) -> None:
+        """Apply an operation recorded by _record again (restoring a session)."""
+        if op == "paste":
+            item, k, shared, tail = args
+            posts = self._pastes.get(item, [])
+            self.paste(item, (posts[k].text[:shared] if k < len(posts) else "") + tail)
+        else:
+            getattr(self, op)(*args)
+
+    def __getstate__(self):
+        return {"data": {buyer: dict(row) for buyer, row in self.data.items()},
+                "buyers": self.buyers, "items": self.items, "names": self.names,
+                "pastes": self._pastes, "base": self._base}
+
+    def __setstate__(self, state):
+        """Also loads a saved state into an existing (empty) model."""
+        self.__init__()
+        for buyer, row in state["data"].items():
+            self.data[buyer].update(row)
+        self.buyers, self.items = state["buyers"], state["items"]
+        self._buyer_keys = [buyer_key(b) for b in self.buyers]
+        self._item_keys = [item_key(it) for it in self.items]
+        self._item_set = set(self.items)
+        self.names, self._pastes, self._base = state["names"], state["pastes"], state["base"]
+
+    def take_changes(self):
+        """(new items, new buyers, touched cells) since the last call, in apply order."""
+        changes = self._new_items, self._new_buyers, self._touched
+        self._new_items, self._new_buyers, self._touched = [], [], {}
+        return changes
+
+    def take_all(self):
+        """take_changes() as if the whole sheet was new (a view built from scratch)."""
+        self.take_changes()
+        return list(enumerate(self.items)), list(enumerate(self.buyers)), {}
+
+    def frame(self) -> "pd.DataFrame | None":
+        if self._df is None and self.data:
+            # a buyer whose every order was edited away keeps a blank row on
+            # screen but is left out of the sheet
+            buyers = [b for b in self.buyers if self.data[b]]
+            self._df = build_sheet(self.data, buyers, self.items)
+        return self._df
+
+def _block_texts(text: str, ends: list[int]) -> set[int]:
+    """Hashes of the blocks' text alone, for matching a post whatever moved in it."""
+    return {hash(text[begin:end]) for begin, end in zip([0, *ends], ends)}
+
+def _copy_cell(cell):
+    return cell.copy() if isinstance(cell, Tally) else cell
@@ -0,0 +1,914 @@
+"""
+訂購訊息的核心邏輯（不含視窗，可單獨匯入）：
+  - OrderBook：把訂單表編譯成可逐人組裝訊息的資料，MessageTemplate 決定訊息文字。
+  - SheetOrders：直接拿表單在記憶體裡的訂單編譯 OrderBook，之後只更新新增的商品。
+  - ParseCache / compile_order_file：以檔案內容為鍵的上傳快取。
+  - write_message_export：背景匯出；NameIndex：訂購人搜尋索引。
+numpy / pandas 在真的要處理訂單表時才匯入，匯入本模組不會載入它們。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import zipfile
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+from 工作表 import read_sheet
+from 訂單解析 import cell_value
+import 計時
+
+
+# ---------------------- 訊息組裝（逐欄向量化） ----------------------
+def parse_price(raw_price):
+    """解析價格儲存格，回傳 (數值價格或 None, 顯示字串)；空值顯示「無價格」。"""
+    import pandas as pd
+
+    if pd.isna(raw_price) or str(raw_price).strip() == "":
+        return None, "無價格"
+    try:
+        numeric_price = float(str(raw_price))
+    except Exception:
+        return None, str(raw_price)
+    if numeric_price.is_integer():
+        numeric_price = int(numeric_price)
+        return numeric_price, str(numeric_price)
+    return numeric_price, f"{numeric_price:.2f}"
+
+
+def parse_order_quantity(raw_quantity):
+    """解析訂購數量儲存格，回傳 (數量, 顯示字串)；空白視為 0 並顯示「你沒訂」。"""
+    import pandas as pd
+
+    if pd.isna(raw_quantity) or str(raw_quantity).strip() == "":
+        return 0, "你沒訂"
+    try:
+        numeric_quantity = float(raw_quantity)
+        if numeric_quantity.is_integer():
+            numeric_quantity = int(numeric_quantity)
+        return numeric_quantity, numeric_quantity
+    except Exception:
+        return raw_quantity, str(raw_quantity).strip()
+
+
+def _coerce_quantity_column(column):
+    """
+    整欄轉換訂購數量：每個相異值只呼叫一次 parse_order_quantity。
+    回傳 (各格相異值代碼, 相異值的數量, 相異值的顯示字串, 相異值的數值數量,
+    相異值是否為數值, 相異值是否算有訂購)。
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(column)
+    parsed = [parse_order_quantity(u) for u in uniques]
+    # 多放一格給 factorize 的缺值代碼 -1
+    parsed.append(parse_order_quantity(""))
+    codes = np.where(codes < 0, len(parsed) - 1, codes)
+
+    quantities = [quantity for quantity, _ in parsed]
+    displays = [item_quantity for _, item_quantity in parsed]
+    numeric = np.zeros(len(parsed), dtype=float)
+    is_numeric = np.zeros(len(parsed), dtype=bool)
+    ordered = np.zeros(len(parsed), dtype=bool)
+    for k, quantity in enumerate(quantities):
+        if isinstance(quantity, (int, float)):
+            is_numeric[k] = True
+            numeric[k] = quantity
+            ordered[k] = quantity > 0
+        else:
+            ordered[k] = str(quantity).strip() not in ["", "0"]
+    return codes, quantities, displays, numeric, is_numeric, ordered
+
+
+TEMPLATE_FILE = Path(__file__).resolve().with_name("訊息範本.json")
+
+
+class MessageTemplate:
+    """
+    訂購訊息範本，四段依序接起來就是一則訊息：
+      - header：標題（可用 {date}），每次上傳只格式化一次。
+      - buyer：訂購人那一行（可用 {name}）。
+      - item：每項有訂的商品一段（可用 {item}、{price}、{quantity}）。
+      - footer：結尾。
+    大括號本身要寫成 {{ }}。預設內容與原本寫死的訊息逐字相同。
+    """
+
+    FIELDS = {
+        "header": ("date",),
+        "buyer": ("name",),
+        "item": ("item", "price", "quantity"),
+        "footer": (),
+    }
+    DEFAULTS = {
+        "header": "*熊熊媽團團轉{date}訂購清單*\n\n"
+        "#取貨時間三點到七點\n#本日到貨狀況請留意公告\n================\n",
+        "buyer": "訂購人：{name}\n",
+        "item": "訂購商品：{item}\n品項單價：{price}\n數量品項：{quantity}\n----------------\n",
+        "footer": "已讀請回覆訊息喔~",
+    }
+
+    def __init__(self, **fields):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"訊息範本沒有這些欄位：{', '.join(sorted(unknown))}")
+        for field, names in self.FIELDS.items():
+            text = fields.get(field)
+            if text is None:
+                text = self.DEFAULTS[field]
+            try:
+                text.format(**{name: "" for name in names})
+            except (KeyError, IndexError, ValueError, AttributeError) as e:
+                allowed = "、".join(f"{{{name}}}" for name in names) or "無"
+                raise ValueError(
+                    f"訊息範本「{field}」格式有誤（{e!r}）；可用的欄位：{allowed}"
+                ) from None
+            setattr(self, field, text)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other):
+        return isinstance(other, MessageTemplate) and self.as_dict() == other.as_dict()
+
+    @classmethod
+    def load(cls, path=TEMPLATE_FILE):
+        """讀入範本檔；檔案不存在時用預設範本，內容有誤時丟出 ValueError。"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                fields = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        if not isinstance(fields, dict):
+            raise ValueError("訊息範本檔應為 JSON 物件")
+        return cls(**fields)
+
+    def save(self, path=TEMPLATE_FILE):
+        payload = json.dumps(self.as_dict(), ensure_ascii=False, indent=2)
+        with atomic_output(path) as tmp:
+            Path(tmp).write_text(payload, encoding="utf-8")
+
+
+def _render(state, name):
+    """組出 name 的訊息；state = (compiled, 訊息列, ordered, codes, 品項名稱)。"""
+    (header, buyer, footer, blocks), message_rows, ordered, codes, item_names = state
+    i = message_rows[name]
+    cols = sorted(ordered[i].nonzero()[0].tolist(), key=item_names.__getitem__)
+    row = codes[i]
+    body = "".join([blocks[j][row[j]] for j in cols])
+    return f"{header}{buyer.format(name=name)}{body}{footer}"
+
+
+class OrderBook:
+    """
+    一次上傳編譯出的訂單資料（逐欄流程）：
+      - 價格列只解析一次成數值向量。
+      - 訂購數量整欄轉換成相異值代碼，訂購遮罩與每人總金額以整個陣列計算。
+      - 訊息文字與個人訂購明細只在需要時才逐人組裝；標題與結尾依範本預先組好，
+        每段商品（品項、單價、數量）只格式化一次，之後各訂購人共用。
+      - 每個品項的訂購人集合存成位元集合（Python int，第 k 位 = sorted_names[k]），
+        依產品排序與多品項查詢只需位元運算，不必逐人查明細。
+      - update() 可就地加入訂購人、換掉或新增品項欄、改價格，只重算受影響的欄與人
+        （表單直接餵資料時用，見 SheetOrders）。
+    組出的訊息與逐列 iterrows 的舊版逐字相同。
+    """
+
+    def __init__(self, data, today_date, template=None):
+        rows = data.iloc[1:].fillna("").values
+        n_items = len(data.columns) - 2
+        self._load(
+            list(data.columns[2:]),
+            list(data.iloc[0, 2:]),
+            rows[:, 1] if len(rows) else [],  # 假設第2欄為訂購人姓名
+            [rows[:, j + 2] for j in range(n_items)],
+            today_date,
+            template,
+        )
+
+    @classmethod
+    def from_columns(cls, item_names, prices, row_names, columns, today_date, template=None):
+        """
+        不經過 DataFrame 直接編譯：prices、columns 依 item_names 的順序，
+        columns[j] 是該品項各訂購人的儲存格（與 row_names 對齊，空白為 ""）。
+        """
+        book = cls.__new__(cls)
+        book._load(item_names, prices, row_names, columns, today_date, template)
+        return book
+
+    def _load(self, item_names, prices, row_names, columns, today_date, template):
+        import numpy as np
+
+        self.item_names = list(item_names)
+        self._item_columns = {item: j for j, item in enumerate(self.item_names)}
+        self._row_names = list(row_names)
+        self.names = []  # 有訂購的訂購人，依第一次出現的順序
+        self.totals = {}  # 訂購人 -> 訂單總金額
+        self._message_rows = {}  # 訂購人 -> 組訊息用的資料列（同名取最後一列）
+        self._detail_rows = {}  # 訂購人 -> 訂購明細用的資料列
+        n_rows, n_items = len(self._row_names), len(self.item_names)
+
+        # 價格列：每個品項只解析一次
+        parsed_prices = [parse_price(p) for p in prices]
+        self._price_values = [p for p, _ in parsed_prices]
+        self._price_strs = [price_str for _, price_str in parsed_prices]
+
+        self._codes = np.zeros((n_rows, n_items), dtype=np.int32)
+        self._ordered = np.zeros((n_rows, n_items), dtype=bool)
+        self._quantities, self._displays = [None] * n_items, [None] * n_items
+        self._numeric, self._chargeable = [None] * n_items, [None] * n_items
+        for j, column in enumerate(columns):
+            self._set_column(j, column)
+        self._update_rows(np.arange(n_rows))
+        self.names = list(self._message_rows)
+        self.sorted_names = []
+        self._index_members()
+
+        self.today_date = today_date
+        self.set_template(template or MessageTemplate())
+
+    def _set_column(self, j, column):
+        import numpy as np
+
+        codes, quantities, displays, numeric, is_numeric, ordered = (
+            _coerce_quantity_column(np.asarray(column, dtype=object))
+        )
+        self._codes[:, j] = codes
+        self._ordered[:, j] = ordered[codes]
+        self._quantities[j], self._displays[j] = quantities, displays
+        self._numeric[j], self._chargeable[j] = numeric, ordered & is_numeric
+
+    def _update_rows(self, rows):
+        """重算 rows 這些資料列的總金額，以及誰有訂購（要產生訊息）。"""
+        import numpy as np
+
+        amounts = np.zeros((len(rows), len(self.item_names)), dtype=float)
+        with np.errstate(invalid="ignore", over="ignore"):
+            for j, price in enumerate(self._price_values):
+                if price is not None:
+                    codes = self._codes[rows, j]
+                    amounts[:, j] = np.where(
+                        self._chargeable[j][codes], price * self._numeric[j][codes], 0.0
+                    )
+        # 依欄位順序逐欄累加，與舊版逐項相加的浮點結果一致
+        if self.item_names:
+            totals = np.cumsum(amounts, axis=1)[:, -1]
+        else:
+            totals = np.zeros(len(rows))
+        has_order = self._ordered[rows].any(axis=1)
+
+        for i, total, ordered in zip(rows.tolist(), totals.tolist(), has_order.tolist()):
+            name = self._row_names[i]
+            if not str(name).strip():
+                continue
+            self._detail_rows[name] = i
+            self.totals[name] = total
+            if ordered:
+                self._message_rows[name] = i
+            elif self._message_rows.get(name) == i:
+                del self._message_rows[name]
+
+    def line_items(self):
+        """
+        每位訂購人（與 totals 同一列）有訂購的數值品項，攤平成向量：回傳
+        (姓名清單, 姓名索引, 品項索引, 數量, 金額)，金額與 totals 的算法相同，沒有價格為 0。
+        """
+        import numpy as np
+
+        names = list(self._detail_rows)
+        rows = np.fromiter(self._detail_rows.values(), dtype=np.intp, count=len(names))
+        quantities = np.zeros((len(rows), len(self.item_names)), dtype=float)
+        amounts = np.zeros_like(quantities)
+        with np.errstate(invalid="ignore", over="ignore"):
+            for j, price in enumerate(self._price_values):
+                codes = self._codes[rows, j]
+                quantities[:, j] = np.where(self._chargeable[j][codes], self._numeric[j][codes], 0.0)
+                if price is not None:
+                    amounts[:, j] = price * quantities[:, j]
+        who, item = np.nonzero(quantities)
+        return names, who, item, quantities[who, item], amounts[who, item]
+
+    def _index_members(self, columns=None):
+        """
+        品項 -> 有訂購的訂購人位元集合（依各人的明細列判斷，與 quantity() 一致）。
+        訂購人沒變時只重算 columns 這幾欄。
+        """
+        import numpy as np
+
+        sorted_names = sorted(self.names)
+        if columns is None or sorted_names != self.sorted_names:
+            self.sorted_names = sorted_names
+            self._item_bits = [0] * len(self.item_names)
+            columns = range(len(self.item_names))
+        if not columns:
+            return
+        member_rows = [self._detail_rows[name] for name in self.sorted_names]
+        bits = np.packbits(
+            self._ordered[np.ix_(member_rows, list(columns))], axis=0, bitorder="little"
+        )
+        for k, j in enumerate(columns):
+            self._item_bits[j] = int.from_bytes(bits[:, k].tobytes(), "little")
+
+    def update(self, names=(), columns=None, prices=None, items=None, order=None):
+        """
+        就地套用變更（表單新增商品時用），回傳訊息或總金額可能改變的訂購人：
+          - names：新的訂購人，接在最後一列之後，各品項先是空白。
+          - columns：{品項: 儲存格}，與所有資料列對齊（含剛加入的 names）；
+            沒看過的品項是新的一欄。
+          - prices：{品項: 價格儲存格}。
+          - items / order：品項與訂購人的新順序（item_names 與 names 依此排列）。
+        只重算 columns、prices 提到的欄，以及有（或原本有）訂這些品項的訂購人；
+        之前拿到的 renderer() 用的是當時的複本，不受影響。
+        """
+        import numpy as np
+
+        columns, prices = columns or {}, prices or {}
+        if names:
+            self._row_names.extend(names)
+            grow = ((0, len(names)), (0, 0))
+            self._codes = np.pad(self._codes, grow)
+            self._ordered = np.pad(self._ordered, grow)
+            # 新列在既有各欄都是空白，也就是各欄最後一個相異值（缺值）
+            for j, quantities in enumerate(self._quantities):
+                self._codes[-len(names):, j] = len(quantities) - 1
+        for item in dict.fromkeys([*columns, *prices]):
+            if item not in self._item_columns:
+                self._add_item(item)
+
+        changed = list(dict.fromkeys([*columns, *prices]))
+        js = [self._item_columns[item] for item in changed]
+        touched = self._ordered[:, js].any(axis=1)
+        for item, column in columns.items():
+            self._set_column(self._item_columns[item], column)
+        for item, raw_price in prices.items():
+            j = self._item_columns[item]
+            self._price_values[j], self._price_strs[j] = parse_price(raw_price)
+        touched |= self._ordered[:, js].any(axis=1)
+        if names:
+            touched[-len(names):] = True
+        rows = touched.nonzero()[0]
+        self._update_rows(rows)
+
+        if items is not None:
+            self._reorder_items(items)
+        if order is not None:
+            self.names = [name for name in order if name in self._message_rows]
+        else:
+            self.names = list(self._message_rows)
+        self._index_members([self._item_columns[item] for item in changed])
+        self._compile()
+        return {self._row_names[i] for i in rows.tolist()}
+
+    def _add_item(self, item):
+        import numpy as np
+
+        j = len(self.item_names)
+        self.item_names.append(item)
+        self._item_columns[item] = j
+        self._codes = np.pad(self._codes, ((0, 0), (0, 1)))
+        self._ordered = np.pad(self._ordered, ((0, 0), (0, 1)))
+        for values in (self._quantities, self._displays, self._numeric, self._chargeable):
+            values.append(None)
+        self._price_values.append(None)
+        self._price_strs.append(parse_price("")[1])
+        self._item_bits.append(0)
+        self._set_column(j, [""] * len(self._row_names))
+
+    def _reorder_items(self, items):
+        order = [self._item_columns[item] for item in items]
+        if len(order) != len(self.item_names):
+            raise ValueError("items 必須列出所有品項")
+        if order == list(range(len(order))):
+            return
+        self._codes = self._codes[:, order]
+        self._ordered = self._ordered[:, order]
+        for attr in ("_quantities", "_displays", "_numeric", "_chargeable",
+                     "_price_values", "_price_strs", "_item_bits"):
+            values = getattr(self, attr)
+            setattr(self, attr, [values[j] for j in order])
+        self.item_names = list(items)
+        self._item_columns = {item: j for j, item in enumerate(self.item_names)}
+
+    def set_date(self, today_date):
+        """換上當天日期的訊息標題（快取中的 OrderBook 可能是前幾天編譯的）。"""
+        self.today_date = today_date
+        self._compile()
+
+    def set_template(self, template, today_date=None):
+        """換範本（可一併換日期），重新預先組好標題與各商品段落。"""
+        self.template = template
+        if today_date is not None:
+            self.today_date = today_date
+        self._compile()
+
+    def _compile(self):
+        # 換日期或範本時整組換掉，已經拿到舊組的 renderer() 不受影響。
+        # 商品段落依（品項, 單價, 數量）各格式化一次：blocks[j][數量代碼]
+        t = self.template
+        self.header = t.header.format(date=self.today_date)
+        blocks = [
+            [
+                t.item.format(item=item, price=price, quantity=quantity)
+                for quantity in displays
+            ]
+            for item, price, displays in zip(
+                self.item_names, self._price_strs, self._displays
+            )
+        ]
+        self._compiled = (self.header, t.buyer, t.footer.format(), blocks)
+        # render() 直接讀目前的資料；update() 換掉陣列後一定會呼叫 _compile
+        self._live = (self._compiled, self._message_rows, self._ordered, self._codes, self.item_names)
+
+    def __contains__(self, name):
+        return name in self._message_rows
+
+    def render(self, name):
+        """組出某位訂購人的訂購訊息。"""
+        return _render(self._live, name)
+
+    def renderer(self):
+        """
+        固定目前資料、日期與範本的 render（背景匯出用）：update() 會就地改寫數量與訂購人，
+        所以這裡先複製一份，匯出到一半時表單同步或改範本，都不會混用新舊資料。
+        """
+        return partial(
+            _render,
+            (self._compiled, dict(self._message_rows), self._ordered.copy(),
+             self._codes.copy(), list(self.item_names)),
+        )
+
+    def detail_names(self):
+        return list(self._detail_rows)
+
+    def details(self, name):
+        """某位訂購人各產品的訂購數量（字典：產品名稱 -> 數量）。"""
+        codes = self._codes[self._detail_rows[name]].tolist()
+        return {
+            item: self._quantities[j][codes[j]]
+            for j, item in enumerate(self.item_names)
+        }
+
+    def item_mask(self, item):
+        """訂購了 item 的訂購人位元集合；沒有這個品項時為 0。"""
+        j = self._item_columns.get(item)
+        return 0 if j is None else self._item_bits[j]
+
+    def query_mask(self, items, any_of=False):
+        """多品項查詢：any_of=False 為全部都有訂（AND），True 為任一有訂（OR）。"""
+        masks = [self.item_mask(item) for item in items]
+        if not masks:
+            return 0
+        mask = masks[0]
+        for m in masks[1:]:
+            mask = (mask | m) if any_of else (mask & m)
+        return mask
+
+    def _member_flags(self, mask):
+        """位元集合 -> 與 sorted_names 對齊的布林陣列。"""
+        import numpy as np
+
+        n = len(self.sorted_names)
+        raw = np.frombuffer(mask.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(raw, count=n, bitorder="little").astype(bool)
+
+    def buyers_with(self, items, any_of=False):
+        """訂購了 items（全部或任一）的訂購人，依姓名排序。"""
+        flags = self._member_flags(self.query_mask(items, any_of))
+        return [self.sorted_names[k] for k in flags.nonzero()[0].tolist()]
+
+    def partition_by(self, items, any_of=False):
+        """有訂 items 的訂購人在前、其餘在後，兩段各自依姓名排序（線性分割，不再排序）。"""
+        flags = self._member_flags(self.query_mask(items, any_of))
+        names = self.sorted_names
+        return [names[k] for k in flags.nonzero()[0].tolist()] + [
+            names[k] for k in (~flags).nonzero()[0].tolist()
+        ]
+
+    def quantity(self, name, item, default=0):
+        """單一儲存格的訂購數量，等同 details(name).get(item, default)。"""
+        i, j = self._detail_rows.get(name), self._item_columns.get(item)
+        if i is None or j is None:
+            return default
+        return self._quantities[j][self._codes[i, j]]
+
+
+class OrderDetails(Mapping):
+    """訂購人 -> {產品名稱: 數量} 的唯讀檢視，明細於讀取時才從 OrderBook 組出。"""
+
+    def __init__(self, book=None):
+        self.book = book
+
+    def __getitem__(self, name):
+        if self.book is None:
+            raise KeyError(name)
+        return self.book.details(name)
+
+    def __iter__(self):
+        return iter(self.book.detail_names() if self.book else ())
+
+    def __len__(self):
+        return len(self.book.detail_names()) if self.book else 0
+
+
+class MessageCache(Mapping):
+    """
+    訂購人 -> 訂購訊息。訊息在第一次選取、複製或匯出時才由 OrderBook 組裝，
+    最近用過的 capacity 筆保留在 LRU 快取；手動編輯的內容存成覆寫，永遠不會被淘汰。
+    """
+
+    def __init__(self, book=None, capacity=256):
+        self.book = book
+        self.capacity = capacity
+        self.overrides = {}
+        self._cache = OrderedDict()
+
+    def load(self, book):
+        self.book = book
+        self.overrides.clear()
+        self._cache.clear()
+
+    def refresh(self):
+        """範本改變後丟掉已組好的訊息；手動編輯的內容保留。"""
+        self._cache.clear()
+
+    def invalidate(self, names):
+        """只丟掉這些訂購人已組好的訊息（訂單更新時用）；手動編輯的內容保留。"""
+        for name in names:
+            self._cache.pop(name, None)
+
+    def set_override(self, name, text):
+        self.overrides[name] = text
+        self._cache.pop(name, None)
+
+    def render(self, name):
+        """取得訊息但不放入快取（供大量匯出使用，避免洗掉常用項目）。"""
+        if name in self.overrides:
+            return self.overrides[name]
+        if name in self._cache:
+            return self._cache[name]
+        if self.book is None or name not in self.book:
+            raise KeyError(name)
+        return self.book.render(name)
+
+    def __getitem__(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+        message = self.render(name)
+        self._cache[name] = message
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return message
+
+    def __contains__(self, name):
+        return self.book is not None and name in self.book
+
+    def __iter__(self):
+        return iter(self.book.names if self.book else ())
+
+    def __len__(self):
+        return len(self.book.names) if self.book else 0
+
+
+def build_order_messages(data, today_date):
+    """
+    一次組出全部訂購訊息，回傳 (messages, order_details, order_totals)；
+    與舊版逐列產生的結果逐字相同（效能測試用來比對輸出）。
+    """
+    if data is None or data.empty:
+        return {}, {}, {}
+    book = OrderBook(data, today_date)
+    messages = {name: book.render(name) for name in book.names}
+    order_details = {name: book.details(name) for name in book.detail_names()}
+    return messages, order_details, dict(book.totals)
+
+
+# ---------------------- 表單直接餵資料 ----------------------
+class SheetOrders:
+    """
+    表單的訂單（訂單解析.SheetModel）加上一列價格 -> OrderBook，不經過 Excel 檔：
+      - build()：依目前的表單整份編譯一次。
+      - sync(changes)：套用一批 SheetModel.take_changes()，只重算新增或改過的品項欄，
+        回傳訊息可能改變的訂購人。
+      - set_prices()：改價格，只影響有訂這些品項的訂購人。
+    儲存格取 cell_value（與匯出 Excel 的內容相同），組出的訊息也與匯出後再上傳相同。
+    """
+
+    def __init__(self, model, prices=None):
+        self.model = model
+        self.prices = dict(prices or {})  # 品項 -> 價格（使用者輸入的文字）
+        self.book = None  # build() 之前、或訊息視窗關掉後為 None，sync 不做事
+        self._rows = []  # 資料列 -> 訂購人（依加入 OrderBook 的順序）
+
+    def build(self, today_date, template=None):
+        model = self.model
+        self._rows = list(model.buyers)
+        with 計時.span("訊息.sheet", "編譯訂單表") as sp:
+            self.book = OrderBook.from_columns(
+                model.items,
+                [self.prices.get(item, "") for item in model.items],
+                self._rows,
+                self._columns(model.items),
+                today_date,
+                template,
+            )
+            sp.count(buyers=len(self.book.names), products=len(model.items))
+        return self.book
+
+    def sync(self, changes):
+        """changes = (新品項, 新訂購人, 改過的儲存格)，即 SheetModel.take_changes() 的回傳值。"""
+        new_items, new_buyers, touched = changes
+        if self.book is None or not (new_items or new_buyers or touched):
+            return set()
+        added = [buyer for _, buyer in new_buyers]
+        self._rows.extend(added)
+        changed = {item for _, item in new_items}
+        for items in touched.values():
+            changed.update(items)
+        with 計時.span("訊息.sync", "更新訊息") as sp:
+            affected = self.book.update(
+                names=added,
+                columns={item: self._column(item) for item in self.model.items
+                         if item in changed},
+                # 新品項的欄位一開始沒有價格，建構時或先前 set_prices 給過的價格要一併帶入
+                prices={item: self.prices[item] for _, item in new_items if item in self.prices},
+                items=self.model.items if new_items else None,
+                order=self.model.buyers,
+            )
+            sp.count(buyers=len(affected), products=len(changed))
+        return affected
+
+    def set_prices(self, prices):
+        """{品項: 價格}；回傳總金額或訊息會改變的訂購人。"""
+        items = set(self.model.items)
+        changed = {
+            item: price for item, price in prices.items()
+            if item in items and self.prices.get(item, "") != price
+        }
+        self.prices.update(changed)
+        if self.book is None or not changed:
+            return set()
+        return self.book.update(prices=changed, order=self.model.buyers)
+
+    def _column(self, item):
+        data = self.model.data
+        return [
+            cell_value(data[buyer][item]) if item in data[buyer] else ""
+            for buyer in self._rows
+        ]
+
+    def _columns(self, items):
+        """整張表的各欄：逐人掃一次，只碰有填的格子（訂單表通常很稀疏）。"""
+        position = {item: k for k, item in enumerate(items)}
+        columns = [[""] * len(self._rows) for _ in items]
+        data = self.model.data
+        for i, buyer in enumerate(self._rows):
+            for item, cell in data[buyer].items():
+                columns[position[item]][i] = cell_value(cell)
+        return columns
+
+
+# ---------------------- 上傳檔案快取 ----------------------
+class ParseCache:
+    """
+    以檔案內容的 SHA-256 為鍵，把上傳編譯好的 OrderBook 存在磁碟上：
+      - <digest>.pkl：價格、訂購明細與訊息組裝所需的資料（pickle），
+        再次開啟內容相同的檔案時不必再讀 Excel。
+      - <digest>.edits.json：手動編輯過的訊息，重新上傳後自動套回。
+    .pkl 總大小超過 max_bytes 時，依最後使用時間淘汰最舊的項目；編輯檔很小，不淘汰。
+    快取目錄無法寫入時只是不快取，不影響上傳。
+    """
+
+    VERSION = 5  # OrderBook 結構改變時遞增，舊快取自動失效
+
+    def __init__(self, directory=None, max_bytes=256 * 2**20):
+        if directory is None:
+            directory = os.environ.get("GROUP_BUYING_CACHE") or (
+                Path.home() / ".cache" / "group_buying"
+            )
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def digest(file_path):
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _path(self, digest, suffix):
+        return self.directory / f"{digest}{suffix}"
+
+    def load(self, digest):
+        """取出快取的 OrderBook；沒有、版本不符或檔案損毀時回傳 None。"""
+        path = self._path(digest, ".pkl")
+        try:
+            with open(path, "rb") as f:
+                version, book = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        if version != self.VERSION:
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # 更新最後使用時間
+        except OSError:
+            pass
+        return book
+
+    def store(self, digest, book):
+        try:
+            self._write(self._path(digest, ".pkl"), pickle.dumps(
+                (self.VERSION, book), protocol=pickle.HIGHEST_PROTOCOL
+            ))
+            self._evict()
+        except OSError:
+            pass
+
+    def edits(self, digest):
+        try:
+            with open(self._path(digest, ".edits.json"), encoding="utf-8") as f:
+                return {name: text for name, text in json.load(f)}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def save_edits(self, digest, overrides):
+        # 存成 [姓名, 訊息] 清單，數字姓名讀回來仍是數字
+        payload = json.dumps(list(overrides.items()), ensure_ascii=False, default=str)
+        try:
+            self._write(self._path(digest, ".edits.json"), payload.encode("utf-8"))
+        except OSError:
+            pass
+
+    def _write(self, path, payload):
+        """先寫暫存檔再 os.replace，寫到一半中斷也不會留下損毀的快取。"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    def _evict(self):
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def compile_order_file(file_path, cache, today_date, job=None, template=None):
+    """
+    讀入訂單檔並編譯 OrderBook；不碰任何元件，可在背景執行緒呼叫。
+    內容相同的檔案直接取用磁碟快取（不再讀 Excel），之前手動編輯過的訊息一併讀回。
+    回傳 (data, book, digest, edits)：data 只有真的讀了檔案才有；檔案沒有資料時 book 為 None。
+    template 為 None 時用預設範本。
+    """
+    template = template or MessageTemplate()
+    with 計時.span("訊息.upload", "讀取訂單檔") as sp:
+        digest = cache.digest(file_path)
+        book = cache.load(digest)
+        if book is not None:
+            book.set_template(template, today_date)
+            sp.count(buyers=len(book.names), products=len(book.item_names), cached=True)
+            return None, book, digest, cache.edits(digest)
+        # .xlsx 以唯讀逐列方式讀取；也接受同樣欄位配置的 .csv / .parquet
+        data = read_sheet(file_path)
+        if data.empty:
+            return data, None, digest, {}
+        if job is not None:
+            job.check()
+        book = OrderBook(data, today_date, template)
+        sp.count(buyers=len(book.names), products=len(book.item_names))
+        cache.store(digest, book)
+        return data, book, digest, cache.edits(digest)
+
+
+# ---------------------- 背景匯出 ----------------------
+EXPORT_MODES = {"單一文字檔": "combined", "每人一檔": "per_buyer", "ZIP 壓縮檔": "zip"}
+RE_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def safe_filename(name, used):
+    """訂購人 -> 可用的檔名（去掉不合法字元，重複時加上 (2)、(3)…）。"""
+    base = RE_UNSAFE_FILENAME.sub("_", str(name)).strip(" .") or "_"
+    filename, k = f"{base}.txt", 2
+    while filename.casefold() in used:
+        filename, k = f"{base} ({k}).txt", k + 1
+    used.add(filename.casefold())
+    return filename
+
+
+@contextmanager
+def atomic_output(path):
+    """先寫到同資料夾的暫存檔，成功後才 os.replace 成正式檔名；失敗或取消時刪掉暫存檔。"""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_message_export(entries, mode, path, total, progress=None):
+    """
+    把 (訂購人, 訊息) 逐筆寫出，供背景執行緒呼叫；entries 可以是產生器，邊組訊息邊寫：
+      - combined：全部寫進一個 .txt（與原本的匯出格式相同）。
+      - per_buyer：path 資料夾內每人一個 .txt。
+      - zip：每人一個 .txt，打包成一個 .zip。
+    每個檔案都先寫暫存檔再改名，中途出錯或取消不會留下寫到一半的檔案。
+    progress(已完成, 總數) 每筆呼叫一次；它丟出的例外（例如取消時的 JobCancelled）會中止匯出。
+    回傳寫出的筆數。
+    """
+    done = 0
+    sp = 計時.span("訊息.export", "匯出訊息")
+
+    def step():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total)
+
+    with sp:
+        _write_entries(entries, mode, path, step)
+        sp.count(messages=done)
+    return done
+
+
+def _write_entries(entries, mode, path, step):
+    if mode == "combined":
+        with atomic_output(path) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            for name, text in entries:
+                f.write(f"訂購人：{name}\n{text}\n{'=' * 40}\n")
+                step()
+    elif mode == "zip":
+        used = set()
+        with atomic_output(path) as tmp, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, text in entries:
+                zf.writestr(safe_filename(name, used), text)
+                step()
+    elif mode == "per_buyer":
+        used = set()
+        os.makedirs(path, exist_ok=True)
+        for name, text in entries:
+            with atomic_output(Path(path, safe_filename(name, used))) as tmp:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+            step()
+    else:
+        raise ValueError(f"未知的匯出方式：{mode}")
+
+
+# ---------------------- 姓名搜尋索引 ----------------------
+class NameIndex:
+    """
+    上傳時建立一次的訂購人子字串索引：每個單字元與二字元片段對應到名次集合。
+    查詢時取各片段集合的交集，再以 `in` 確認，結果依姓名排序回傳。
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self._lowered = [str(name).lower() for name in self.names]
+        self._grams = defaultdict(set)
+        for rank, lowered in enumerate(self._lowered):
+            for k in range(len(lowered)):
+                self._grams[lowered[k]].add(rank)
+                if k + 1 < len(lowered):
+                    self._grams[lowered[k : k + 2]].add(rank)
+
+    def search(self, term):
+        """回傳姓名（小寫）包含 term 的訂購人，依姓名排序。"""
+        term = term.lower()
+        if not term:
+            return list(self.names)
+        if len(term) == 1:
+            ranks = self._grams.get(term, set())
+        else:
+            postings = sorted(
+                (self._grams.get(term[k : k + 2], set()) for k in range(len(term) - 1)),
+                key=len,
+            )
+            ranks = set(postings[0]).intersection(*postings[1:])
+            if len(term) > 2:
+                ranks = {r for r in ranks if term in self._lowered[r]}
+        return [self.names[r] for r in sorted(ranks)]
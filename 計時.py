@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Operation timing for the three tools (表單.py, 訊息.py, 統計.py).
+
+  • span(name, label) times one whole operation — a parse, a table refresh, an
+    upload, an export — never a single line, and carries counts such as lines
+    read or skipped. Finished spans are kept for the status bar (summary()).
+  • GROUP_BUYING_TRACE=trace.jsonl appends every finished span as one JSON line.
+  • GROUP_BUYING_PROFILE=run.prof runs each outermost span under cProfile and
+    keeps the merged statistics in that file (python -m pstats run.prof).
+  • GROUP_BUYING_TIMING=0 switches everything off; span() then hands out a
+    shared no-op object, so the instrumented paths cost one call and a flag test.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# How counts read in the status bar; anything else only goes to the trace
+COUNT_LABELS = {
+    "lines":     "{:,} 行",
+    "noise":     "雜訊 {:,}",
+    "unmatched": "無法判讀 {:,}",
+    "files":     "{:,} 個檔案",
+    "buyers":    "{:,} 位買家",
+    "products":  "{:,} 項商品",
+    "rows":      "{:,} 列",
+    "columns":   "{:,} 欄",
+    "cells":     "{:,} 格",
+    "messages":  "{:,} 則訊息",
+    "matches":   "{:,} 筆符合",
+    "cached":    "使用快取",
+}
+SUMMARY_SPANS = 3                           # newest spans shown by summary()
+
+_enabled = True
+_trace_path: str | None = None
+_trace_file = None
+_profile_path: str | None = None
+_profile_stats = None                       # pstats.Stats, once something was captured
+_profile_lock = threading.Lock()            # cProfile captures one span at a time
+_lock = threading.Lock()                    # guards _recent and the trace file
+_recent: deque = deque(maxlen=32)
+_local = threading.local()                  # per-thread span depth
+
+class Span:
+    """A running / finished operation; use as a context manager."""
+
+    __slots__ = ("name", "label", "counts", "elapsed", "_start", "_profile")
+
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+        self.counts: dict = {}
+        self.elapsed = 0.0
+
+    def count(self, **counts) -> None:
+        self.counts.update(counts)
+
+    def describe(self) -> str:
+        parts = []
+        for key, fmt in COUNT_LABELS.items():
+            value = self.counts.get(key)
+            if value is True:
+                parts.append(fmt)
+            elif value is not None and value is not False:
+                parts.append(fmt.format(value))
+        text = f"{self.label} {self.elapsed:.2f} s"
+        return f"{text}（{'、'.join(parts)}）" if parts else text
+
+    def __enter__(self):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        self._profile = _start_profile() if depth == 0 and _profile_path else None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        _local.depth -= 1
+        if self._profile is not None:
+            _stop_profile(self._profile)
+        _finish(self, exc_type)
+        return False
+
+class _NoSpan:
+    """What span() returns while timing is off."""
+
+    __slots__ = ()
+
+    def count(self, **counts) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = _NoSpan()
+
+def span(name: str, label: str | None = None):
+    """Time a block: `with span("表單.parse", "解析留言") as sp: … sp.count(lines=n)`."""
+    return Span(name, label or name) if _enabled else NO_SPAN
+
+# ── Settings ────────────────────────────────────────────────────────
+def configure(enabled: bool | None = None, trace: str | None = None,
+              profile: str | None = None) -> None:
+    """Switch timing on/off, start a JSON-lines trace, or start cProfile capture."""
+    global _enabled, _trace_path, _trace_file, _profile_path, _profile_stats
+    if enabled is not None:
+        _enabled = enabled
+    if trace is not None:
+        with _lock:
+            if _trace_file is not None:
+                _trace_file.close()
+            _trace_path, _trace_file = trace, None
+    if profile is not None:
+        with _profile_lock:
+            _profile_path, _profile_stats = profile, None
+
+def _from_environment() -> None:
+    configure(enabled=os.environ.get("GROUP_BUYING_TIMING", "1") != "0",
+              trace=os.environ.get("GROUP_BUYING_TRACE") or None,
+              profile=os.environ.get("GROUP_BUYING_PROFILE") or None)
+
+# ── Status bar ──────────────────────────────────────────────────────
+def take_recent() -> list[Span]:
+    """Spans finished since the last call, oldest first."""
+    with _lock:
+        spans = list(_recent)
+        _recent.clear()
+    return spans
+
+def summary(spans: list[Span] | None = None) -> str:
+    """One status-bar line for the newest spans ('' when nothing was timed)."""
+    if spans is None:
+        spans = take_recent()
+    return " · ".join(sp.describe() for sp in spans[-SUMMARY_SPANS:])
+
+# ── Internals ───────────────────────────────────────────────────────
+def _finish(sp: Span, exc_type) -> None:
+    with _lock:
+        _recent.append(sp)
+        if _trace_path is not None:
+            _write_trace(sp, exc_type)
+
+def _write_trace(sp: Span, exc_type) -> None:
+    global _trace_file
+    record = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "name": sp.name,
+        "seconds": round(sp.elapsed, 6),
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        **sp.counts,
+    }
+    if exc_type is not None:
+        record["error"] = exc_type.__name__
+    try:
+        if _trace_file is None:
+            _trace_file = open(_trace_path, "a", encoding="utf-8", buffering=1)
+        _trace_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        pass                                # tracing must never break the tool
+
+def _start_profile():
+    import cProfile                         # only in profile mode
+
+    if not _profile_lock.acquire(blocking=False):
+        return None                         # another thread is being profiled
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+def _stop_profile(profile) -> None:
+    import pstats
+
+    global _profile_stats
+    profile.disable()
+    try:
+        if _profile_stats is None:
+            _profile_stats = pstats.Stats(profile)
+        else:
+            _profile_stats.add(profile)
+        _profile_stats.dump_stats(_profile_path)
+    except OSError:
+        pass
+    finally:
+        _profile_lock.release()
+
+_from_environment()
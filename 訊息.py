@@ -1,9 +1,144 @@
-﻿import pandas as pd
-import customtkinter as ctk
+﻿import customtkinter as ctk
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import filedialog, messagebox
 from datetime import datetime
-import pyperclip
+from 訂購訊息 import (
+    EXPORT_MODES,
+    MessageCache,
+    MessageTemplate,
+    NameIndex,
+    OrderBook,
+    OrderDetails,
+    ParseCache,
+    compile_order_file,
+    parse_order_quantity,
+    write_message_export,
+)
+from 工作表 import OPEN_FILETYPES
+from 排程 import JobRunner, JobStatusBar
+from 姓名比對 import similar_names
+import 計時
+
+SIMILAR_NAMES_SHOWN = 20  # 上傳後提醒視窗最多列出幾組相似姓名
+
+
+# ---------------------- 虛擬化訂購人列表 ----------------------
+class VirtualListbox(tk.Frame):
+    """
+    只實體化可見列的清單：完整資料保留在 self.items，
+    tk.Listbox 內只放目前捲動視窗內的幾十列，捲軸與滑鼠滾輪由本類別換算。
+    已複製的反白由 is_marked(item) 決定，因此篩選或排序後仍對應正確的人。
+    """
+
+    def __init__(self, parent, on_select=None, is_marked=None, **listbox_options):
+        super().__init__(parent)
+        self.items = []
+        self.top = 0  # 第一個可見列在 items 中的位置
+        self.selected = None  # 被選取列在 items 中的位置
+        self.on_select = on_select
+        self.is_marked = is_marked or (lambda item: False)
+
+        self.listbox = tk.Listbox(self, exportselection=False, **listbox_options)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self._font = tkfont.Font(font=self.listbox.cget("font"))
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Configure>", lambda event: self.refresh())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.listbox.bind(sequence, self._on_wheel)
+        self.listbox.bind("<Up>", lambda event: self._step(-1))
+        self.listbox.bind("<Down>", lambda event: self._step(1))
+
+    def set_items(self, items):
+        """替換整份清單；原本選取的項目若仍存在則保持選取。"""
+        current = self.selected_item()
+        self.items = list(items)
+        self.top = 0
+        self.selected = None
+        if current is not None:
+            try:
+                self.selected = self.items.index(current)
+            except ValueError:
+                pass
+        self.refresh()
+
+    def selected_item(self):
+        if self.selected is None or self.selected >= len(self.items):
+            return None
+        return self.items[self.selected]
+
+    def refresh(self):
+        """依目前捲動位置重畫可見列（含反白）與捲軸。"""
+        rows = self._visible_rows()
+        self.top = max(0, min(self.top, len(self.items) - rows))
+        window = self.items[self.top : self.top + rows]
+        self.listbox.delete(0, tk.END)
+        if window:
+            self.listbox.insert(tk.END, *window)
+        for offset, item in enumerate(window):
+            if self.is_marked(item):
+                self.listbox.itemconfig(offset, bg="black", fg="white")
+        if self.selected is not None and 0 <= self.selected - self.top < len(window):
+            self.listbox.selection_set(self.selected - self.top)
+        if self.items:
+            self.scrollbar.set(self.top / len(self.items),
+                               (self.top + len(window)) / len(self.items))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _visible_rows(self):
+        row_height = self._font.metrics("linespace") + 1 + 2 * int(
+            self.listbox.cget("selectborderwidth")
+        )
+        padding = 2 * (int(self.listbox.cget("borderwidth"))
+                       + int(self.listbox.cget("highlightthickness")))
+        return max(1, (self.listbox.winfo_height() - padding) // row_height)
+
+    def _scroll_to(self, top):
+        self.top = top
+        self.refresh()
+
+    def _on_scroll(self, action, amount, unit=None):
+        rows = self._visible_rows()
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.items)))
+        elif unit == "pages":
+            self._scroll_to(self.top + int(amount) * rows)
+        else:
+            self._scroll_to(self.top + int(amount))
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self.top - 3)
+        else:
+            self._scroll_to(self.top + 3)
+        return "break"
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        self.selected = self.top + selection[0]
+        if self.on_select:
+            self.on_select(self.items[self.selected])
+
+    def _step(self, delta):
+        if not self.items:
+            return "break"
+        start = self.top if self.selected is None else self.selected + delta
+        self.selected = max(0, min(start, len(self.items) - 1))
+        rows = self._visible_rows()
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + rows:
+            self.top = self.selected - rows + 1
+        self.refresh()
+        if self.on_select:
+            self.on_select(self.items[self.selected])
+        return "break"
 
 
 # ---------------------- 訂購訊息生成器 ----------------------
@@ -13,14 +148,27 @@ class OrderMessageGenerator(ctk.CTkFrame):
         self.parent = parent
         self.status_callback = status_callback  # 用以更新狀態列
         self.data = None
-        self.messages = {}  # 儲存每位訂購人的訂購訊息
+        self.order_book = None  # 上傳時編譯好的訂單資料
+        self.parse_cache = ParseCache()  # 以檔案內容為鍵的磁碟快取
+        self.upload_digest = None  # 目前檔案的內容雜湊（手動編輯存回快取用）
+        self.sheet = None  # 表單直接餵進來的訂單（SheetOrders），見 load_sheet
+        self.messages = MessageCache()  # 每位訂購人的訂購訊息（需要時才組裝）
         self.order_details = (
-            {}
-        )  # 儲存每位訂購人各產品訂購數量（字典：姓名 -> {產品名稱: 數量, ...}）
+            OrderDetails()
+        )  # 每位訂購人各產品訂購數量（字典：姓名 -> {產品名稱: 數量, ...}）
+        self.order_totals = {}  # 儲存每位訂購人的訂單總金額
         self.copied_names = set()  # 紀錄已複製的訂購人（需要保持反白）
+        self.name_index = NameIndex([])  # 上傳時建立的姓名搜尋索引
         self.filter_id = None  # 搜尋延遲 id
         self.editing = False  # 編輯模式旗標
+        try:
+            self.template = MessageTemplate.load()  # 訊息範本（訊息範本.json）
+        except ValueError as e:
+            messagebox.showwarning("提示", f"{e}\n暫時改用預設範本。")
+            self.template = MessageTemplate()
         self.create_widgets()
+        # 上傳與匯出在背景執行；同一種工作重新開始時，舊的自動取消
+        self.jobs = JobRunner(self, max_workers=2, on_progress=self.show_job)
 
     def set_status(self, message):
         if self.status_callback:
@@ -56,30 +204,38 @@ class OrderMessageGenerator(ctk.CTkFrame):
         sort_btn = ctk.CTkButton(top_frame, text="排序", command=self.sort_by_product)
         sort_btn.grid(row=0, column=5, padx=5, pady=5)
 
-        export_btn = ctk.CTkButton(
+        pick_btn = ctk.CTkButton(
+            top_frame, text="挑貨清單", width=90, command=self.open_pick_list
+        )
+        pick_btn.grid(row=0, column=6, padx=5, pady=5)
+
+        self.export_mode = ctk.CTkOptionMenu(
+            top_frame, values=list(EXPORT_MODES), width=120
+        )
+        self.export_mode.grid(row=0, column=7, padx=5, pady=5)
+
+        self.export_btn = ctk.CTkButton(
             top_frame, text="匯出訊息", command=self.export_messages
         )
-        export_btn.grid(row=0, column=6, padx=5, pady=5)
+        self.export_btn.grid(row=0, column=8, padx=5, pady=5)
 
         # 主區域：左側訂購人列表 / 右側訂購訊息顯示與編輯
         main_frame = ctk.CTkFrame(self)
         main_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
-        # 左側：訂購人列表（由於 customtkinter 尚無 Listbox 元件，保留 tk.Listbox）
+        # 左側：訂購人列表（由於 customtkinter 尚無 Listbox 元件，以 tk.Listbox 虛擬化顯示）
         left_frame = ctk.CTkFrame(main_frame, border_width=2)
         left_frame.pack(side="left", fill="y", padx=(0, 5), pady=5)
         list_label = ctk.CTkLabel(left_frame, text="訂購人列表")
         list_label.pack(anchor="nw", padx=5, pady=5)
-        self.order_listbox = tk.Listbox(
-            left_frame, width=30, exportselection=False, font=("微軟正黑體", 14)
+        self.order_listbox = VirtualListbox(
+            left_frame,
+            on_select=lambda name: self.show_order_detail(),
+            is_marked=lambda name: name in self.copied_names,
+            width=30,
+            font=("微軟正黑體", 14),
         )
         self.order_listbox.pack(side="left", fill="y", expand=True, padx=5, pady=5)
-        list_scrollbar = tk.Scrollbar(
-            left_frame, orient="vertical", command=self.order_listbox.yview
-        )
-        list_scrollbar.pack(side="right", fill="y")
-        self.order_listbox.config(yscrollcommand=list_scrollbar.set)
-        self.order_listbox.bind("<<ListboxSelect>>", self.show_order_detail)
 
         # 右側：訂購訊息詳情與編輯（使用 CTkTextbox 取代 ScrolledText）
         right_frame = ctk.CTkFrame(main_frame, border_width=2)
@@ -99,6 +255,20 @@ class OrderMessageGenerator(ctk.CTkFrame):
             btn_frame, text="編輯訂單", command=self.toggle_edit_order
         )
         self.edit_btn.grid(row=0, column=1, padx=5)
+        template_btn = ctk.CTkButton(
+            btn_frame, text="訊息範本", command=self.edit_template
+        )
+        template_btn.grid(row=0, column=2, padx=5)
+
+        # 背景工作進度（有工作時才顯示）
+        self.job_bar = JobStatusBar(self)
+
+    def show_job(self, job):
+        if job is None:
+            self.job_bar.pack_forget()
+        elif not self.job_bar.winfo_manager():
+            self.job_bar.pack(fill="x", padx=10, pady=(0, 5))
+        self.job_bar.show(job)
 
     def delayed_filter(self):
         if self.filter_id:
@@ -107,36 +277,124 @@ class OrderMessageGenerator(ctk.CTkFrame):
 
     def upload_file(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx *.xls")]
+            filetypes=OPEN_FILETYPES
         )
         if not file_path:
             return
-        try:
-            self.data = pd.read_excel(file_path, engine="openpyxl")
-            self.generate_order_messages()
-            self.populate_order_list()
-            self.update_product_sort_options()
-            self.set_status("Excel檔案上傳成功")
-        except FileNotFoundError:
+        # 讀檔與編譯在背景執行緒；完成後才在 UI 執行緒套用（再上傳一次會取代這次）
+        today_date = datetime.now().strftime("%m/%d")
+        self.jobs.submit(
+            "upload",
+            lambda job: compile_order_file(
+                file_path, self.parse_cache, today_date, job, self.template
+            ),
+            label="讀取訂單檔",
+            on_done=self._upload_done,
+            on_error=self._upload_failed,
+            on_cancel=lambda: self.set_status("已取消上傳"),
+        )
+        self.set_status("讀取訂單檔中…")
+
+    def _upload_done(self, result):
+        self.apply_order_file(result)
+        self.populate_order_list()
+        self.update_product_sort_options()
+        self.set_status(self._with_timing("Excel檔案上傳成功"))
+        self.check_similar_names()
+
+    def check_similar_names(self):
+        """
+        在背景比對訂購人姓名（全形半形、大小寫、多餘空白或「·」不同，或字形很接近），
+        疑似同一人時提醒使用者回訂單表確認；訊息不會自動合併。
+        """
+        if self.order_book is None:
+            return
+        names = list(self.order_book.names)
+        self.jobs.submit(
+            "names",
+            lambda job: similar_names(names),
+            label="比對相似姓名",
+            on_done=self._similar_names_found,
+            on_error=lambda exc: self.set_status(f"無法比對相似姓名：{exc}"),
+        )
+
+    def _similar_names_found(self, pairs):
+        if not pairs:
+            return
+        shown = "\n".join(f"{a} ⇄ {b}" for a, b, _ in pairs[:SIMILAR_NAMES_SHOWN])
+        more = f"\n…共 {len(pairs)} 組" if len(pairs) > SIMILAR_NAMES_SHOWN else ""
+        messagebox.showinfo(
+            "相似的訂購人姓名",
+            f"以下訂購人的姓名很相似，可能是同一人，請確認訂單表：\n{shown}{more}",
+        )
+
+    def _with_timing(self, message):
+        """狀態列訊息後面接上剛才各步驟的耗時。"""
+        timing = 計時.summary()
+        return f"{message}　{timing}" if timing else message
+
+    def _upload_failed(self, error):
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("錯誤", "找不到檔案，請確認路徑是否正確")
-            self.set_status("檔案讀取失敗")
-        except ValueError:
+        elif isinstance(error, ValueError):
             messagebox.showerror("錯誤", "Excel 檔案格式有誤，請確認檔案內容")
-            self.set_status("檔案讀取失敗")
-        except Exception as e:
-            messagebox.showerror("錯誤", f"讀取檔案時出現錯誤：{str(e)}")
-            self.set_status("檔案讀取失敗")
+        else:
+            messagebox.showerror("錯誤", f"讀取檔案時出現錯誤：{str(error)}")
+        self.set_status("檔案讀取失敗")
+
+    def load_order_file(self, file_path):
+        """同步讀入並套用訂單檔（介面上的上傳改在背景執行，見 upload_file）。"""
+        today_date = datetime.now().strftime("%m/%d")
+        self.apply_order_file(
+            compile_order_file(
+                file_path, self.parse_cache, today_date, template=self.template
+            )
+        )
+
+    def apply_order_file(self, result):
+        """套用 compile_order_file 的結果，包括之前手動編輯過的訊息。"""
+        data, book, digest, edits = result
+        self.data = data
+        if book is None:
+            return
+        self.use_order_book(book)
+        self.upload_digest = digest
+        for name, text in edits.items():
+            if name in self.messages:
+                self.messages.set_override(name, text)
+
+    def load_sheet(self, sheet):
+        """直接使用表單在記憶體裡的訂單（SheetOrders），不必先匯出 Excel 再上傳。"""
+        today_date = datetime.now().strftime("%m/%d")
+        self.data = None
+        self.upload_digest = None
+        self.sheet = sheet
+        self.use_order_book(sheet.build(today_date, self.template))
+        self.populate_order_list()
+        self.update_product_sort_options()
+        self.set_status(self._with_timing("已載入表單的訂單"))
+
+    def sheet_changed(self, names):
+        """
+        表單新增商品或改價格後呼叫（OrderBook 已由 SheetOrders 更新）：
+        只丟掉 names 這些訂購人已組好的訊息，其他人的訊息不重組。
+        之後又上傳了檔案時，表單的變更不再影響畫面。
+        """
+        if self.sheet is None or self.order_book is not self.sheet.book or not names:
+            return
+        book = self.order_book
+        self.messages.invalidate(names)
+        if len(book.item_names) != len(self.product_sort_combobox.cget("values")) - 1:
+            self.update_product_sort_options()
+        if set(book.names) != set(self.name_index.names):
+            self.name_index = NameIndex(book.names)
+            self.filter_orders()
+        if not self.editing and self.order_listbox.selected_item() in names:
+            self.show_order_detail()
+        self.set_status(self._with_timing(f"已更新 {len(names)} 位訂購人的訊息"))
 
     def parse_order_quantity(self, raw_quantity):
-        if pd.isna(raw_quantity) or str(raw_quantity).strip() == "":
-            return 0, "你沒訂"
-        try:
-            numeric_quantity = float(raw_quantity)
-            if numeric_quantity.is_integer():
-                numeric_quantity = int(numeric_quantity)
-            return numeric_quantity, numeric_quantity
-        except Exception:
-            return raw_quantity, str(raw_quantity).strip()
+        return parse_order_quantity(raw_quantity)
 
     def generate_order_messages(self):
         """
@@ -146,99 +404,37 @@ class OrderMessageGenerator(ctk.CTkFrame):
         並計算每筆訂購的總金額（僅針對價格為數值的產品）。
         當訂購數量儲存格有內容（例如 "M+1"），則顯示原字串；僅當儲存格空白或數值為 0 時，
         顯示「你沒訂」且不列入訂購項目。
+        這裡只編譯 OrderBook，個別訊息在選取、複製或匯出時才組裝。
         """
         if self.data is None or self.data.empty:
             return
-        self.messages.clear()
-        self.order_details.clear()
         today_date = datetime.now().strftime("%m/%d")
-        header_row = self.data.iloc[0]
-        orders_data = self.data.iloc[1:].fillna("")
-        for _, row in orders_data.iterrows():
-            name = row.iloc[1]  # 假設第2欄為訂購人姓名
-            if not str(name).strip():
-                continue
-            message_lines = [
-                f"*熊熊媽團團轉{today_date}訂購清單*",
-                "",
-                "#取貨時間三點到七點",
-                "#本日到貨狀況請留意公告",
-                "================",
-                f"訂購人：{name}",
-            ]
-            has_order = False
-            order_items = []  # 收集有訂購的品項（供排序）
-            product_quantities = {}  # 記錄各產品訂購數量
-            total_amount = 0.0  # 計算該訂單總金額
-            for col_index in range(2, len(row)):
-                item_name = self.data.columns[col_index]
-                raw_price = self.data.iloc[0, col_index]
-                numeric_price = None
-                if pd.isna(raw_price) or str(raw_price).strip() == "":
-                    item_price_str = "無價格"
-                else:
-                    try:
-                        numeric_price = float(str(raw_price))
-                        if numeric_price.is_integer():
-                            numeric_price = int(numeric_price)
-                            item_price_str = str(numeric_price)
-                        else:
-                            item_price_str = f"{numeric_price:.2f}"
-                    except Exception:
-                        item_price_str = str(raw_price)
-                raw_quantity = row.iloc[col_index]
-                quantity, item_quantity = self.parse_order_quantity(raw_quantity)
-                product_quantities[item_name] = quantity
-                if (isinstance(quantity, (int, float)) and quantity > 0) or (
-                    not isinstance(quantity, (int, float))
-                    and str(quantity).strip() not in ["", "0"]
-                ):
-                    has_order = True
-                    order_items.append((item_name, item_price_str, item_quantity))
-                    if isinstance(quantity, (int, float)) and (
-                        numeric_price is not None
-                    ):
-                        total_amount += numeric_price * quantity
-            self.order_details[name] = product_quantities
-            if has_order:
-                order_items.sort(key=lambda x: x[0])
-                for item_name, item_price_str, item_quantity in order_items:
-                    message_lines.extend(
-                        [
-                            f"訂購商品：{item_name}",
-                            f"品項單價：{item_price_str}",
-                            f"數量品項：{item_quantity}",
-                            "----------------",
-                        ]
-                    )
-                message_lines.append("已讀請回覆訊息喔~")
-                final_message = "\n".join(message_lines)
-                self.messages[name] = final_message
+        with 計時.span("訊息.compile", "編譯訂單") as sp:
+            self.use_order_book(OrderBook(self.data, today_date, self.template))
+            sp.count(buyers=len(self.order_book.names))
+
+    def use_order_book(self, book):
+        self.order_book = book
+        self.messages.load(book)
+        self.order_details = OrderDetails(book)
+        self.order_totals = book.totals
 
     def populate_order_list(self):
-        self.order_listbox.delete(0, tk.END)
-        sorted_names = sorted(self.messages.keys())
-        for idx, name in enumerate(sorted_names):
-            self.order_listbox.insert(tk.END, name)
-            if name in self.copied_names:
-                self.order_listbox.itemconfig(idx, bg="black", fg="white")
+        # 姓名索引每次上傳只建立一次，之後搜尋都查索引
+        self.name_index = NameIndex(self.messages.keys())
+        self.order_listbox.set_items(self.name_index.names)
 
     def filter_orders(self):
         search_term = self.search_var.get().strip().lower()
-        self.order_listbox.delete(0, tk.END)
-        sorted_names = sorted(self.messages.keys())
-        for idx, name in enumerate(sorted_names):
-            if search_term in name.lower():
-                self.order_listbox.insert(tk.END, name)
-                if name in self.copied_names:
-                    self.order_listbox.itemconfig(idx, bg="black", fg="white")
-
-    def show_order_detail(self, event):
-        selection = self.order_listbox.curselection()
-        if not selection:
+        with 計時.span("訊息.filter", "搜尋") as sp:
+            names = self.name_index.search(search_term)
+            sp.count(matches=len(names))
+        self.order_listbox.set_items(names)
+
+    def show_order_detail(self, event=None):
+        name = self.order_listbox.selected_item()
+        if name is None:
             return
-        index = selection[0]
-        name = self.order_listbox.get(index)
         message = self.messages.get(name, "")
         if not self.editing:
             self.detail_text.configure(state="normal")
@@ -250,28 +446,25 @@ class OrderMessageGenerator(ctk.CTkFrame):
             self.detail_text.insert(tk.END, message)
 
     def copy_message(self):
-        selection = self.order_listbox.curselection()
-        if not selection:
+        name = self.order_listbox.selected_item()
+        if name is None:
             self.set_status("請先選擇一個訂購人。")
             return
-        index = selection[0]
-        name = self.order_listbox.get(index)
         message = self.messages.get(name, "")
         if message:
+            import pyperclip  # 第一次複製時才載入
             pyperclip.copy(message)
             self.set_status("訊息已複製到剪貼簿")
-            self.order_listbox.itemconfig(index, bg="black", fg="white")
             self.copied_names.add(name)
+            self.order_listbox.refresh()
         else:
             self.set_status("無法複製空訊息")
 
     def toggle_edit_order(self):
-        selection = self.order_listbox.curselection()
-        if not selection:
+        name = self.order_listbox.selected_item()
+        if name is None:
             self.set_status("請先選擇一個訂購人。")
             return
-        index = selection[0]
-        name = self.order_listbox.get(index)
         if not self.editing:
             # 進入編輯模式
             self.detail_text.configure(state="normal")
@@ -282,7 +475,11 @@ class OrderMessageGenerator(ctk.CTkFrame):
             # 儲存修改並離開編輯模式
             new_text = self.detail_text.get("1.0", tk.END).strip()
             if new_text:
-                self.messages[name] = new_text
+                self.messages.set_override(name, new_text)
+                if self.upload_digest:
+                    self.parse_cache.save_edits(
+                        self.upload_digest, self.messages.overrides
+                    )
                 self.detail_text.configure(state="disabled")
                 self.edit_btn.configure(text="編輯訂單")
                 self.editing = False
@@ -290,9 +487,61 @@ class OrderMessageGenerator(ctk.CTkFrame):
             else:
                 self.set_status("訂單內容不可為空")
 
+    def edit_template(self):
+        """編輯訊息範本；儲存後寫入訊息範本.json，目前的訂單立即改用新範本。"""
+        window = ctk.CTkToplevel(self)
+        window.title("訊息範本")
+        window.geometry("520x620")
+        labels = {
+            "header": "標題（{date} = 日期）",
+            "buyer": "訂購人（{name} = 姓名）",
+            "item": "每項商品（{item} 品項、{price} 單價、{quantity} 數量）",
+            "footer": "結尾",
+        }
+        boxes = {}
+        for field, label in labels.items():
+            ctk.CTkLabel(window, text=label).pack(anchor="w", padx=10, pady=(8, 0))
+            box = ctk.CTkTextbox(window, height=110 if field in ("header", "item") else 50)
+            box.insert("1.0", getattr(self.template, field))
+            box.pack(fill="x", padx=10)
+            boxes[field] = box
+
+        def fill(template):
+            for field, box in boxes.items():
+                box.delete("1.0", tk.END)
+                box.insert("1.0", getattr(template, field))
+
+        def save():
+            # CTkTextbox 取值最後會多一個換行
+            fields = {field: box.get("1.0", "end-1c") for field, box in boxes.items()}
+            try:
+                template = MessageTemplate(**fields)
+                template.save()
+            except (ValueError, OSError) as e:
+                messagebox.showerror("錯誤", f"無法儲存訊息範本：{e}", parent=window)
+                return
+            self.apply_template(template)
+            window.destroy()
+
+        btn_row = ctk.CTkFrame(window)
+        btn_row.pack(pady=10)
+        ctk.CTkButton(btn_row, text="還原預設", command=lambda: fill(MessageTemplate())).grid(
+            row=0, column=0, padx=5
+        )
+        ctk.CTkButton(btn_row, text="儲存", command=save).grid(row=0, column=1, padx=5)
+
+    def apply_template(self, template):
+        self.template = template
+        if self.order_book is not None:
+            self.order_book.set_template(template)
+            self.messages.refresh()
+            if not self.editing:
+                self.show_order_detail()
+        self.set_status("訊息範本已更新")
+
     def update_product_sort_options(self):
-        if self.data is not None:
-            product_names = list(self.data.columns[2:])
+        if self.order_book is not None:
+            product_names = list(self.order_book.item_names)
             product_names.insert(0, "依字母排序")
             self.product_sort_combobox.configure(values=product_names)
             if product_names:
@@ -304,52 +553,102 @@ class OrderMessageGenerator(ctk.CTkFrame):
             messagebox.showwarning("提示", "請先選擇一個產品。")
             return
 
-        def has_order(name):
-            """判斷此人是否有訂購 selected_product。"""
-            q = self.order_details.get(name, {}).get(selected_product, 0)
-            if isinstance(q, (int, float)):
-                return q > 0
-            return str(q).strip() not in ["", "0"]
-
-        # 依 flag (0=有訂購, 1=沒訂購) + 姓名 Unicode 排序
-        sorted_names = sorted(
-            self.messages.keys(),
-            key=lambda n: (0 if has_order(n) else 1, n)
-        )
+        if self.order_book is None:
+            return
+
+        # 有訂購者在前、沒訂購者在後，各自依姓名 Unicode 排序（查上傳時建好的位元集合）
+        sorted_names = self.order_book.partition_by([selected_product])
 
-        # 更新 Listbox
-        self.order_listbox.delete(0, tk.END)
-        for idx, n in enumerate(sorted_names):
-            self.order_listbox.insert(tk.END, n)
-            if n in self.copied_names:
-                self.order_listbox.itemconfig(idx, bg="black", fg="white")
+        # 更新訂購人列表
+        self.order_listbox.set_items(sorted_names)
 
         self.set_status("依產品排序完成")
 
+    def open_pick_list(self):
+        """挑貨清單：選取多個產品，列出全部都有訂或任一有訂的訂購人。"""
+        if self.order_book is None:
+            messagebox.showinfo("提示", "請先上傳訂單檔。")
+            return
+        book = self.order_book
+        window = ctk.CTkToplevel(self)
+        window.title("挑貨清單")
+        window.geometry("320x480")
+        ctk.CTkLabel(window, text="選擇產品（可按 Ctrl / Shift 多選）：").pack(
+            anchor="w", padx=10, pady=(10, 0)
+        )
+        product_list = tk.Listbox(
+            window, selectmode="extended", exportselection=False, font=("微軟正黑體", 12)
+        )
+        product_list.insert(tk.END, *book.item_names)
+        product_list.pack(fill="both", expand=True, padx=10, pady=5)
+
+        def show(any_of):
+            if self.order_book is not book:  # 期間重新上傳過
+                window.destroy()
+                return
+            items = [book.item_names[k] for k in product_list.curselection()]
+            if not items:
+                self.set_status("請先選擇產品。")
+                return
+            buyers = book.buyers_with(items, any_of=any_of)
+            self.order_listbox.set_items(buyers)
+            rule = "任一" if any_of else "全部"
+            self.set_status(f"{rule}訂購 {len(items)} 項產品的訂購人：{len(buyers)} 位")
+
+        btn_row = ctk.CTkFrame(window)
+        btn_row.pack(pady=(0, 10))
+        ctk.CTkButton(btn_row, text="全部都有訂", width=120,
+                      command=lambda: show(False)).grid(row=0, column=0, padx=5)
+        ctk.CTkButton(btn_row, text="任一有訂", width=120,
+                      command=lambda: show(True)).grid(row=0, column=1, padx=5)
+
 
     def export_messages(self):
         if not self.messages:
             messagebox.showinfo("提示", "目前無任何訊息可供匯出。")
             self.set_status("無訊息匯出")
             return
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
-        )
+        mode = EXPORT_MODES[self.export_mode.get()]
+        if mode == "per_buyer":
+            file_path = filedialog.askdirectory(title="選擇匯出資料夾（每位訂購人一個檔案）")
+        elif mode == "zip":
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".zip",
+                filetypes=[("ZIP files", "*.zip"), ("All files", "*.*")],
+            )
+        else:
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            )
         if not file_path:
             return
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                for name, message in self.messages.items():
-                    f.write(f"訂購人：{name}\n")
-                    f.write(message)
-                    f.write("\n" + "=" * 40 + "\n")
-            messagebox.showinfo("提示", "訊息匯出成功。")
-            self.set_status("訊息匯出成功")
-        except Exception as e:
-            messagebox.showerror("錯誤", f"匯出訊息時發生錯誤：{str(e)}")
-            self.set_status("訊息匯出失敗")
 
+        # 在 UI 執行緒取快照：之後的編輯或重新上傳不影響這次匯出
+        render, overrides = self.order_book.renderer(), dict(self.messages.overrides)
+        names = list(self.messages)
+        entries = (
+            (name, overrides[name] if name in overrides else render(name))
+            for name in names
+        )
+        self.jobs.submit(
+            "export",
+            lambda job: write_message_export(
+                entries, mode, file_path, len(names), progress=job.progress
+            ),
+            label="匯出訊息",
+            on_done=self._export_done,
+            on_error=self._export_failed,
+            on_cancel=lambda: self.set_status("已取消匯出"),
+        )
+
+    def _export_done(self, count):
+        self.set_status(self._with_timing("訊息匯出成功"))
+        messagebox.showinfo("提示", f"訊息匯出成功，共 {count} 筆。")
+
+    def _export_failed(self, error):
+        messagebox.showerror("錯誤", f"匯出訊息時發生錯誤：{str(error)}")
+        self.set_status("訊息匯出失敗")
 
 
 # ---------------------- 主程式 ----------------------
@@ -378,6 +677,11 @@ def main():
     )
     order_generator.pack(fill="both", expand=True)
 
+    def on_close():
+        order_generator.jobs.shutdown()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
     root.mainloop()
 
 